@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+匯入格式效能測試 - 比較 CSV（每次重新清理）與 Parquet 型別化快照的匯入速度
+
+會清空並重建資料庫中的菜單資料，需加上 --yes 確認。
+用法: python benchmarks/bench_formats.py --yes [CSV檔案]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from final_manager import FoodDataManager
+from bench_utils import reset_menu
+from menu.exporting import iter_dish_rows
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def snapshot():
+    return [(name, category, tuple(sorted(m.split(','))) if m else (), price, calories)
+            for name, category, m, price, calories in iter_dish_rows()]
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--yes']
+    if '--yes' not in sys.argv[1:]:
+        print("此測試會清空資料庫中的菜單資料，請加上 --yes 確認")
+        return 1
+    csv_path = args[0] if args else 'sample_dirty.csv'
+    manager = FoodDataManager()
+
+    reset_menu()
+    csv_time = timed(manager.run_full_import, csv_path, bulk=True)
+    expected = snapshot()
+    print(f"測試資料: {csv_path}（{len(expected)} 道菜）")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [('csv', csv_time)]
+        for extension in ('parquet', 'feather'):
+            path = os.path.join(tmp, f'menu.{extension}')
+            export_time = timed(manager.export_snapshot, path)
+            reset_menu()
+            import_time = timed(manager.import_snapshot, path)
+            if snapshot() != expected:
+                print(f"✗ {extension} 往返後資料不一致")
+                return 1
+            results.append((extension, import_time))
+            print(f"{extension} 匯出: {export_time:.2f} 秒, 檔案大小: {os.path.getsize(path)} bytes")
+
+    print(f"{'格式':<10} {'匯入秒數':<10} {'筆/秒':<12}")
+    print("-" * 34)
+    for name, seconds in results:
+        print(f"{name:<10} {seconds:<10.2f} {len(expected) / seconds:<12.0f}")
+    print("✓ 資料庫 → 快照 → 資料庫 往返無損")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+平行清理效能測試 - 比較不同 worker 數量下 clean_data 的吞吐量
+
+用法: python benchmarks/bench_parallel_clean.py [筆數]
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from final_manager import FoodDataManager
+
+
+def make_rows(count, seed=42):
+    """產生帶有常見髒資料的測試資料（已經過 load_csv 階段）"""
+    rng = random.Random(seed)
+    names = ['叉燒飯', '乾炒牛河', '鮮蝦雲吞麵', '凱撒沙拉', '羅宋湯', '烤鮭魚排']
+    categories = ['豬肉', '牛肉', '海鮮', '蔬菜', '雞肉']
+    times = ['午餐', '晚餐', '早餐', '午餐晚餐', '早餐 午餐', '午餐,晚餐']
+    prices = ['{:.2f}', '{:.0f}元', '¥{:.2f}', '{:.1f} NTD']
+    calories = ['{}', '{}卡', '{} cal']
+
+    manager = FoodDataManager()
+    rows = []
+    for i in range(count):
+        row = {
+            '菜名': f"{rng.choice(names)}{'@#'[i % 2]}{i}",
+            '主要食材': rng.choice(categories),
+            '供應時段': rng.choice(times),
+            '價格(元)': rng.choice(prices).format(rng.uniform(20, 300)),
+            '熱量(卡路里)': rng.choice(calories).format(rng.randint(100, 1200)),
+        }
+        rows.append(manager._load_row(row))
+    return rows
+
+
+def run(rows, workers):
+    """回傳 (秒數, 清理結果)"""
+    manager = FoodDataManager()
+    manager.data = list(rows)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.clean_data(workers=workers)
+    return time.perf_counter() - start, manager.data
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = make_rows(count)
+    print(f"測試資料: {count} 筆")
+
+    baseline_time, baseline = run(rows, None)
+    print(f"{'workers':<10} {'秒數':<10} {'筆/秒':<12} {'加速比':<8}")
+    print("-" * 44)
+    print(f"{'serial':<10} {baseline_time:<10.2f} {count / baseline_time:<12.0f} {1.0:<8.2f}")
+
+    workers = 1
+    max_workers = os.cpu_count() or 1
+    while workers < max_workers:
+        workers = min(workers * 2, max_workers)
+        elapsed, result = run(rows, workers)
+        if result != baseline:
+            print(f"✗ workers={workers} 的結果與逐筆清理不一致")
+            return 1
+        print(f"{workers:<10} {elapsed:<10.2f} {count / elapsed:<12.0f} {baseline_time / elapsed:<8.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
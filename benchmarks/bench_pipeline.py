@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+管線匯入效能測試 - 比較 run_streaming_import（循序）與 run_async_import（三階段重疊）
+
+會清空並重建資料庫中的菜單資料，需加上 --yes 確認。
+用法: python benchmarks/bench_pipeline.py --yes [筆數] [workers]
+"""
+
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from final_manager import FoodDataManager
+from bench_utils import reset_menu
+
+
+def write_csv(path, count, seed=42):
+    """產生帶有常見髒資料的 CSV"""
+    rng = random.Random(seed)
+    names = ['叉燒飯', '乾炒牛河', '鮮蝦雲吞麵', '凱撒沙拉', '羅宋湯', '烤鮭魚排']
+    categories = ['豬肉', '牛肉', '海鮮', '蔬菜', '雞肉']
+    times = ['午餐', '晚餐', '早餐', '午餐晚餐', '早餐 午餐', '午餐,晚餐']
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['菜名', '主要食材', '供應時段', '價格(元)', '熱量(卡路里)'])
+        for i in range(count):
+            writer.writerow([
+                f"{rng.choice(names)}{'@#'[i % 2]}{i}",
+                rng.choice(categories),
+                rng.choice(times),
+                f"{rng.uniform(20, 300):.1f}元",
+                f"{rng.randint(100, 1200)}卡",
+            ])
+
+
+def run(func):
+    """清空資料後執行匯入，回傳 (秒數, 輸出的最後幾行)"""
+    reset_menu()
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        func()
+    return time.perf_counter() - start, output.getvalue().splitlines()
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--yes']
+    if '--yes' not in sys.argv[1:]:
+        print("此測試會清空資料庫中的菜單資料，請加上 --yes 確認")
+        return 1
+    count = int(args[0]) if args else 50000
+    workers = int(args[1]) if len(args) > 1 else None
+    manager = FoodDataManager()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'menu.csv')
+        write_csv(path, count)
+        print(f"測試資料: {count} 筆, workers: {workers or 1}")
+
+        sequential_time, _ = run(lambda: manager.run_streaming_import(path, workers=workers))
+        pipeline_time, output = run(lambda: manager.run_async_import(path, workers=workers))
+
+    # 管線匯入最後印出的各階段統計
+    start = next(i for i, line in enumerate(output) if line.startswith('階段'))
+    print('\n'.join(output[start:-1]))
+    print(f"\n循序: {sequential_time:.2f} 秒, 管線: {pipeline_time:.2f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
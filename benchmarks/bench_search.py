@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+菜名模糊搜尋效能測試 - 百萬筆菜名上打錯字的查詢，p95 須低於目標延遲
+
+預設不使用資料庫：以固定種子組合「做法 + 食材 + 配菜 + 主食 + 份量」產生指定
+筆數、不重複的中文菜名，建立 menu.search.NameIndex，再從中隨機取菜名製造錯字
+（替換、刪除、對調相鄰的字、只打前半段）作為查詢，量測每次查詢的延遲並計算
+原本的菜餚出現在前 10 名的比例。
+
+--from-db 改為對資料庫中現有的菜餚執行 menu.search.search_dishes()（含讀取
+菜單版本；PostgreSQL 已安裝 pg_trgm 時，不含中文的查詢走 GIN 索引）。
+再加上 --write-every N 時每 N 次查詢穿插一次寫入（更新一道菜的 updated_at 並使
+菜單版本加一），量測索引在背景重建期間的查詢延遲，並列出有多少次查詢的結果
+來自舊的索引；寫入本身不計入延遲。
+
+用法: python benchmarks/bench_search.py [--rows 1m] [--queries 1000] [--target-ms 10]
+                                        [--no-numpy] [--from-db [--write-every 50]]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_project.settings')
+
+import django
+django.setup()
+
+from django.utils import timezone
+
+from generate_menu import parse_size
+from menu.models import Dish
+from menu.search import NameIndex, search_dishes, search_matches
+from menu.versioning import menu_write
+
+METHODS = ['清蒸', '紅燒', '椒鹽', '蒜蓉', '豉汁', '黑椒', '咖喱', '麻辣', '糖醋', '避風塘',
+           '薑蔥', '沙嗲', '鹹蛋', '豉油皇', '香煎', '白灼', '乾煸', '宮保', '魚香', 'XO醬']
+INGREDIENTS = ['牛肉', '牛腩', '豬扒', '排骨', '叉燒', '雞翼', '雞柳', '鴨胸', '鮮蝦', '蝦仁',
+               '帶子', '魷魚', '墨魚', '鮭魚', '石斑', '扇貝', '青口', '蟹肉', '豆腐', '茄子',
+               '菜心', '芥蘭', '西蘭花', '粟米', '冬菇', '雲耳', '粉絲', '滑蛋', '午餐肉', '火腿']
+STAPLES = ['飯', '炒飯', '燴飯', '麵', '炒麵', '湯麵', '撈麵', '米粉', '河粉', '烏冬',
+           '意粉', '粥', '煲', '湯', '沙拉', '卷', '餃', '雲吞', '燒賣', '腸粉']
+PORTIONS = ['', '（小）', '（大）', '套餐', '（例）']
+
+TOP_N = 10
+
+
+def dish_names(count, seed=42):
+    """count 個不重複的菜名（做法 + 食材 + 配菜 + 主食 + 份量）"""
+    sizes = [len(METHODS), len(INGREDIENTS), len(INGREDIENTS), len(STAPLES), len(PORTIONS)]
+    total = 1
+    for size in sizes:
+        total *= size
+    if count > total:
+        raise SystemExit(f"✗ 最多只能產生 {total} 個不重複的菜名")
+    names = []
+    for number in random.Random(seed).sample(range(total), count):
+        parts = []
+        for size in sizes:
+            number, index = divmod(number, size)
+            parts.append(index)
+        method, first, second, staple, portion = parts
+        side = INGREDIENTS[second] if second != first else ''
+        names.append(METHODS[method] + INGREDIENTS[first] + side + STAPLES[staple] + PORTIONS[portion])
+    return names
+
+
+def mistype(rng, name, alphabet):
+    """製造一個錯字：替換、刪除、對調相鄰的字，或只打前半段"""
+    kind = rng.randrange(4)
+    i = rng.randrange(len(name))
+    if kind == 0:
+        return name[:i] + rng.choice(alphabet) + name[i + 1:]
+    if kind == 1 and len(name) > 2:
+        return name[:i] + name[i + 1:]
+    if kind == 2 and i + 1 < len(name):
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:max(2, (len(name) + 1) // 2 + 1)]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label, latencies, hits, target_ms):
+    p50 = percentile(latencies, 0.50) * 1000
+    p95 = percentile(latencies, 0.95) * 1000
+    p99 = percentile(latencies, 0.99) * 1000
+    print(f"  {label}: p50 {p50:.2f} ms、p95 {p95:.2f} ms、p99 {p99:.2f} ms、"
+          f"平均 {statistics.mean(latencies) * 1000:.2f} ms")
+    if hits is not None:
+        print(f"  原本的菜餚在前 {TOP_N} 名: {hits / len(latencies):.1%}")
+    ok = p95 < target_ms
+    print(f"{'✓' if ok else '✗'} p95 {p95:.2f} ms {'<' if ok else '>='} 目標 {target_ms} ms")
+    return ok
+
+
+def bench_index(args):
+    rows = parse_size(args.rows)
+    start = time.perf_counter()
+    names = dish_names(rows)
+    print(f"✓ 已產生 {len(names)} 個菜名（{time.perf_counter() - start:.1f} 秒）")
+
+    start = time.perf_counter()
+    index = NameIndex(enumerate(names, start=1), use_numpy=False if args.no_numpy else None)
+    print(f"✓ 已建立索引：{len(index.postings)} 個 n-gram（{time.perf_counter() - start:.1f} 秒，"
+          f"{'numpy' if index.numpy is not None else '純 Python'}）")
+
+    rng = random.Random(7)
+    alphabet = sorted(set(''.join(names[:1000])))
+    queries = []
+    for _ in range(args.queries):
+        dish_id = rng.randrange(len(names)) + 1
+        queries.append((dish_id, mistype(rng, names[dish_id - 1], alphabet)))
+
+    for dish_id, query in queries[:20]:
+        index.search(query)  # 暖機
+    latencies = []
+    hits = 0
+    for dish_id, query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, limit=TOP_N)
+        latencies.append(time.perf_counter() - start)
+        hits += any(match_id == dish_id for match_id, _ in matches)
+
+    dish_id, query = queries[0]
+    print(f"  範例：「{query}」（原為「{names[dish_id - 1]}」）→ " + '、'.join(
+        f"{names[match_id - 1]} {score:.2f}" for match_id, score in index.search(query, limit=3)))
+    return report(f"{len(queries)} 次查詢", latencies, hits, args.target_ms)
+
+
+def bench_database(args):
+    names = list(Dish.objects.order_by('?').values_list('name', flat=True)[:min(args.queries, 1000)])
+    if not names:
+        print("✗ 資料庫中沒有菜餚")
+        return False
+    start = time.perf_counter()
+    search_dishes(names[0])  # 第一次搜尋建立索引
+    print(f"✓ {Dish.objects.count()} 道菜餚，第一次搜尋（含建立索引）{time.perf_counter() - start:.1f} 秒")
+
+    rng = random.Random(7)
+    alphabet = sorted(set(''.join(names)))
+    dish_ids = list(Dish.objects.values_list('id', flat=True)[:1000]) if args.write_every else []
+    latencies = []
+    writes = stale = 0
+    for i in range(args.queries):
+        if args.write_every and i and i % args.write_every == 0:
+            with menu_write():
+                Dish.objects.filter(pk=rng.choice(dish_ids)).update(updated_at=timezone.now())
+            writes += 1
+        query = mistype(rng, names[i % len(names)], alphabet)
+        start = time.perf_counter()
+        _, current = search_matches(query, limit=TOP_N)
+        latencies.append(time.perf_counter() - start)
+        stale += not current
+    if writes:
+        print(f"  穿插 {writes} 次寫入，{stale} 次查詢的結果來自背景重建完成前的舊索引")
+    return report(f"{len(latencies)} 次 search_dishes()", latencies, None, args.target_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='菜名模糊搜尋效能測試')
+    parser.add_argument('--rows', default='1m', help='產生的菜名數：10k、1m 或數字（預設 1m）')
+    parser.add_argument('--queries', type=int, default=1000, help='查詢次數（預設 1000）')
+    parser.add_argument('--target-ms', type=float, default=10, help='p95 延遲目標（毫秒，預設 10）')
+    parser.add_argument('--no-numpy', action='store_true', help='使用純 Python 的計數')
+    parser.add_argument('--from-db', action='store_true', help='對資料庫中現有的菜餚執行 search_dishes()')
+    parser.add_argument('--write-every', type=int, default=0,
+                        help='搭配 --from-db：每 N 次查詢穿插一次寫入（預設不寫入）')
+    args = parser.parse_args()
+
+    ok = bench_database(args) if args.from_db else bench_index(args)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+效能測試共用工具 - 計算 SQL 查詢數與清空菜單資料
+
+需在 Django 設定完成後匯入（例如先匯入 final_manager）。
+"""
+
+from django.db import connection
+
+from menu.models import Dish, Category, MealTime
+from menu.versioning import menu_write
+
+
+class QueryCounter:
+    """以 connection.execute_wrapper 計算執行的 SQL 數"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+def reset_menu():
+    """刪除所有菜餚、食材類別與供應時段（與 delete_all_data 相同，但不詢問也不輸出）"""
+    with menu_write():
+        Dish.objects.all().delete()
+        Category.objects.all().delete()
+        MealTime.objects.all().delete()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+向量化清理效能測試 - 比較 DataManager.clean_data 的 apply 與向量化版本
+
+用法: python benchmarks/bench_vectorized_clean.py [筆數]
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from data_manager import DataManager
+
+
+def make_frame(count, seed=42):
+    """產生帶有常見髒資料的 DataFrame（模擬 pd.read_csv 的結果）"""
+    rng = random.Random(seed)
+    names = ['叉燒飯', '乾炒牛河', '鮮蝦雲吞麵', '凱撒沙拉', '羅宋湯', '烤鮭魚排']
+    categories = ['豬肉', '牛肉', '海鮮', '蔬菜', '雞肉', None]
+    times = ['午餐', '晚餐', '早餐', '午餐晚餐', '早餐 午餐', '午餐,晚餐', '早餐午餐晚餐', None]
+    prices = ['{:.2f}', '{:.0f}元', '¥{:.2f}', '價格{:.1f}']
+
+    return pd.DataFrame({
+        '菜名': [f"{rng.choice(names)}{'@#  '[i % 4]}{i}" for i in range(count)],
+        '主要食材': [rng.choice(categories) for _ in range(count)],
+        '供應時段': [rng.choice(times) for _ in range(count)],
+        '價格(元)': [rng.choice(prices).format(rng.uniform(20, 300)) for _ in range(count)],
+        '熱量(卡路里)': [rng.randint(100, 1200) for _ in range(count)],
+    })
+
+
+def run(frame, vectorized):
+    """回傳 (秒數, 清理後的 DataFrame)"""
+    manager = DataManager()
+    manager.df = frame.copy()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.clean_data(vectorized=vectorized)
+    return time.perf_counter() - start, manager.df
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    frame = make_frame(count)
+    print(f"測試資料: {count} 筆")
+
+    apply_time, expected = run(frame, vectorized=False)
+    vector_time, result = run(frame, vectorized=True)
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"{'方法':<12} {'秒數':<10} {'筆/秒':<12}")
+    print("-" * 36)
+    print(f"{'apply':<12} {apply_time:<10.2f} {count / apply_time:<12.0f}")
+    print(f"{'vectorized':<12} {vector_time:<10.2f} {count / vector_time:<12.0f}")
+    print(f"加速比: {apply_time / vector_time:.2f}x（清理結果一致）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
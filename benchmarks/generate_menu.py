@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+測試資料產生器 - 以固定種子產生帶有常見髒資料的菜單 CSV
+
+注入清理流程要處理的各種問題：
+  * 價格帶「元」、「¥」、「NTD」等單位，少數寫成中文數字（轉換後為 0）
+  * 熱量帶「卡」、「cal」單位
+  * 菜名、類別混入 @#$ 等符號與多餘空白
+  * 供應時段寫成「午餐晚餐」、「早餐 午餐」等連在一起的形式
+  * 重複菜名（清理後相同，供驗證「以最後一筆為準」與修復流程）
+
+用法: python benchmarks/generate_menu.py 10k|1m|10m|筆數 [輸出檔案] [--seed N]
+"""
+
+import csv
+import os
+import random
+import sys
+
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+
+HEADER = ['菜名', '主要食材', '供應時段', '價格(元)', '熱量(卡路里)']
+
+NAMES = ['叉燒飯', '乾炒牛河', '鮮蝦雲吞麵', '凱撒沙拉', '羅宋湯', '烤鮭魚排', '麻婆豆腐', '白切雞',
+         '蠔油生菜', '咖喱牛腩飯', '糖醋排骨', '椒鹽鮮魷', '南瓜濃湯', '提拉米蘇', '英式早餐', '墨魚麵']
+CATEGORIES = ['豬肉', '牛肉', '海鮮', '蔬菜', '雞肉']
+MEAL_TIMES = ['早餐', '午餐', '晚餐', '午餐晚餐', '早餐午餐', '早餐 午餐', '午餐 晚餐', '午餐,晚餐',
+              '早餐,午餐,晚餐', '早餐午餐晚餐']
+PRICE_FORMATS = ['{:.2f}', '{:.0f}元', '¥{:.2f}', '{:.1f} NTD', '價格{:.1f}']
+CALORIE_FORMATS = ['{}', '{}卡', '{} cal', '約{}卡']
+NOISE = ['', '', '', '@', '#', '$', '@#', '  ', ' $ ']
+# 插在文字中間的只用符號（清理時會被移除），空白只出現在前後
+INNER_NOISE = ['@', '#', '$', '@#']
+
+# 各種髒資料出現的比例
+DUPLICATE_RATE = 0.05
+UNPARSEABLE_PRICE_RATE = 0.01
+
+
+def parse_size(text):
+    return SIZES.get(text.lower()) or int(text)
+
+
+def noisy(rng, text):
+    """在文字中間或前後插入符號與空白"""
+    if len(text) > 1 and rng.random() < 0.3:
+        cut = rng.randrange(1, len(text))
+        text = text[:cut] + rng.choice(INNER_NOISE) + text[cut:]
+    return rng.choice(NOISE) + text + rng.choice(NOISE)
+
+
+def iter_rows(count, seed=42):
+    """產生 count 筆 [菜名, 主要食材, 供應時段, 價格, 熱量]"""
+    rng = random.Random(seed)
+    for i in range(count):
+        # 重複菜名：沿用先前的編號，清理後與那一筆同名
+        number = rng.randrange(i) if i and rng.random() < DUPLICATE_RATE else i
+        name = f"{NAMES[number % len(NAMES)]}{number}"
+
+        if rng.random() < UNPARSEABLE_PRICE_RATE:
+            price = rng.choice(['一百二十', 'abc', '時價'])
+        else:
+            price = rng.choice(PRICE_FORMATS).format(rng.uniform(20, 300))
+
+        yield [
+            noisy(rng, name),
+            noisy(rng, rng.choice(CATEGORIES)),
+            rng.choice(MEAL_TIMES),
+            price,
+            rng.choice(CALORIE_FORMATS).format(rng.randint(100, 1200)),
+        ]
+
+
+def generate(file_path, count, seed=42):
+    """寫出 CSV（含 BOM，與 Excel 匯出的檔案相同），回傳筆數"""
+    with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(iter_rows(count, seed))
+    return count
+
+
+def main():
+    args = sys.argv[1:]
+    seed = 42
+    if '--seed' in args:
+        position = args.index('--seed')
+        seed = int(args[position + 1])
+        del args[position:position + 2]
+    if not args:
+        print(__doc__.strip().splitlines()[-1])
+        return 1
+
+    count = parse_size(args[0])
+    file_path = args[1] if len(args) > 1 else f"menu_{args[0].lower()}.csv"
+    generate(file_path, count, seed)
+    print(f"✓ 已產生 {count} 筆資料到 {file_path}（{os.path.getsize(file_path)} bytes, seed={seed}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+匯入流程效能測試套件 - 依序量測 FoodDataManager 的各個階段
+
+每個階段記錄秒數、筆/秒與查詢數，結果寫成 JSON；階段回傳 False 時記為失敗
+但繼續量測其餘階段。指定 --compare 時與先前的基準比較，筆/秒下降或查詢數
+增加超過容許值即回傳 1。
+
+--memory 另外以 tracemalloc 把整套流程再跑一次，記錄每個階段執行期間 Python
+配置的峰值（每個階段開始前重設峰值；不含資料庫驅動等 C 層的配置）。
+tracemalloc 會讓各階段慢數倍，因此秒數與筆/秒一律取自沒有追蹤的那一次。
+會清空並重建資料庫中的菜單資料，需加上 --yes 確認。
+
+用法:
+    python benchmarks/run_benchmarks.py --yes [--rows 10k | --csv 檔案]
+        [--output baseline.json] [--compare baseline.json] [--tolerance 0.2] [--memory]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.db import connection
+
+from final_manager import FoodDataManager
+from bench_utils import QueryCounter, reset_menu
+from generate_menu import generate, parse_size
+from menu.models import Dish
+
+DEFAULT_TOLERANCE = 0.2
+
+
+def measure(func, rows):
+    """執行 func 並回傳該階段的量測結果（管理工具的輸出全部丟棄）
+
+    rows 為處理的筆數，或在 func 執行後才計算筆數的函式；ok 為 func 是否沒有
+    回傳 False。tracemalloc 追蹤中時 peak_mb 為這個階段的峰值，否則為 None。
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            ok = func()
+            seconds = time.perf_counter() - start
+    peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1) if tracing else None
+    if callable(rows):
+        rows = rows()
+    return {
+        'ok': ok is not False,
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'queries': counter.count,
+        'peak_mb': peak,
+    }
+
+
+def run_suite(csv_path, export_path):
+    manager = FoodDataManager()
+    reset_menu()
+
+    stages = {}
+    stages['load_csv'] = measure(lambda: manager.load_csv(csv_path), lambda: len(manager.data))
+    rows = stages['load_csv']['rows']
+    stages['clean_data'] = measure(manager.clean_data, rows)
+    stages['import_to_database'] = measure(lambda: manager.import_to_database(bulk=True), len(manager.data))
+    dishes = Dish.objects.count()
+    stages['export_to_csv'] = measure(lambda: manager.export_to_csv(export_path, stream=True), dishes)
+    stages['fix_zero_prices'] = measure(manager.fix_zero_prices, dishes)
+    stages['fix_all_prices_from_csv'] = measure(manager.fix_all_prices_from_csv, dishes)
+    return stages
+
+
+def measure_memory(csv_path, export_path, stages):
+    """在 tracemalloc 下再跑一次整套流程，把各階段的峰值填入 stages"""
+    tracemalloc.start()
+    try:
+        traced = run_suite(csv_path, export_path)
+    finally:
+        tracemalloc.stop()
+    for name, stage in stages.items():
+        stage['peak_mb'] = traced[name]['peak_mb']
+
+
+def compare(stages, baseline, tolerance):
+    """回傳退步的項目說明清單"""
+    regressions = []
+    for name, current in stages.items():
+        if not current['ok']:
+            regressions.append(f"{name}: 執行失敗")
+        previous = baseline['stages'].get(name)
+        if not previous:
+            continue
+        if previous['rows_per_sec'] and current['rows_per_sec'] is not None:
+            ratio = current['rows_per_sec'] / previous['rows_per_sec']
+            if ratio < 1 - tolerance:
+                regressions.append(f"{name}: 筆/秒 {previous['rows_per_sec']} → {current['rows_per_sec']} ({ratio:.0%})")
+        if current['queries'] > previous['queries'] * (1 + tolerance):
+            regressions.append(f"{name}: 查詢數 {previous['queries']} → {current['queries']}")
+    return regressions
+
+
+def print_table(stages, baseline=None):
+    print(f"{'階段':<26} {'秒數':<9} {'筆/秒':<11} {'查詢數':<8} {'峰值MB':<8} {'基準筆/秒':<10}")
+    print("-" * 80)
+    for name, stage in stages.items():
+        previous = (baseline or {}).get('stages', {}).get(name, {}).get('rows_per_sec', '')
+        print(f"{name:<26} {stage['seconds']:<9.2f} {stage['rows_per_sec'] or 0:<11.0f} "
+              f"{stage['queries']:<8} {stage['peak_mb'] or '-':<8} {previous:<10}{'' if stage['ok'] else ' ✗ 失敗'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='匯入流程效能測試套件')
+    parser.add_argument('--yes', action='store_true', help='確認會清空資料庫中的菜單資料')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--rows', default='10k', help='產生的測試資料筆數：10k、1m、10m 或數字（預設 10k）')
+    source.add_argument('--csv', help='改用現有的 CSV 檔案')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='把結果寫成 JSON 基準檔')
+    parser.add_argument('--compare', help='與先前的 JSON 基準比較')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'容許的退步比例（預設 {DEFAULT_TOLERANCE}）')
+    parser.add_argument('--memory', action='store_true',
+                        help='另外以 tracemalloc 再跑一次，記錄各階段的峰值記憶體')
+    args = parser.parse_args()
+
+    if not args.yes:
+        print("此測試會清空資料庫中的菜單資料，請加上 --yes 確認")
+        return 1
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if not csv_path:
+            csv_path = os.path.join(tmp, 'menu.csv')
+            generate(csv_path, parse_size(args.rows), args.seed)
+        stages = run_suite(csv_path, os.path.join(tmp, 'export.csv'))
+        if args.memory:
+            measure_memory(csv_path, os.path.join(tmp, 'export.csv'), stages)
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'source': args.csv or f"generated:{args.rows}:seed={args.seed}",
+            'database': connection.vendor,
+            'python': platform.python_version(),
+        },
+        'stages': stages,
+    }
+    print_table(stages, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 結果已寫入 {args.output}")
+
+    if baseline:
+        regressions = compare(stages, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ 與基準相比有 {len(regressions)} 項退步:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\n✓ 與基準相比沒有超過 {args.tolerance:.0%} 的退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
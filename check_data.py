@@ -1,4 +1,10 @@
 #!/usr/bin/env python3
+"""
+資料庫檢查報告 - 統計數字由 menu.health 以彙總查詢算出，不逐筆讀取菜餚
+
+用法: python check_data.py [--json]
+"""
+import json
 import os
 import sys
 
@@ -9,43 +15,31 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import django
 django.setup()
 
-from menu.models import Dish, Category, MealTime
-
-print("資料庫檢查報告")
-print("=" * 50)
+from menu.health import format_report, health_report
 
-# 檢查總數
-total_dishes = Dish.objects.count()
-total_categories = Category.objects.count()
-total_meal_times = MealTime.objects.count()
+report = health_report()
 
-print(f"菜餚總數: {total_dishes}")
-print(f"食材類別總數: {total_categories}")
-print(f"供應時段總數: {total_meal_times}")
+if '--json' in sys.argv[1:]:
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0)
 
-# 檢查資料完整性
-print("\n詳細資料:")
-print("-" * 80)
-print(f"{'菜名':<20} {'類別':<10} {'價格':<8} {'熱量':<10} {'供應時段':<20}")
-print("-" * 80)
-
-for dish in Dish.objects.all():
-    meal_times = ', '.join([mt.name for mt in dish.meal_times.all()])
-    print(f"{dish.name[:18]:<20} {dish.category.name[:8]:<10} ¥{dish.price:<7} {dish.calories:<10} {meal_times[:18]:<20}")
+print("資料庫檢查報告")
+print("=" * 50)
+print(format_report(report))
 
-# 檢查是否有問題
+# 檢查是否有問題（範例資料 sample_clean.csv 的預期數量）
 print("\n檢查結果:")
-if total_dishes == 20:
+if report['dishes'] == 20:
     print("✓ 菜餚數量正確 (20筆)")
 else:
-    print(f"✗ 菜餚數量不正確: {total_dishes} 筆，應為 20 筆")
+    print(f"✗ 菜餚數量不正確: {report['dishes']} 筆，應為 20 筆")
 
-if total_categories == 5:
+if report['categories'] == 5:
     print("✓ 食材類別數量正確 (5種)")
 else:
-    print(f"✗ 食材類別數量不正確: {total_categories} 種，應為 5 種")
+    print(f"✗ 食材類別數量不正確: {report['categories']} 種，應為 5 種")
 
-if total_meal_times == 3:
+if report['meal_times'] == 3:
     print("✓ 供應時段數量正確 (3種)")
 else:
-    print(f"✗ 供應時段數量不正確: {total_meal_times} 種，應為 3 種")
\ No newline at end of file
+    print(f"✗ 供應時段數量不正確: {report['meal_times']} 種，應為 3 種")
@@ -1,6 +1,5 @@
 import os
 import sys
-import pandas as pd
 import re
 from datetime import datetime
 
@@ -9,18 +8,38 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_project.settings')
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import django
-django.setup()
+from django.apps import apps
+if not apps.ready:  # 由 manage.py 指令匯入時 Django 已經初始化
+    django.setup()
 
+from menu import cleaning, columnar
 from menu.models import Dish, Category, MealTime
+from menu.dimensions import DimensionCache
+from menu.instrumentation import instrumented
+from menu.meal_masks import meal_time_names, refresh_masks
+from menu.summary import summary_delta
+from menu.importer import DEFAULT_BATCH_SIZE, bulk_upsert_dishes
+from menu.exporting import write_export_csv
+from menu.versioning import menu_write
+
+def _frame_rows(manager, result):
+    """量測用：目前 DataFrame 的筆數"""
+    return 0 if manager.df is None else len(manager.df)
 
 class DataManager:
     def __init__(self):
         self.df = None
+        self.is_clean_snapshot = False  # 載入的是已清理的型別化快照時可略過清理
+        self.dimensions = DimensionCache()  # 類別／時段的名稱 → id 快取
         
+    @instrumented(rows=_frame_rows)
     def load_csv(self, file_path):
         """載入 CSV 檔案"""
+        import pandas as pd
+        
         try:
             self.df = pd.read_csv(file_path)
+            self.is_clean_snapshot = False
             print(f"成功載入檔案: {file_path}")
             print(f"資料筆數: {len(self.df)}")
             return True
@@ -28,47 +47,71 @@ class DataManager:
             print(f"載入檔案失敗: {e}")
             return False
     
-    def clean_data(self):
-        """清理資料"""
+    @instrumented(rows=_frame_rows)
+    def load_table(self, file_path, file_format=None):
+        """載入 Parquet/Feather 檔案（依副檔名判斷格式）"""
+        import pandas as pd
+        
+        try:
+            table, typed = columnar.read_table(file_path, file_format)
+            if typed:
+                meal_times = table.column('meal_times').to_pylist()
+                self.df = pd.DataFrame({
+                    '菜名': table.column('name').to_pylist(),
+                    '主要食材': table.column('category').to_pylist(),
+                    '供應時段': [','.join(times) for times in meal_times],
+                    '價格(元)': table.column('price').to_pandas().astype(float),
+                    '熱量(卡路里)': table.column('calories').to_pandas().astype(int),
+                    'meal_times_list': meal_times,
+                })
+            else:
+                self.df = table.to_pandas()
+            self.is_clean_snapshot = typed
+            print(f"成功載入檔案: {file_path}")
+            print(f"資料筆數: {len(self.df)}" + ("（已清理的快照）" if typed else ""))
+            return True
+        except Exception as e:
+            print(f"載入檔案失敗: {e}")
+            return False
+    
+    @instrumented(rows=_frame_rows)
+    def clean_data(self, vectorized=True):
+        """清理資料
+
+        vectorized=False 時改用逐格 apply 的舊方法（結果相同，供效能比較）
+        """
         if self.df is None:
             print("請先載入資料")
             return False
         
+        if self.is_clean_snapshot:
+            print("資料已是清理過的快照，略過清理")
+            return True
+        
         print("開始清理資料...")
         
         # 清理每一列
         for col in self.df.columns:
             if self.df[col].dtype == 'object':
-                self.df[col] = self.df[col].astype(str).apply(self._clean_string)
+                if vectorized:
+                    self.df[col] = self._clean_series(self.df[col].astype(str))
+                else:
+                    self.df[col] = self.df[col].astype(str).apply(self._clean_string)
         
         # 處理供應時段
-        self._process_meal_times()
+        self._process_meal_times(vectorized)
         
         print("資料清理完成")
         return True
     
     def _clean_string(self, text):
-        """清理字串"""
+        """清理字串 - 套用 menu.cleaning 的共用規則"""
+        import pandas as pd
+        
         if pd.isna(text):
             return ""
         
-        # 移除特殊符號
-        text = re.sub(r'[#$%^&*()_+=\[\]{}|;:"<>?/~`]', '', str(text))
-        
-        # 修正常見錯誤
-        corrections = {
-            '午餐晚餐': '午餐,晚餐',
-            '早餐午餐': '早餐,午餐',
-            '午餐 晚餐': '午餐,晚餐',
-            '早餐 午餐': '早餐,午餐',
-        }
-        
-        for wrong, correct in corrections.items():
-            text = text.replace(wrong, correct)
-        
-        # 移除多餘空格
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
+        text = cleaning.clean_text(str(text))
         
         # 處理價格和熱量的清理
         if '價格' in str(text) or '熱量' in str(text):
@@ -77,12 +120,35 @@ class DataManager:
         
         return text
     
-    def _process_meal_times(self):
+    def _clean_series(self, series):
+        """清理整欄字串 - _clean_string 的向量化版本"""
+        series = cleaning.clean_text.clean_series(series)
+        
+        # 處理價格和熱量的清理
+        mask = series.str.contains('價格|熱量', regex=True)
+        if mask.any():
+            series = series.where(~mask, series[mask].str.replace(r'[^\d.]', '', regex=True))
+        
+        return series
+    
+    def _process_meal_times(self, vectorized=True):
         """處理供應時段欄位"""
+        import pandas as pd
+        
         if '供應時段' in self.df.columns:
             # 確保所有值都是字串
             self.df['供應時段'] = self.df['供應時段'].astype(str)
             
+            if vectorized:
+                # 時段組合的種類很少，只分割不重複的值再展開回每一列
+                codes, uniques = pd.factorize(self.df['供應時段'])
+                parts = pd.Series(uniques, dtype=object).str.split(r'[,\s]+', regex=True)
+                unique_lists = [[t for t in pieces if t] for pieces in parts]
+                self.df['meal_times_list'] = pd.Series(
+                    [list(unique_lists[code]) for code in codes], index=self.df.index, dtype=object
+                )
+                return
+            
             # 分割多個時段
             def split_meal_times(times):
                 if pd.isna(times):
@@ -92,8 +158,15 @@ class DataManager:
             
             self.df['meal_times_list'] = self.df['供應時段'].apply(split_meal_times)
     
+    @instrumented(rows=_frame_rows)
     def format_data(self):
         """格式化資料"""
+        import pandas as pd
+        
+        if self.is_clean_snapshot:
+            print("資料已是型別化的快照，略過格式化")
+            return True
+        
         print("格式化資料...")
         
         # 確保欄位存在
@@ -114,14 +187,23 @@ class DataManager:
         print("資料格式化完成")
         return True
     
-    def import_to_db(self):
-        """匯入資料到資料庫"""
+    @instrumented(rows=_frame_rows)
+    def import_to_db(self, bulk=True, batch_size=DEFAULT_BATCH_SIZE):
+        """匯入資料到資料庫
+
+        預設（bulk=True）以整欄運算準備資料，交給批次 upsert 引擎寫入，每 batch_size
+        筆一個交易，與 FoodDataManager.import_to_database 的預設相同；bulk=False 時使用
+        逐列 iterrows 的舊方法（每筆一個交易，查詢數隨筆數增加，供效能比較）
+        """
         if self.df is None:
             print("請先載入並清理資料")
             return False
         
         print("開始匯入資料到資料庫...")
         
+        if bulk:
+            return self._bulk_import(batch_size)
+        
         imported_count = 0
         error_count = 0
         
@@ -129,42 +211,98 @@ class DataManager:
             try:
                 # 取得或創建食材類別
                 category_name = self._clean_string(row['主要食材'])
-                category, _ = Category.objects.get_or_create(name=category_name)
+                category_id = self.dimensions.category_id(category_name)
                 
                 # 取得或創建供應時段
                 meal_times = []
                 if hasattr(row, 'meal_times_list'):
-                    for meal_time_name in row.meal_times_list:
-                        meal_time, _ = MealTime.objects.get_or_create(name=meal_time_name)
-                        meal_times.append(meal_time)
-                
-                # 創建或更新菜餚
-                dish, created = Dish.objects.update_or_create(
-                    name=row['菜名'],
-                    defaults={
-                        'category': category,
-                        'price': float(row['價格(元)']),
-                        'calories': int(row['熱量(卡路里)']),
-                    }
-                )
+                    meal_times = self.dimensions.meal_time_ids(row.meal_times_list)
                 
-                # 設定供應時段
-                if meal_times:
-                    dish.meal_times.set(meal_times)
+                # 創建或更新菜餚與供應時段（同一個交易，並更新菜單版本與統計表）
+                with menu_write(), summary_delta(Dish.objects.filter(name=row['菜名'])):
+                    dish, created = Dish.objects.update_or_create(
+                        name=row['菜名'],
+                        defaults={
+                            'category_id': category_id,
+                            'price': float(row['價格(元)']),
+                            'calories': int(row['熱量(卡路里)']),
+                            'fingerprint': '',
+                        }
+                    )
+                    
+                    # 設定供應時段
+                    if meal_times:
+                        dish.meal_times.set(meal_times)
+                        refresh_masks([dish.id])
                 
                 if created:
                     imported_count += 1
                 
             except Exception as e:
+                self.dimensions.reset()
                 print(f"匯入 {row.get('菜名', '未知')} 失敗: {e}")
                 error_count += 1
         
         print(f"匯入完成! 成功: {imported_count}, 失敗: {error_count}")
         return True
     
-    def export_to_csv(self, file_path):
-        """從資料庫匯出到 CSV"""
+    def _bulk_import(self, batch_size):
+        """以欄為單位準備紀錄並批次寫入"""
+        import pandas as pd
+        
+        df = self.df
+        names = df['菜名']
+        categories = self._clean_series(df['主要食材'].fillna('').astype(str))
+        prices = pd.to_numeric(df['價格(元)'], errors='coerce')
+        calories = pd.to_numeric(df['熱量(卡路里)'], errors='coerce')
+        if 'meal_times_list' in df.columns:
+            meal_times = df['meal_times_list']
+        else:
+            meal_times = pd.Series([None] * len(df), index=df.index, dtype=object)
+        
+        invalid = names.isna() | prices.isna() | calories.isna()
+        for name in names[invalid]:
+            print(f"匯入 {name} 失敗: 價格或熱量無效")
+        
+        valid = ~invalid
+        records = [
+            {
+                'name': name,
+                'category': category,
+                'price': price,
+                'calories': int(calorie),
+                # 與舊方法相同：沒有供應時段時不變更既有設定
+                'meal_times': times or None,
+            }
+            for name, category, price, calorie, times in zip(
+                names[valid].astype(str), categories[valid], prices[valid], calories[valid], meal_times[valid]
+            )
+        ]
+        
+        result = bulk_upsert_dishes(records, batch_size=batch_size, dimensions=self.dimensions)
+        for error in result['errors']:
+            print(f"匯入失敗: {error}")
+        
+        print(f"匯入完成! 新增: {result['created']}, 更新: {result['updated']}, "
+              f"失敗: {int(invalid.sum()) + len(result['errors'])}")
+        return True
+    
+    @instrumented()
+    def export_to_csv(self, file_path, stream=False, compression=None):
+        """從資料庫匯出到 CSV
+
+        stream=True 時不建立 DataFrame，改以伺服器端游標分批讀取並逐列寫出；
+        compression 可為 'gzip' 或 'zstd'（未指定時依副檔名判斷）
+        """
+        import pandas as pd
+        
         try:
+            if stream:
+                count = write_export_csv(file_path, compression, price_as_float=True)
+                print(f"成功匯出到: {file_path}")
+                print(f"匯出筆數: {count}")
+                return True
+            
             dishes = Dish.objects.all().select_related('category').prefetch_related('meal_times')
             
             data = []
@@ -179,7 +317,7 @@ class DataManager:
                 })
             
             df_export = pd.DataFrame(data)
-            df_export.to_csv(file_path, index=False, encoding='utf-8-sig')
+            df_export.to_csv(file_path, index=False, encoding='utf-8-sig', compression=compression or 'infer')
             
             print(f"成功匯出到: {file_path}")
             print(f"匯出筆數: {len(df_export)}")
@@ -189,26 +327,41 @@ class DataManager:
             print(f"匯出失敗: {e}")
             return False
     
+    @instrumented()
+    def export_snapshot(self, file_path, file_format=None):
+        """從資料庫匯出型別化的 Parquet/Feather 快照（依副檔名判斷格式）"""
+        try:
+            count = columnar.export_snapshot(file_path, file_format)
+            print(f"成功匯出到: {file_path}")
+            print(f"匯出筆數: {count}")
+            return True
+        except Exception as e:
+            print(f"匯出失敗: {e}")
+            return False
+    
     def list_dishes(self, limit=20):
         """列出菜餚"""
-        dishes = Dish.objects.all().select_related('category')[:limit]
+        dishes = list(Dish.objects.all().select_related('category')[:limit])
+        names = meal_time_names((dish.id, dish.meal_time_mask) for dish in dishes)
         
         print(f"\n{'菜名':<20} {'主要食材':<10} {'價格':<8} {'熱量':<8} {'時段':<15}")
         print("-" * 70)
         
         for dish in dishes:
-            meal_times = ','.join([mt.name for mt in dish.meal_times.all()])
+            meal_times = ','.join(names[dish.id])
             print(f"{dish.name[:18]:<20} {dish.category.name[:8]:<10} ¥{dish.price:<7} {dish.calories:<8} {meal_times[:14]:<15}")
         
         print(f"\n總計: {Dish.objects.count()} 筆記錄")
     
-    def delete_all_data(self):
-        """刪除所有資料"""
-        confirm = input("確定要刪除所有資料嗎？(yes/no): ")
+    def delete_all_data(self, assume_yes=False):
+        """刪除所有資料；assume_yes=True 時不詢問確認（供非互動指令使用）"""
+        confirm = 'yes' if assume_yes else input("確定要刪除所有資料嗎？(yes/no): ")
         if confirm.lower() == 'yes':
-            Dish.objects.all().delete()
-            Category.objects.all().delete()
-            MealTime.objects.all().delete()
+            with menu_write():
+                Dish.objects.all().delete()
+                Category.objects.all().delete()
+                MealTime.objects.all().delete()
+            self.dimensions.reset()
             print("所有資料已刪除")
         else:
             print("取消刪除")
@@ -7,45 +7,68 @@ import os
 import sys
 import csv
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 
 # 設置 Django 環境
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_project.settings')
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import django
-django.setup()
+from django.apps import apps
+if not apps.ready:  # 由 manage.py 指令匯入時 Django 已經初始化
+    django.setup()
 
+from asgiref.sync import async_to_sync
+from django.db import IntegrityError, transaction
+
+from menu import cleaning, columnar
 from menu.models import Dish, Category, MealTime
+from menu.exporting import (
+    DEFAULT_CHUNK_SIZE as EXPORT_CHUNK_SIZE, EXPORT_HEADER, open_export_file, write_export_csv,
+)
+from menu.dedup import (
+    DEFAULT_MERGE_THRESHOLD, DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD, existing_dish_names, find_duplicates,
+    write_report,
+)
+from menu.dimensions import DimensionCache
+from menu.health import format_report, health_report
+from menu.instrumentation import instrumented
+from menu.meal_masks import meal_time_names, refresh_masks
+from menu.pg_loader import copy_import
+from menu.pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
+from menu.progress import ENV_REJECTS, ProgressReporter, RejectsFile, count_csv_rows, env_verbose, resolve_verbose
+from menu.summary import summary_delta
+from menu.versioning import deferred_version, menu_write
+from menu.importer import (
+    DEFAULT_BATCH_SIZE, bulk_repair_dishes, bulk_upsert_dishes, chunked, dish_fingerprint,
+    incremental_sync_dishes,
+)
+
+DEFAULT_CHUNK_SIZE = 10000
+PARALLEL_CHUNK_SIZE = 5000
+
+def _data_rows(manager, result):
+    """量測用：目前載入（或清理後）的資料筆數"""
+    return len(manager.data)
 
 class FoodDataManager:
     def __init__(self):
         self.data = []
         self.original_csv_data = []  # 保存原始CSV數據以供修復使用
+        self.dimensions = DimensionCache()  # 類別／時段的名稱 → id 快取
+        self.name_mapping = {}  # 近似重複的菜名 → 合併的目標菜名（見 dedupe_names，只套用在下一次匯入）
+        self.verbose = env_verbose()  # 逐筆輸出：True / False / None 依筆數決定（見 menu.progress）
+        self.rejects = None  # RejectsFile：逐筆的警告與錯誤寫到這個檔案
     
     def clean_text(self, text):
-        """清理文字 - 修正包含 @ 符號"""
+        """清理文字 - 套用 menu.cleaning 的共用規則（包含移除 @ 符號）"""
         if not text or str(text).lower() == 'nan':
             return ""
         
-        text = str(text)
-        # 移除特殊符號 - 包含 @ 符號
-        text = re.sub(r'[#$%^&*()_+=\[\]{}|;:"<>?/~`@]', '', text)
-        
-        # 修正常見錯誤
-        corrections = {
-            '午餐晚餐': '午餐,晚餐',
-            '早餐午餐': '早餐,午餐',
-            '午餐 晚餐': '午餐,晚餐',
-            '早餐 午餐': '早餐,午餐',
-        }
-        
-        for wrong, correct in corrections.items():
-            text = text.replace(wrong, correct)
-        
-        # 移除多餘空格
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return cleaning.clean_text(str(text))
     
     def process_price(self, price_str):
         """處理價格字串轉換為浮點數 - 修正版"""
@@ -111,238 +134,521 @@ class FoodDataManager:
         except:
             return 0
     
+    def _load_row(self, row, line=None):
+        """對 CSV 的每個欄位套用 clean_text；line 為 CSV 中的行號，記在「行號」欄供警告使用"""
+        loaded = {key: self.clean_text(value) for key, value in row.items()}
+        if line is not None:
+            loaded['行號'] = line
+        return loaded
+    
+    def _print_preview(self, title, rows):
+        """印出前3筆資料，不含只供警告使用的「行號」欄"""
+        print(f"\n{title}:")
+        for i, row in enumerate(rows[:3]):
+            preview = {key: value for key, value in row.items() if key != '行號'}
+            print(f"  第{i+1}筆: {preview}")
+    
+    def _reporter(self, label, total=None):
+        """建立進度回報（見 menu.progress），沿用 self.verbose 與 self.rejects"""
+        return ProgressReporter(label, total, verbose=self.verbose, rejects=self.rejects)
+    
+    @instrumented(rows=_data_rows)
     def load_csv(self, file_path):
         """載入 CSV 檔案"""
         try:
             with open(file_path, 'r', encoding='utf-8-sig') as f:
                 reader = csv.DictReader(f)
-                self.original_csv_data = []
-                for row in reader:
-                    cleaned_row = {}
-                    for key, value in row.items():
-                        cleaned_row[key] = self.clean_text(value)
-                    self.original_csv_data.append(cleaned_row)
+                self.original_csv_data = [self._load_row(row, reader.line_num) for row in reader]
             
             self.data = self.original_csv_data.copy()  # 複製一份給其他方法使用
             
             print(f"✓ 成功載入 {len(self.data)} 筆資料")
             
-            # 顯示載入的資料預覽
-            if self.data and len(self.data) > 0:
-                print("\n前3筆資料預覽:")
-                for i, row in enumerate(self.data[:3]):
-                    print(f"  第{i+1}筆: {row}")
+            # 顯示載入的資料預覽（只在逐筆輸出時）
+            if self.data and resolve_verbose(self.verbose, len(self.data)):
+                self._print_preview("前3筆資料預覽", self.data)
             
             return True
         except Exception as e:
             print(f"✗ 載入失敗: {e}")
             return False
     
-    def clean_data(self):
-        """清理資料 - 修正價格處理"""
+    def iter_csv_chunks(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """逐塊讀取 CSV 檔案，每次產生最多 chunk_size 筆已套用 clean_text 的資料"""
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            yield from chunked((self._load_row(row, reader.line_num) for row in reader), chunk_size)
+    
+    def _clean_row(self, row, warnings, debug=True):
+        """清理單筆資料，無效資料回傳 None，警告附加到 warnings
+
+        警告為 ProgressReporter.reject() 的參數（dict，含 CSV 行號、欄位與原始值）。
+        debug=True 時保留原始價格/熱量字串以供除錯
+        """
+        # 檢查必要欄位
+        dish_name = row.get('菜名') or ''
+        if not dish_name:
+            warnings.append({'row': row.get('行號'), 'field': '菜名', 'value': dish_name,
+                             'message': '缺少菜名，略過這筆資料', 'level': 'error'})
+            return None
+        
+        # 標準化欄位名稱
+        standardized_row = {
+            '菜名': self.clean_text(row.get('菜名', '')),
+            '主要食材': self.clean_text(row.get('主要食材', '未知')),
+            '供應時段': self.clean_text(row.get('供應時段', '')),
+            '價格(元)': self.clean_text(row.get('價格(元)', row.get('價格', '0'))),
+            '熱量(卡路里)': self.clean_text(row.get('熱量(卡路里)', row.get('熱量', '0'))),
+            '行號': row.get('行號'),
+        }
+        
+        # 處理供應時段分割
+        times_str = standardized_row['供應時段']
+        if times_str:
+            times_list = [t.strip() for t in re.split(r'[,，\s]+', times_str) if t.strip()]
+            standardized_row['供應時段列表'] = times_list
+        else:
+            standardized_row['供應時段列表'] = []
+        
+        # 處理價格轉換 - 使用修正的方法
+        price_str = standardized_row['價格(元)']
+        standardized_row['價格_數值'] = self.process_price(price_str)
+        
+        # 處理熱量轉換 - 使用修正的方法
+        cal_str = standardized_row['熱量(卡路里)']
+        standardized_row['熱量_數值'] = self.process_calories(cal_str)
+        
+        # 記錄原始值以供除錯
+        if debug:
+            standardized_row['原始價格'] = price_str
+            standardized_row['原始熱量'] = cal_str
+        
+        # 顯示有問題的轉換
+        if standardized_row['價格_數值'] == 0 and price_str and price_str != '0':
+            warnings.append({'row': row.get('行號'), 'name': standardized_row['菜名'], 'field': '價格(元)',
+                             'value': price_str, 'message': '價格轉換可能失敗，以 0 計算'})
+        
+        return standardized_row
+    
+    def _clean_rows(self, rows, debug=True):
+        """清理多筆資料，回傳 (有效資料, 警告)，順序與輸入一致"""
+        processed_data = []
+        warnings = []
+        for row in rows:
+            try:
+                standardized_row = self._clean_row(row, warnings, debug)
+            except Exception as e:
+                warnings.append({'row': row.get('行號'), 'message': f"清理資料時發生錯誤: {e}", 'level': 'error'})
+                continue
+            if standardized_row is not None:
+                processed_data.append(standardized_row)
+        return processed_data, warnings
+    
+    def _iter_cleaned(self, chunks, workers=None, debug=True):
+        """逐塊清理，產生 (有效資料, 警告)
+
+        workers > 1 時以 ProcessPoolExecutor 平行清理；最多同時送出
+        workers * 2 個區塊，並依輸入順序取回結果，輸出與逐筆清理完全一致。
+        """
+        if not workers or workers <= 1:
+            for chunk in chunks:
+                yield self._clean_rows(chunk, debug)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_clean_chunk, chunk, debug))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    @instrumented(rows=_data_rows)
+    def clean_data(self, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+        """清理資料 - 修正價格處理
+
+        workers > 1 時把資料切成 chunk_size 筆的區塊平行清理
+        """
         if not self.data:
             print("沒有資料可清理")
             return False
         
         print("開始清理資料...")
         
+        reporter = self._reporter("清理", len(self.data))
         processed_data = []
-        for row in self.data:
-            try:
-                # 檢查必要欄位
-                dish_name = row.get('菜名') or row.get('菜名') or ''
-                if not dish_name:
-                    print(f"警告: 跳過缺少菜名的資料: {row}")
-                    continue
-                
-                # 標準化欄位名稱
-                standardized_row = {
-                    '菜名': self.clean_text(row.get('菜名', '')),
-                    '主要食材': self.clean_text(row.get('主要食材', row.get('主要食材', '未知'))),
-                    '供應時段': self.clean_text(row.get('供應時段', row.get('供應時段', ''))),
-                    '價格(元)': self.clean_text(row.get('價格(元)', row.get('價格', '0'))),
-                    '熱量(卡路里)': self.clean_text(row.get('熱量(卡路里)', row.get('熱量', '0'))),
-                }
-                
-                # 處理供應時段分割
-                times_str = standardized_row['供應時段']
-                if times_str:
-                    times_list = [t.strip() for t in re.split(r'[,，\s]+', times_str) if t.strip()]
-                    standardized_row['供應時段列表'] = times_list
-                else:
-                    standardized_row['供應時段列表'] = []
-                
-                # 處理價格轉換 - 使用修正的方法
-                price_str = standardized_row['價格(元)']
-                standardized_row['價格_數值'] = self.process_price(price_str)
-                
-                # 處理熱量轉換 - 使用修正的方法
-                cal_str = standardized_row['熱量(卡路里)']
-                standardized_row['熱量_數值'] = self.process_calories(cal_str)
-                
-                # 記錄原始值以供除錯
-                standardized_row['原始價格'] = price_str
-                standardized_row['原始熱量'] = cal_str
-                
-                processed_data.append(standardized_row)
-                
-                # 顯示有問題的轉換
-                if standardized_row['價格_數值'] == 0 and price_str and price_str != '0':
-                    print(f"  警告: 價格轉換可能失敗 '{price_str}' -> 0")
-                
-            except Exception as e:
-                print(f"清理資料時發生錯誤 (資料: {row}): {e}")
+        for rows, warnings in self._iter_cleaned(chunked(self.data, chunk_size), workers):
+            self._report_warnings(reporter, warnings)
+            # 區塊依輸入順序取回，除最後一塊外都是 chunk_size 筆
+            reporter.advance(min(chunk_size, len(self.data) - reporter.rows))
+            processed_data.extend(rows)
         
         self.data = processed_data
         print(f"✓ 資料清理完成，有效資料: {len(self.data)} 筆")
+        reporter.close()
         
-        # 顯示清理後的資料預覽
-        if self.data and len(self.data) > 0:
-            print("\n清理後前3筆資料:")
-            for i, row in enumerate(self.data[:3]):
-                print(f"  第{i+1}筆: {row}")
+        # 顯示清理後的資料預覽（只在逐筆輸出時）
+        if self.data and reporter.verbose:
+            self._print_preview("清理後前3筆資料", self.data)
         
         return True
     
-    def import_to_database(self):
-        """匯入到資料庫 - 修正版"""
+    def _report_warnings(self, reporter, warnings):
+        for warning in warnings:
+            reporter.reject(**warning)
+    
+    def _report_errors(self, reporter, errors):
+        """匯入失敗的菜餚（「菜名: 錯誤」字串）記為錯誤"""
+        for error in errors:
+            reporter.reject(error, level='error')
+    
+    def iter_clean_chunks(self, chunks, reporter, workers=None):
+        """逐塊清理資料（不保留除錯欄位），警告依原順序交給 reporter"""
+        for rows, warnings in self._iter_cleaned(chunks, workers, debug=False):
+            self._report_warnings(reporter, warnings)
+            yield rows
+    
+    @instrumented(rows=_data_rows)
+    def import_to_database(self, bulk=True, batch_size=DEFAULT_BATCH_SIZE, incremental=False):
+        """匯入到資料庫 - 修正版
+
+        預設使用批次 upsert 引擎，每 batch_size 筆在單一交易中寫入，查詢數與
+        筆數無關；bulk=False 時改為逐筆寫入（manage.py menu_import --mode row）。
+        incremental=True 時把資料視為完整菜單，依內容指紋只寫入新增、變更
+        的菜餚，並刪除資料中已不存在的菜餚。
+        """
+        name_mapping = self._take_name_mapping()
         if not self.data:
             print("沒有資料可匯入")
             return False
         
-        success = 0
-        errors = []
-        
         print("開始匯入到資料庫...")
         
-        # 先建立一個菜名到資料的映射（使用清理後的菜名）
+        dish_name_to_data = self._map_by_name(self.data, name_mapping)
+        print(f"可用的菜品資料: {len(dish_name_to_data)} 筆")
+        
+        if incremental:
+            return self._incremental_import(dish_name_to_data, batch_size)
+        
+        reporter = self._reporter("匯入", len(dish_name_to_data))
+        if bulk:
+            created, updated, errors = self._bulk_import(dish_name_to_data, batch_size, reporter)
+        else:
+            created, updated, errors = self._row_import(dish_name_to_data, reporter, batch_size)
+        success = created + updated
+        
+        print(f"\n匯入完成! 成功: {success} (新增: {created}, 更新: {updated}), 失敗: {len(errors)}")
+        self._report_errors(reporter, errors)
+        reporter.close()
+        
+        return success > 0
+    
+    def _take_name_mapping(self):
+        """取出 dedupe_names 的菜名對照並清空：對照只屬於緊接著的這一次匯入"""
+        name_mapping, self.name_mapping = self.name_mapping, {}
+        return name_mapping
+    
+    def _map_by_name(self, rows, name_mapping):
+        """建立菜名到資料的映射（使用清理後的菜名），重複菜名以最後一筆為準
+
+        name_mapping（見 _take_name_mapping）中的近似重複菜名會先改為合併的目標菜名
+        """
         dish_name_to_data = {}
-        for row in self.data:
+        for row in rows:
             cleaned_name = self.clean_text(row.get('菜名', ''))
+            cleaned_name = name_mapping.get(cleaned_name, cleaned_name)
             if cleaned_name:
                 dish_name_to_data[cleaned_name] = row
+        return dish_name_to_data
+    
+    def csv_dish_names(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """逐塊讀取 CSV 中清理後的菜名（供串流匯入前的近似重複偵測）"""
+        for chunk in self.iter_csv_chunks(file_path, chunk_size):
+            for row in chunk:
+                yield self.clean_text(row.get('菜名', ''))
+    
+    @instrumented()
+    def dedupe_names(self, names=None, threshold=DEFAULT_DEDUP_THRESHOLD, merge_threshold=DEFAULT_MERGE_THRESHOLD,
+                     report_path=None):
+        """偵測近似重複的菜名（檔案內，以及與資料庫中的菜名），見 menu.dedup
+
+        names 未提供時使用清理後的 self.data。相似度不低於 merge_threshold 的
+        菜名在之後的匯入中改為目標菜名（合併成同一道菜），其餘只列在報告中；
+        report_path 寫出 CSV 合併報告。對照只套用在下一次匯入（之後即清空），
+        不會沿用到同一個 FoodDataManager 之後匯入的其他檔案。
+        """
+        if names is None:
+            if not self.data:
+                print("沒有資料可比對")
+                return False
+            names = (self.clean_text(row.get('菜名', '')) for row in self.data)
         
-        print(f"可用的菜品資料: {len(dish_name_to_data)} 筆")
+        print("開始偵測近似重複的菜名...")
+        try:
+            result = find_duplicates(names, existing_dish_names(), threshold, merge_threshold)
+        except RuntimeError as e:
+            print(f"✗ 近似重複偵測失敗: {e}")
+            return False
         
-        for cleaned_name, row in dish_name_to_data.items():
-            try:
-                category_name = self.clean_text(row.get('主要食材', '未知'))
-                price = row.get('價格_數值', 0.0)
-                calories = row.get('熱量_數值', 0)
-                meal_times_str = row.get('供應時段', '')
-                meal_times_list = row.get('供應時段列表', [])
-                
-                # 顯示除錯資訊（如果有問題）
-                if price == 0:
-                    print(f"  注意: {cleaned_name} 價格為0 (原始: {row.get('原始價格', 'N/A')})")
-                
-                # 取得或創建食材類別
-                category, _ = Category.objects.get_or_create(name=category_name)
-                
-                # 創建或更新菜餚
-                dish, created = Dish.objects.update_or_create(
-                    name=cleaned_name,
-                    defaults={
-                        'category': category,
-                        'price': price,
-                        'calories': calories,
-                    }
-                )
-                
-                # 設定供應時段
-                meal_time_objects = []
-                for time_name in meal_times_list:
-                    meal_time, _ = MealTime.objects.get_or_create(name=time_name)
-                    meal_time_objects.append(meal_time)
-                
-                dish.meal_times.set(meal_time_objects)
-                
-                success += 1
+        self.name_mapping = result.mapping
+        print(f"✓ 比對 {result.names} 個菜名（候選配對 {result.candidate_pairs}），"
+              f"找到 {len(result.matches)} 個近似重複，自動合併 {len(self.name_mapping)} 個")
+        for match in result.matches[:5]:
+            action = "合併" if match['merged'] else "相似"
+            print(f"  {action}: {match['name']} -> {match['target']} (相似度 {match['similarity']:.2f})")
+        if len(result.matches) > 5:
+            print(f"  ... 還有 {len(result.matches) - 5} 個")
+        
+        if report_path:
+            write_report(result, report_path)
+            print(f"✓ 合併報告已寫入 {report_path}")
+        return True
+    
+    def _row_import(self, dish_name_to_data, reporter, batch_size=DEFAULT_BATCH_SIZE):
+        """逐筆匯入，回傳 (新增數, 更新數, 錯誤清單)
+
+        每 batch_size 筆在一個交易中寫入，每道菜在自己的 savepoint 中寫入，失敗只回滾
+        該筆；供應時段遮罩與統計表每批更新一次。菜單版本在全部寫完後才更新一次（見 deferred_version）
+        """
+        with deferred_version():
+            return self._write_rows(dish_name_to_data, reporter, batch_size)
+    
+    def _write_rows(self, dish_name_to_data, reporter, batch_size):
+        created_count = 0
+        updated_count = 0
+        errors = []
+        
+        for batch in chunked(dish_name_to_data.items(), batch_size):
+            # 記錄有問題的資料
+            for cleaned_name, row in batch:
+                if row.get('價格_數值', 0.0) == 0:
+                    self._report_zero_price(reporter, cleaned_name, row)
+            
+            written, batch_errors = self._write_row_batch(batch)
+            errors.extend(batch_errors)
+            for record, created in written:
                 if created:
-                    print(f"  ✓ 新增: {cleaned_name} (¥{price}, {calories}卡)")
+                    created_count += 1
                 else:
-                    print(f"  ✓ 更新: {cleaned_name} (¥{price}, {calories}卡)")
+                    updated_count += 1
+                self._report_row(reporter, record, created)
+        
+        return created_count, updated_count, errors
+    
+    def _write_row_batch(self, batch, retry=True):
+        """在一個交易中逐筆寫入一批 (菜名, 資料)，回傳 ([(紀錄, 是否新增)], 錯誤清單)
+
+        外鍵在提交時才檢查：快取中的類別或時段已被其他程序刪除時整批提交失敗，
+        重新載入快取後重試一次，仍然失敗時改為每筆各自提交，只有壞掉的菜餚失敗。
+        """
+        written = []
+        errors = []
+        try:
+            # 類別與時段在交易外建立，避免整批回滾後快取了不存在的 id
+            self.dimensions.resolve(Category, [self.clean_text(row.get('主要食材', '未知')) for _, row in batch])
+            self.dimensions.resolve(MealTime, [name for _, row in batch for name in row.get('供應時段列表', [])])
+            
+            # 統計表依整批寫入前後的差值更新一次
+            with menu_write(), summary_delta(Dish.objects.filter(name__in=[name for name, _ in batch])):
+                dish_ids = []
+                for cleaned_name, row in batch:
+                    try:
+                        category_name = self.clean_text(row.get('主要食材', '未知'))
+                        price = row.get('價格_數值', 0.0)
+                        calories = row.get('熱量_數值', 0)
+                        meal_times_list = row.get('供應時段列表', [])
+                        
+                        # 食材類別與供應時段已在上面建立，這裡只查快取
+                        category_id = self.dimensions.category_id(category_name)
+                        meal_time_ids = self.dimensions.meal_time_ids(meal_times_list)
+                        
+                        # 創建或更新菜餚與供應時段（失敗時只回滾這一筆）
+                        with transaction.atomic():
+                            dish, created = Dish.objects.update_or_create(
+                                name=cleaned_name,
+                                defaults={
+                                    'category_id': category_id,
+                                    'price': price,
+                                    'calories': calories,
+                                    'fingerprint': dish_fingerprint(category_name, price, calories, meal_times_list),
+                                }
+                            )
+                            dish.meal_times.set(meal_time_ids)
+                    except Exception as e:
+                        self.dimensions.reset()
+                        errors.append(f"{cleaned_name}: {e}")
+                        continue
+                    
+                    dish_ids.append(dish.id)
+                    written.append(({'name': cleaned_name, 'price': price, 'calories': calories}, created))
                 
-            except Exception as e:
-                errors.append(f"{cleaned_name}: {e}")
+                # 這批菜餚的供應時段遮罩一次重算
+                refresh_masks(dish_ids)
+        except IntegrityError as e:
+            self.dimensions.reset()
+            if retry:
+                return self._write_row_batch(batch, retry=False)
+            if len(batch) == 1:
+                return [], [f"{batch[0][0]}: {e}"]
+            written, errors = [], []
+            for item in batch:
+                item_written, item_errors = self._write_row_batch([item], retry=False)
+                written += item_written
+                errors += item_errors
+        return written, errors
+    
+    def _build_records(self, dish_name_to_data, reporter):
+        """轉換成批次匯入引擎使用的紀錄"""
+        records = []
+        for cleaned_name, row in dish_name_to_data.items():
+            price = row.get('價格_數值', 0.0)
+            if price == 0:
+                self._report_zero_price(reporter, cleaned_name, row)
+            records.append({
+                'name': cleaned_name,
+                'category': self.clean_text(row.get('主要食材', '未知')),
+                'price': price,
+                'calories': row.get('熱量_數值', 0),
+                'meal_times': row.get('供應時段列表', []),
+            })
+        return records
+    
+    def _report_zero_price(self, reporter, cleaned_name, row):
+        reporter.reject('價格為0', row=row.get('行號'), name=cleaned_name, field='價格(元)',
+                        value=row.get('原始價格', row.get('價格(元)')))
+    
+    def _report_row(self, reporter, record, created):
+        """每寫入一筆：累計計數，逐筆輸出時顯示"""
+        if created:
+            reporter.advance(created=1)
+        else:
+            reporter.advance(updated=1)
+        if reporter.verbose:
+            action = "新增" if created else "更新"
+            print(f"  ✓ {action}: {record['name']} (¥{record['price']}, {record['calories']}卡)")
+    
+    def _bulk_import(self, dish_name_to_data, batch_size, reporter, written=None):
+        """批次匯入，回傳 (新增數, 更新數, 錯誤清單)"""
+        records = self._build_records(dish_name_to_data, reporter)
+        return self._upsert_records(records, batch_size, reporter, written)
+    
+    def _upsert_records(self, records, batch_size, reporter, written=None):
+        """以批次匯入引擎寫入紀錄，回傳 (新增數, 更新數, 錯誤清單)
+
+        written 為這次執行中已寫入的菜名（逐塊匯入時各區塊共用）：同一道菜在後面的
+        區塊再次出現時仍會寫入（以最後一筆為準），但不再計入新增或更新
+        """
+        counts = {True: 0, False: 0}
         
-        print(f"\n匯入完成! 成功: {success}, 失敗: {len(errors)}")
-        if errors:
-            print("錯誤清單（前5個）:")
-            for error in errors[:5]:
-                print(f"  - {error}")
+        def on_row(record, created):
+            if written is not None:
+                if record['name'] in written:
+                    return
+                written.add(record['name'])
+            counts[created] += 1
+            self._report_row(reporter, record, created)
         
-        return success > 0
+        result = bulk_upsert_dishes(records, batch_size=batch_size, on_row=on_row, dimensions=self.dimensions)
+        return counts[True], counts[False], result['errors']
     
-    def fix_zero_prices(self):
-        """修復價格為0的菜品"""
+    def _incremental_import(self, dish_name_to_data, batch_size):
+        """增量匯入，只寫入新增、變更與移除的菜餚"""
+        # 未變更的菜餚不會寫入，事先不知道要寫入的筆數；是否逐筆輸出仍依資料筆數決定
+        reporter = ProgressReporter(
+            "增量匯入", verbose=resolve_verbose(self.verbose, len(dish_name_to_data)), rejects=self.rejects
+        )
+        records = self._build_records(dish_name_to_data, reporter)
+        result = incremental_sync_dishes(
+            records, batch_size=batch_size, on_row=partial(self._report_row, reporter), dimensions=self.dimensions
+        )
+        
+        print(f"\n增量匯入完成! 新增: {result['inserted']}, 變更: {result['changed']}, "
+              f"移除: {result['removed']}, 未變更: {result['unchanged']}, 失敗: {len(result['errors'])}")
+        self._report_errors(reporter, result['errors'])
+        reporter.close()
+        
+        return not result['errors']
+    
+    def _build_csv_index(self):
+        """建立 清理後菜名 → CSV 資料 的索引（同名時取第一筆，與逐筆搜尋的結果相同）"""
+        index = {}
+        for csv_row in self.original_csv_data:
+            index.setdefault(self.clean_text(csv_row.get('菜名', '')), csv_row)
+        return index
+    
+    def _repair_values(self, csv_row):
+        """從 CSV 資料取得 (價格, 熱量, 類別名稱或 None, 供應時段列表或 None)"""
+        price_str = csv_row.get('價格(元)', csv_row.get('價格', '0'))
+        cal_str = csv_row.get('熱量(卡路里)', csv_row.get('熱量', '0'))
+        
+        category_name = self.clean_text(csv_row.get('主要食材', '未知')) or None
+        
+        meal_times_str = csv_row.get('供應時段', '')
+        times_list = None
+        if meal_times_str:
+            times_list = [t.strip() for t in re.split(r'[,，\s]+', meal_times_str) if t.strip()]
+        
+        return self.process_price(price_str), self.process_calories(cal_str), category_name, times_list
+    
+    @instrumented()
+    def fix_zero_prices(self, batch_size=DEFAULT_BATCH_SIZE):
+        """修復價格為0的菜品，回傳是否修復了任何菜品（沒有價格為0的菜品時回傳 True）
+
+        無法修復的菜品（CSV 中找不到或價格仍無效）記為警告。
+        """
         if not self.original_csv_data:
             print("警告: 請先載入CSV數據")
             return False
         
-        zero_price_dishes = Dish.objects.filter(price=0)
-        print(f"找到 {zero_price_dishes.count()} 個價格為0的菜品")
+        zero_price_dishes = list(Dish.objects.filter(price=0).only('id', 'name', 'category'))
+        print(f"找到 {len(zero_price_dishes)} 個價格為0的菜品")
         
-        if zero_price_dishes.count() == 0:
+        if not zero_price_dishes:
             print("沒有需要修復的菜品")
             return True
         
-        fixed_count = 0
-        
+        index = self._build_csv_index()
+        remaining = []
+        changes = []
         for dish in zero_price_dishes:
-            # 在CSV數據中尋找匹配的菜品
-            for csv_row in self.original_csv_data:
-                csv_dish_name = self.clean_text(csv_row.get('菜名', ''))
-                
-                if csv_dish_name == dish.name:
-                    # 找到匹配的菜品，修復價格和熱量
-                    price_str = csv_row.get('價格(元)', csv_row.get('價格', '0'))
-                    cal_str = csv_row.get('熱量(卡路里)', csv_row.get('熱量', '0'))
-                    
-                    price = self.process_price(price_str)
-                    calories = self.process_calories(cal_str)
-                    
-                    if price > 0:  # 只有當找到有效價格時才更新
-                        dish.price = price
-                        dish.calories = calories
-                        dish.save()
-                        
-                        # 也更新食材類別和供應時段
-                        category_name = self.clean_text(csv_row.get('主要食材', '未知'))
-                        if category_name:
-                            category, _ = Category.objects.get_or_create(name=category_name)
-                            dish.category = category
-                        
-                        # 更新供應時段
-                        meal_times_str = csv_row.get('供應時段', '')
-                        if meal_times_str:
-                            times_list = [t.strip() for t in re.split(r'[,，\s]+', meal_times_str) if t.strip()]
-                            meal_time_objects = []
-                            for time_name in times_list:
-                                meal_time, _ = MealTime.objects.get_or_create(name=time_name)
-                                meal_time_objects.append(meal_time)
-                            dish.meal_times.set(meal_time_objects)
-                        
-                        dish.save()
-                        
-                        print(f"  ✓ 修復: {dish.name} -> ¥{price}, {calories}卡")
-                        fixed_count += 1
-                    break  # 找到匹配就跳出循環
+            csv_row = index.get(dish.name)
+            if csv_row is not None:
+                price, calories, category_name, times_list = self._repair_values(csv_row)
+                if price > 0:  # 只有當找到有效價格時才更新
+                    dish.price = price
+                    dish.calories = calories
+                    changes.append((dish, category_name, times_list))
+                    continue
+            remaining.append((dish.name, csv_row))
         
-        print(f"\n修復完成! 修復了 {fixed_count} 個菜品的價格")
+        reporter = self._reporter("修復", len(changes))
+        for dish_name, csv_row in remaining:
+            if csv_row is None:
+                reporter.reject('CSV 中找不到這道菜，無法修復', name=dish_name)
+            else:
+                reporter.reject('CSV 中的價格無效，無法修復', row=csv_row.get('行號'), name=dish_name,
+                                field='價格(元)', value=csv_row.get('價格(元)', csv_row.get('價格')))
+        
+        def report(dish):
+            reporter.advance(fixed=1)
+            if reporter.verbose:
+                print(f"  ✓ 修復: {dish.name} -> ¥{dish.price}, {dish.calories}卡")
         
-        # 檢查是否還有價格為0的菜品
-        remaining_zero = Dish.objects.filter(price=0).count()
-        if remaining_zero > 0:
-            print(f"仍有 {remaining_zero} 個菜品價格為0:")
-            for dish in Dish.objects.filter(price=0)[:10]:  # 只顯示前10個
-                print(f"  - {dish.name}")
-            if remaining_zero > 10:
-                print(f"  ... 還有 {remaining_zero - 10} 個")
+        fixed_count = bulk_repair_dishes(
+            changes, batch_size=batch_size, on_row=report, dimensions=self.dimensions
+        )
+        
+        print(f"\n修復完成! 修復了 {fixed_count} 個菜品的價格")
+        # 無法修復的菜品已記為警告
+        if remaining:
+            print(f"仍有 {len(remaining)} 個菜品價格為0")
+        reporter.close()
         
         return fixed_count > 0
     
-    def fix_all_prices_from_csv(self):
+    @instrumented()
+    def fix_all_prices_from_csv(self, batch_size=DEFAULT_BATCH_SIZE):
         """從CSV文件修復所有菜品的價格（強制更新）"""
         if not self.original_csv_data:
             print("警告: 請先載入CSV數據")
@@ -350,96 +656,140 @@ class FoodDataManager:
         
         print("開始從CSV修復所有菜品價格...")
         
-        fixed_count = 0
-        total_dishes = Dish.objects.count()
+        index = self._build_csv_index()
+        missing_dishes = []
+        reporter = self._reporter("修復", Dish.objects.count())
         
-        for dish in Dish.objects.all():
-            # 在CSV數據中尋找匹配的菜品
-            for csv_row in self.original_csv_data:
-                csv_dish_name = self.clean_text(csv_row.get('菜名', ''))
+        def changes():
+            for dish in Dish.objects.only('id', 'name', 'category').iterator(chunk_size=batch_size):
+                csv_row = index.get(dish.name)
+                if csv_row is None:
+                    missing_dishes.append(dish.name)
+                    continue
                 
-                if csv_dish_name == dish.name:
-                    # 找到匹配的菜品，更新價格和熱量
-                    price_str = csv_row.get('價格(元)', csv_row.get('價格', '0'))
-                    cal_str = csv_row.get('熱量(卡路里)', csv_row.get('熱量', '0'))
-                    
-                    price = self.process_price(price_str)
-                    calories = self.process_calories(cal_str)
-                    
-                    # 更新數據庫記錄
-                    dish.price = price
-                    dish.calories = calories
-                    
-                    # 更新食材類別
-                    category_name = self.clean_text(csv_row.get('主要食材', '未知'))
-                    if category_name:
-                        category, _ = Category.objects.get_or_create(name=category_name)
-                        dish.category = category
-                    
-                    # 更新供應時段
-                    meal_times_str = csv_row.get('供應時段', '')
-                    if meal_times_str:
-                        times_list = [t.strip() for t in re.split(r'[,，\s]+', meal_times_str) if t.strip()]
-                        meal_time_objects = []
-                        for time_name in times_list:
-                            meal_time, _ = MealTime.objects.get_or_create(name=time_name)
-                            meal_time_objects.append(meal_time)
-                        dish.meal_times.set(meal_time_objects)
-                    
-                    dish.save()
-                    
-                    print(f"  ✓ 更新: {dish.name} -> ¥{price}, {calories}卡")
-                    fixed_count += 1
-                    break  # 找到匹配就跳出循環
+                price, calories, category_name, times_list = self._repair_values(csv_row)
+                dish.price = price
+                dish.calories = calories
+                yield dish, category_name, times_list
+        
+        def report(dish):
+            reporter.advance(fixed=1)
+            if reporter.verbose:
+                print(f"  ✓ 更新: {dish.name} -> ¥{dish.price}, {dish.calories}卡")
+        
+        fixed_count = bulk_repair_dishes(
+            changes(), batch_size=batch_size, on_row=report, dimensions=self.dimensions
+        )
+        total_dishes = fixed_count + len(missing_dishes)
         
         print(f"\n修復完成! 更新了 {fixed_count}/{total_dishes} 個菜品的價格")
+        reporter.close()
         
         # 顯示未找到的菜品
-        if fixed_count < total_dishes:
-            print(f"有 {total_dishes - fixed_count} 個菜品在CSV中找不到:")
-            all_dish_names = set(dish.name for dish in Dish.objects.all())
-            csv_dish_names = set(self.clean_text(row.get('菜名', '')) for row in self.original_csv_data)
-            missing_dishes = all_dish_names - csv_dish_names
-            
-            for dish_name in list(missing_dishes)[:10]:  # 只顯示前10個
+        if missing_dishes:
+            print(f"有 {len(missing_dishes)} 個菜品在CSV中找不到:")
+            for dish_name in missing_dishes[:10]:  # 只顯示前10個
                 print(f"  - {dish_name}")
             if len(missing_dishes) > 10:
                 print(f"  ... 還有 {len(missing_dishes) - 10} 個")
         
         return True
     
-    def export_to_csv(self, file_path=None):
-        """從資料庫匯出到 CSV"""
+    @instrumented()
+    def export_to_csv(self, file_path=None, stream=False, compression=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """從資料庫匯出到 CSV
+
+        stream=True 時以伺服器端游標分批讀取並在 SQL 中彙總供應時段，
+        記憶體用量不隨資料量增加；compression 可為 'gzip' 或 'zstd'
+        （未指定時依副檔名 .gz / .zst 判斷）。
+        """
         if not file_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             file_path = f"menu_export_{timestamp}.csv"
         
         try:
-            dishes = Dish.objects.all().select_related('category').prefetch_related('meal_times')
-            
-            with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                # 寫入標題行（包含 BOM 用於 Excel 兼容）
-                f.write('\ufeff')
-                writer.writerow(['菜名', '主要食材', '供應時段', '價格(元)', '熱量(卡路里)'])
+            if stream:
+                count = write_export_csv(file_path, compression, chunk_size)
+            else:
+                dishes = Dish.objects.all().select_related('category').prefetch_related('meal_times')
                 
-                for dish in dishes:
-                    meal_times = ','.join([mt.name for mt in dish.meal_times.all()])
-                    writer.writerow([dish.name, dish.category.name, meal_times, dish.price, dish.calories])
+                count = 0
+                # utf-8-sig 已寫入 BOM 供 Excel 辨識
+                with open_export_file(file_path, compression) as f:
+                    writer = csv.writer(f)
+                    writer.writerow(EXPORT_HEADER)
+                    
+                    for dish in dishes:
+                        meal_times = ','.join([mt.name for mt in dish.meal_times.all()])
+                        writer.writerow([dish.name, dish.category.name, meal_times, dish.price, dish.calories])
+                        count += 1
             
-            print(f"✓ 成功匯出 {dishes.count()} 筆資料到 {file_path}")
+            print(f"✓ 成功匯出 {count} 筆資料到 {file_path}")
             return True
             
         except Exception as e:
             print(f"✗ 匯出失敗: {e}")
             return False
     
+    @instrumented()
+    def export_snapshot(self, file_path, file_format=None):
+        """從資料庫匯出型別化的 Parquet/Feather 快照（依副檔名判斷格式）"""
+        try:
+            count = columnar.export_snapshot(file_path, file_format)
+        except Exception as e:
+            print(f"✗ 匯出失敗: {e}")
+            return False
+        
+        print(f"✓ 成功匯出 {count} 筆資料到 {file_path}")
+        return True
+    
+    @instrumented()
+    def import_snapshot(self, file_path, file_format=None, batch_size=DEFAULT_BATCH_SIZE):
+        """匯入 Parquet/Feather 檔案
+
+        本工具匯出的型別化快照已經清理過，直接交給批次匯入引擎，不再呼叫
+        clean_text；其他欄式檔案則與 CSV 相同逐批清理後匯入。
+        """
+        print("開始匯入欄式檔案...")
+        
+        name_mapping = self._take_name_mapping()
+        created = 0
+        updated = 0
+        failed = 0
+        written = set()  # 已寫入的菜名，重複出現在後面批次的菜餚不重複計數
+        try:
+            reporter = self._reporter("匯入", columnar.count_rows(file_path, file_format))
+            for batch, typed in columnar.iter_batches(file_path, file_format, batch_size):
+                if typed:
+                    batch_created, batch_updated, batch_errors = self._upsert_records(
+                        columnar.snapshot_records(batch), batch_size, reporter, written
+                    )
+                else:
+                    rows = [self._load_row(row) for row in columnar.raw_rows(batch)]
+                    cleaned = next(self.iter_clean_chunks([rows], reporter))
+                    batch_created, batch_updated, batch_errors = self._bulk_import(
+                        self._map_by_name(cleaned, name_mapping), batch_size, reporter, written
+                    )
+                created += batch_created
+                updated += batch_updated
+                failed += len(batch_errors)
+                self._report_errors(reporter, batch_errors)
+        except Exception as e:
+            print(f"✗ 匯入失敗: {e}")
+            return False
+        
+        print(f"\n匯入完成! 新增: {created}, 更新: {updated}, 失敗: {failed}")
+        reporter.close()
+        return created + updated > 0
+    
     def list_dishes(self, limit=None):
         """列出菜餚"""
         if limit:
-            dishes = Dish.objects.all().select_related('category').prefetch_related('meal_times')[:limit]
+            dishes = list(Dish.objects.all().select_related('category')[:limit])
         else:
-            dishes = Dish.objects.all().select_related('category').prefetch_related('meal_times')
+            dishes = list(Dish.objects.all().select_related('category'))
+        # 供應時段由遮罩解碼，不需要 JOIN 中介表
+        names = meal_time_names((dish.id, dish.meal_time_mask) for dish in dishes)
         
         print(f"\n{'菜名':<20} {'主要食材':<10} {'價格':<10} {'熱量':<10} {'供應時段':<15}")
         print("=" * 70)
@@ -447,7 +797,7 @@ class FoodDataManager:
         zero_price_count = 0
         
         for dish in dishes:
-            meal_times = ','.join([mt.name for mt in dish.meal_times.all()])
+            meal_times = ','.join(names[dish.id])
             price_display = f"¥{dish.price:.2f}"
             
             # 檢查價格是否為0
@@ -461,21 +811,62 @@ class FoodDataManager:
         if zero_price_count > 0:
             print(f"⚠️ 警告: 有 {zero_price_count} 個菜品價格為0")
     
-    def delete_all_data(self):
-        """刪除所有資料"""
-        confirm = input("確定要刪除所有資料嗎？(yes/no): ")
+    def get_status(self):
+        """資料庫狀態摘要（見 menu.health，兩個彙總查詢）"""
+        return health_report()
+    
+    def show_status(self):
+        """顯示資料庫狀態"""
+        status = self.get_status()
+        print()
+        print(format_report(status))
+        return status
+    
+    def delete_all_data(self, assume_yes=False):
+        """刪除所有資料；assume_yes=True 時不詢問確認（供非互動指令使用）"""
+        confirm = 'yes' if assume_yes else input("確定要刪除所有資料嗎？(yes/no): ")
         if confirm.lower() == 'yes':
-            Dish.objects.all().delete()
-            Category.objects.all().delete()
-            MealTime.objects.all().delete()
+            with menu_write():
+                Dish.objects.all().delete()
+                Category.objects.all().delete()
+                MealTime.objects.all().delete()
+            self.dimensions.reset()
             print("✓ 所有資料已刪除")
             return True
         else:
             print("✗ 取消刪除")
             return False
     
-    def run_full_import(self, file_path):
-        """執行完整匯入流程"""
+    @instrumented(rows=_data_rows)
+    def copy_to_database(self):
+        """以 PostgreSQL COPY 暫存表一次合併整份資料（單一交易）"""
+        name_mapping = self._take_name_mapping()
+        if not self.data:
+            print("沒有資料可匯入")
+            return False
+        
+        print("開始以 COPY 匯入到資料庫...")
+        
+        dish_name_to_data = self._map_by_name(self.data, name_mapping)
+        print(f"可用的菜品資料: {len(dish_name_to_data)} 筆")
+        
+        reporter = self._reporter("COPY 匯入", len(dish_name_to_data))
+        try:
+            result = copy_import(self._build_records(dish_name_to_data, reporter))
+        except Exception as e:
+            print(f"✗ COPY 匯入失敗: {e}")
+            return False
+        
+        print(f"\n匯入完成! 新增: {result['created']}, 更新: {result['updated']}")
+        reporter.close()
+        return True
+    
+    @instrumented()
+    def run_full_import(self, file_path, bulk=True, batch_size=DEFAULT_BATCH_SIZE, backend='orm'):
+        """執行完整匯入流程
+
+        backend='copy' 時改用 PostgreSQL COPY 暫存表合併（適合整份重新載入）
+        """
         print("開始完整匯入流程...")
         print("=" * 50)
         
@@ -485,10 +876,116 @@ class FoodDataManager:
         if not self.clean_data():
             return False
         
-        self.import_to_database()
+        if backend == 'copy':
+            self.copy_to_database()
+        else:
+            self.import_to_database(bulk=bulk, batch_size=batch_size)
         print("=" * 50)
         print("完整匯入流程完成")
     
+    @instrumented()
+    def run_streaming_import(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                             workers=None):
+        """以串流方式執行完整匯入流程
+
+        載入 → 清理 → 匯入 以 chunk_size 筆為單位逐塊處理，除了已寫入菜名的
+        集合（計數用）之外，記憶體用量只與 chunk_size 有關；workers > 1 時清理
+        階段改為平行處理。此模式不保留
+        self.data / self.original_csv_data，因此之後的修復功能需要另外以
+        load_csv 載入。
+        """
+        print("開始串流匯入流程...")
+        print("=" * 50)
+        
+        name_mapping = self._take_name_mapping()
+        rows = 0
+        created = 0
+        updated = 0
+        failed = 0
+        written = set()  # 已寫入的菜名，重複出現在後面區塊的菜餚不重複計數
+        try:
+            # 不整份載入，以換行數估計筆數（只用於剩餘時間與是否逐筆輸出）
+            reporter = self._reporter("串流匯入", count_csv_rows(file_path))
+            for chunk in self.iter_clean_chunks(self.iter_csv_chunks(file_path, chunk_size), reporter, workers):
+                rows += len(chunk)
+                chunk_created, chunk_updated, chunk_errors = self._bulk_import(
+                    self._map_by_name(chunk, name_mapping), batch_size, reporter, written
+                )
+                created += chunk_created
+                updated += chunk_updated
+                # 錯誤隨即交給 reporter（只保留前幾筆），不累積整份清單
+                failed += len(chunk_errors)
+                self._report_errors(reporter, chunk_errors)
+        except Exception as e:
+            print(f"✗ 串流匯入失敗: {e}")
+            return False
+        
+        print(f"\n串流匯入完成! 有效資料: {rows} 筆, 新增: {created}, 更新: {updated}, 失敗: {failed}")
+        reporter.close()
+        print("=" * 50)
+        return created + updated > 0
+    
+    @instrumented()
+    def run_async_import(self, file_path, chunk_size=PARALLEL_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                         workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """以 asyncio 管線執行完整匯入流程
+
+        讀取、清理、寫入三個階段同時進行，總耗時接近最慢的階段而不是三者
+        相加。queue_size 為階段之間最多暫存的區塊數（背壓）；workers > 1 時
+        清理階段在 ProcessPoolExecutor 中平行處理。與 run_streaming_import
+        相同，不保留 self.data / self.original_csv_data。
+        """
+        print("開始管線匯入流程...")
+        print("=" * 50)
+        
+        name_mapping = self._take_name_mapping()
+        totals = {'created': 0, 'updated': 0, 'failed': 0}
+        written = set()  # 已寫入的菜名，重複出現在後面區塊的菜餚不重複計數
+        try:
+            reporter = self._reporter("管線匯入", count_csv_rows(file_path))
+        except OSError as e:
+            print(f"✗ 管線匯入失敗: {e}")
+            return False
+        
+        def write(cleaned):
+            rows, warnings = cleaned
+            self._report_warnings(reporter, warnings)
+            dish_name_to_data = self._map_by_name(rows, name_mapping)
+            created, updated, errors = self._bulk_import(dish_name_to_data, batch_size, reporter, written)
+            totals['created'] += created
+            totals['updated'] += updated
+            totals['failed'] += len(errors)
+            self._report_errors(reporter, errors)
+            return len(rows)
+        
+        executor = ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+        try:
+            stats = async_to_sync(run_pipeline)(
+                self.iter_csv_chunks(file_path, chunk_size),
+                partial(_clean_chunk, debug=False),
+                write,
+                queue_size=queue_size,
+                executor=executor,
+                concurrency=workers or 1,
+            )
+        except Exception as e:
+            print(f"✗ 管線匯入失敗: {e}")
+            return False
+        finally:
+            if executor:
+                executor.shutdown()
+        
+        print(f"\n管線匯入完成! 有效資料: {stats.write.rows} 筆, 新增: {totals['created']}, "
+              f"更新: {totals['updated']}, 失敗: {totals['failed']}")
+        reporter.close()
+        
+        print(f"\n{'階段':<6} {'區塊':<6} {'筆數':<10} {'工作秒數':<10} {'筆/秒':<10}")
+        for stage in stats.stages:
+            print(f"{stage.name:<6} {stage.chunks:<6} {stage.rows:<10} {stage.busy:<10.2f} {stage.rows_per_second:<10.0f}")
+        print(f"總耗時: {stats.wall:.2f} 秒（各階段合計 {sum(stage.busy for stage in stats.stages):.2f} 秒）")
+        print("=" * 50)
+        return totals['created'] + totals['updated'] > 0
+    
     def reload_and_fix_all(self):
         """重新載入並修復所有數據"""
         print("重新載入並修復所有數據...")
@@ -522,9 +1019,15 @@ class FoodDataManager:
         print("重新載入並修復完成!")
         return True
 
+def _clean_chunk(rows, debug=True):
+    """平行清理的工作函式（模組層級才能被 ProcessPoolExecutor pickle）"""
+    return FoodDataManager()._clean_rows(rows, debug)
+
 def main():
     """主程式"""
     manager = FoodDataManager()
+    if os.environ.get(ENV_REJECTS):
+        manager.rejects = RejectsFile(os.environ[ENV_REJECTS])
     
     while True:
         print("\n" + "="*60)
@@ -584,24 +1087,7 @@ def main():
                 manager.run_full_import(file_path)
             
             elif choice == '8':
-                print(f"\n資料庫狀態:")
-                print(f"  • 菜餚數量: {Dish.objects.count()}")
-                print(f"  • 食材類別: {Category.objects.count()}")
-                print(f"  • 供應時段: {MealTime.objects.count()}")
-                
-                # 檢查價格為0的菜餚
-                zero_price = Dish.objects.filter(price=0).count()
-                if zero_price > 0:
-                    print(f"  • 價格為0的菜餚: {zero_price} (可能有問題)")
-                    print("  前5個價格為0的菜餚:")
-                    for dish in Dish.objects.filter(price=0)[:5]:
-                        print(f"    - {dish.name}")
-                
-                categories = Category.objects.all()
-                print(f"\n食材類別清單:")
-                for cat in categories:
-                    dish_count = Dish.objects.filter(category=cat).count()
-                    print(f"  • {cat.name}: {dish_count} 道菜")
+                manager.show_status()
             
             elif choice == '9':
                 manager.fix_zero_prices()
@@ -624,6 +1110,9 @@ def main():
             break
         except Exception as e:
             print(f"發生錯誤: {e}")
+    
+    if manager.rejects is not None:
+        manager.rejects.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,22 +1,157 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db.models import Case, IntegerField, Q, Value, When
+from .meal_masks import assign_bits, filter_meal_times, refresh_masks
 from .models import Category, MealTime, Dish
+from .pagination import EstimatedCountPaginator
+from .search import search_dishes
+from .summary import apply_delta, group_stats, summary_delta
+from .versioning import menu_write
+
+class MenuVersionAdminMixin:
+    """後台的新增、修改、刪除也會更新菜單版本（與變更在同一個交易中）"""
+    
+    def save_model(self, request, obj, form, change):
+        with menu_write():
+            super().save_model(request, obj, form, change)
+    
+    def delete_model(self, request, obj):
+        with menu_write():
+            super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        with menu_write():
+            super().delete_queryset(request, queryset)
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'description']
     search_fields = ['name']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # 類別名稱是菜餚指紋的一部分，改名後相關菜餚需要在下次增量匯入時重寫
+        if change and 'name' in form.changed_data:
+            obj.dishes.update(fingerprint='')
+    
+    def delete_model(self, request, obj):
+        # 刪除類別會連帶刪除菜餚，供應時段的統計要扣掉這些菜餚
+        with menu_write(), summary_delta(Dish.objects.filter(category=obj)):
+            super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        with menu_write(), summary_delta(Dish.objects.filter(category__in=list(queryset))):
+            super().delete_queryset(request, queryset)
 
 @admin.register(MealTime)
-class MealTimeAdmin(admin.ModelAdmin):
+class MealTimeAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            assign_bits()
+        if change and 'name' in form.changed_data:
+            obj.dishes.update(fingerprint='')
+    
+    def delete_model(self, request, obj):
+        with menu_write():
+            dish_ids = list(obj.dishes.values_list('id', flat=True))
+            obj.dishes.update(fingerprint='')
+            super().delete_model(request, obj)
+            # 刪除的時段旗標會被釋放，相關菜餚的遮罩要一起重算
+            refresh_masks(dish_ids)
+    
+    def delete_queryset(self, request, queryset):
+        with menu_write():
+            dishes = Dish.objects.filter(meal_times__in=queryset)
+            dish_ids = list(dishes.values_list('id', flat=True).distinct())
+            dishes.update(fingerprint='')
+            super().delete_queryset(request, queryset)
+            refresh_masks(dish_ids)
+
+class MealTimeFilter(admin.SimpleListFilter):
+    """依供應時段篩選，使用 Dish.meal_time_mask 而不 JOIN 中介表"""
+    title = '供應時段'
+    parameter_name = 'meal_time'
+    
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in MealTime.objects.order_by('name').values_list('name', flat=True)]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return filter_meal_times(queryset, [self.value()])
+        return queryset
+
+class DishChangeList(ChangeList):
+    """搜尋且沒有點選欄位排序時依相似度排序（search_rank 由 DishAdmin.get_search_results 加上）"""
+    
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        # ChangeList 在搜尋之前排序，這裡在加上 search_rank 之後重新排序
+        if self.query.strip() and ORDER_VAR not in self.params:
+            queryset = queryset.order_by('search_rank', 'name', 'pk')
+        return queryset
 
 @admin.register(Dish)
-class DishAdmin(admin.ModelAdmin):
+class DishAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'category', 'get_meal_times', 'price', 'calories', 'created_at']
-    list_filter = ['category', 'meal_times', 'created_at']
+    list_select_related = ['category']
+    # updated_at 有索引，created_at 沒有
+    list_filter = ['category', MealTimeFilter, 'updated_at']
     search_fields = ['name']
-    filter_horizontal = ['meal_times']
+    autocomplete_fields = ['category', 'meal_times']
+    list_per_page = 100
+    # 百萬筆時不執行 COUNT(*)：未篩選的總數用估計值，篩選後不另外計算全部筆數
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # 每頁一個查詢取回所有菜餚的供應時段
+        return super().get_queryset(request).prefetch_related('meal_times')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # 菜名開頭相符（name__startswith 可使用菜名的索引）或模糊搜尋相似的菜餚，
+        # 依相似度排序；icontains 只能全表掃描
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        dish_ids = [dish_id for dish_id, _ in search_dishes(search_term, limit=self.list_per_page)]
+        if not dish_ids:
+            return queryset.filter(name__startswith=search_term).annotate(search_rank=Value(0)), False
+        rank = Case(
+            *[When(pk=dish_id, then=Value(i)) for i, dish_id in enumerate(dish_ids)],
+            default=Value(len(dish_ids)),
+            output_field=IntegerField(),
+        )
+        queryset = queryset.filter(Q(name__startswith=search_term) | Q(pk__in=dish_ids))
+        return queryset.annotate(search_rank=rank), False
+    
+    def get_changelist(self, request, **kwargs):
+        return DishChangeList
+    
+    def save_model(self, request, obj, form, change):
+        # 手動修改後內容與匯入時不同，清除指紋讓下次增量匯入重新寫入
+        obj.fingerprint = ''
+        # 修改前的統計，供應時段寫入後（save_related）再套用差值
+        obj._summary_before = group_stats(Dish.objects.filter(pk=obj.pk)) if change else {}
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        # 供應時段在 save_model 之後才寫入中介表
+        super().save_related(request, form, formsets, change)
+        dish = form.instance
+        refresh_masks([dish.pk])
+        apply_delta(getattr(dish, '_summary_before', {}), group_stats(Dish.objects.filter(pk=dish.pk)))
+    
+    def delete_model(self, request, obj):
+        with menu_write(), summary_delta(Dish.objects.filter(pk=obj.pk)):
+            super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        with menu_write(), summary_delta(Dish.objects.filter(pk__in=list(queryset.values_list('pk', flat=True)))):
+            super().delete_queryset(request, queryset)
     
     def get_meal_times(self, obj):
         return ", ".join([mt.name for mt in obj.meal_times.all()])
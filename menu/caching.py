@@ -0,0 +1,67 @@
+"""
+菜單 API 回應快取 - 以菜單版本為 key，並支援 ETag / If-None-Match
+
+    key  = menu-api:<版本>:<請求路徑與查詢字串的雜湊>
+    ETag = W/"<版本>-<同一個雜湊>"
+
+版本在每次匯入／修復／刪除的交易中加一（見 menu.versioning），舊版本的
+項目不會再被讀到，留給快取後端依 LRU 或逾時淘汰。每個請求先讀版本：
+ETag 相符時直接回 304，命中快取時不需要其他查詢。
+"""
+
+import hashlib
+
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .versioning import current_version
+
+CACHE_ALIAS = 'default'
+KEY_PREFIX = 'menu-api'
+
+
+def _etag(version, digest):
+    return f'W/"{version}-{digest}"'
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # 弱比對：忽略 W/ 前綴
+    wanted = etag.removeprefix('W/')
+    return any(tag == '*' or tag.removeprefix('W/') == wanted for tag in parse_etags(header))
+
+
+def versioned_json(request, build):
+    """回傳以菜單版本快取的 JSON 回應
+
+    build() 回傳 (status, JSON 字串, 可否快取)；只有 200 且可快取的結果會被快取
+    並附 ETag。不可快取的結果（例如搜尋索引還沒跟上目前的版本）不附 ETag，
+    客戶端下次請求會重新取得。
+    """
+    version = current_version()
+    digest = hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest()[:20]
+    etag = _etag(version, digest)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        cache = caches[CACHE_ALIAS]
+        key = f'{KEY_PREFIX}:{version}:{digest}'
+        body = cache.get(key)
+        if body is None:
+            status, body, cacheable = build()
+            if status != 200 or not cacheable:
+                response = HttpResponse(body, status=status, content_type='application/json')
+                patch_cache_control(response, no_cache=True)
+                return response
+            cache.set(key, body)
+        response = HttpResponse(body, content_type='application/json')
+
+    response['ETag'] = etag
+    # 允許保存但每次都要重新驗證，菜單更新後客戶端立刻拿到新資料
+    patch_cache_control(response, no_cache=True)
+    return response
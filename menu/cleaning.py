@@ -0,0 +1,104 @@
+"""
+文字清理規則 - FoodDataManager 與 DataManager 共用
+
+規則以資料宣告，載入時編譯成：
+  * 一個 str.translate 對照表（移除符號、單字元替換，例如全形標點）
+  * 一個合併所有詞組修正的正規表示式
+  * 以 str.split 做空白正規化
+新增規則只會擴大對照表或合併的正規表示式，不會在每次清理時多一輪迴圈。
+"""
+
+import re
+
+# 要移除的特殊符號
+REMOVED_SYMBOLS = '#$%^&*()_+=[]{}|;:"<>?/~`@'
+
+# 單字元替換，例如 {'，': ','} 可把全形逗號轉為半形
+CHAR_REPLACEMENTS = {}
+
+# 常見錯誤的詞組修正
+PHRASE_CORRECTIONS = {
+    '午餐晚餐': '午餐,晚餐',
+    '早餐午餐': '早餐,午餐',
+    '午餐 晚餐': '午餐,晚餐',
+    '早餐 午餐': '早餐,午餐',
+}
+
+# 供 Arrow (RE2) 使用的空白字元類別：RE2 的 \s 只涵蓋 ASCII 空白，
+# 這裡列出與 str.split 相同的 Unicode 空白字元
+ARROW_WHITESPACE_RUN = '[' + ''.join(
+    '\\x{%x}' % code for code in range(0x3001) if chr(code).isspace()
+) + ']+'
+
+
+class TextCleaner:
+    """編譯後的清理器：符號移除 → 詞組修正 → 空白正規化"""
+
+    # 詞組修正最多重複套用的次數（修正後可能與下一段文字組成新的錯誤）
+    MAX_CORRECTION_PASSES = 5
+
+    def __init__(self, removed_symbols='', char_replacements=None, corrections=None):
+        self.char_replacements = dict(char_replacements or {})
+        table = {ord(ch): None for ch in removed_symbols}
+        for wrong, correct in self.char_replacements.items():
+            table[ord(wrong)] = correct
+        self.table = table
+
+        # 供 Arrow (RE2) 使用的符號字元類別
+        self.symbol_class = '[' + ''.join('\\' + ch for ch in removed_symbols) + ']' if removed_symbols else ''
+
+        self.corrections = dict(corrections or {})
+        if self.corrections:
+            # 較長的詞組優先，避免被較短的前綴搶先匹配
+            alternatives = sorted(self.corrections, key=len, reverse=True)
+            self.pattern = re.compile('|'.join(re.escape(a) for a in alternatives))
+        else:
+            self.pattern = None
+
+    def replace_match(self, match):
+        return self.corrections[match.group(0)]
+
+    def __call__(self, text):
+        text = text.translate(self.table)
+
+        if self.pattern is not None:
+            # 例如 '早餐午餐晚餐' 第一輪得到 '早餐,午餐晚餐'，第二輪才完成，
+            # 與逐條 str.replace 的結果一致
+            for _ in range(self.MAX_CORRECTION_PASSES):
+                text, count = self.pattern.subn(self.replace_match, text)
+                if not count:
+                    break
+
+        return ' '.join(text.split())
+
+    def clean_series(self, series):
+        """向量化版本：對 pandas 字串 Series（object dtype）套用相同規則
+
+        重複度高的欄位（類別、時段、價格）先去重，只清理不重複的值再展開回
+        原長度；清理本身在有 pyarrow 時以 Arrow 原生字串運算處理整欄。
+        """
+        import pandas as pd
+
+        codes, uniques = pd.factorize(series)
+        if len(uniques) <= len(series) // 2:
+            cleaned = self.clean_series(pd.Series(uniques, dtype=object))
+            return pd.Series(cleaned.to_numpy().take(codes), index=series.index, dtype=object)
+
+        try:
+            arrow = series.astype('string[pyarrow]')
+        except ImportError:
+            return series.map(self)
+
+        if self.symbol_class:
+            arrow = arrow.str.replace(self.symbol_class, '', regex=True)
+        for wrong, correct in self.char_replacements.items():
+            arrow = arrow.str.replace(wrong, correct, regex=False)
+        # Arrow 的逐條字面取代是原生運算，依宣告順序套用即與舊的 str.replace 迴圈相同
+        for wrong, correct in self.corrections.items():
+            arrow = arrow.str.replace(wrong, correct, regex=False)
+
+        arrow = arrow.str.replace(ARROW_WHITESPACE_RUN, ' ', regex=True).str.replace('^ | $', '', regex=True)
+        return arrow.astype(object)
+
+
+clean_text = TextCleaner(REMOVED_SYMBOLS, CHAR_REPLACEMENTS, PHRASE_CORRECTIONS)
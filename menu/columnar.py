@@ -0,0 +1,173 @@
+"""
+Parquet / Feather 匯入匯出 - 帶型別的欄式菜單快照
+
+快照欄位：
+    name        string
+    category    dictionary<int32, string>
+    price       decimal128(6, 2)
+    calories    int32
+    meal_times  list<string>
+並在 schema metadata 中標記，讀取時據此判斷能否略過清理直接匯入。
+"""
+
+from .exporting import DEFAULT_CHUNK_SIZE, iter_dish_rows
+from .importer import chunked
+from .models import Category
+
+SNAPSHOT_METADATA_KEY = b'food_menu.snapshot'
+SNAPSHOT_VERSION = b'1'
+
+FORMAT_EXTENSIONS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Parquet/Feather 格式需要安裝 pyarrow 套件")
+    return pyarrow
+
+
+def detect_format(file_path, file_format=None):
+    """回傳 'parquet' 或 'feather'；未指定時依副檔名判斷"""
+    if file_format:
+        if file_format not in ('parquet', 'feather'):
+            raise ValueError(f"不支援的檔案格式: {file_format}")
+        return file_format
+    for extension, detected in FORMAT_EXTENSIONS.items():
+        if str(file_path).endswith(extension):
+            return detected
+    raise ValueError(f"無法從副檔名判斷格式: {file_path}")
+
+
+def snapshot_schema():
+    pa = _pyarrow()
+    return pa.schema(
+        [
+            ('name', pa.string()),
+            ('category', pa.dictionary(pa.int32(), pa.string())),
+            ('price', pa.decimal128(6, 2)),
+            ('calories', pa.int32()),
+            ('meal_times', pa.list_(pa.string())),
+        ],
+        metadata={SNAPSHOT_METADATA_KEY: SNAPSHOT_VERSION},
+    )
+
+
+def is_snapshot(schema):
+    """schema 是否為本模組寫出的型別化快照"""
+    metadata = schema.metadata or {}
+    expected = snapshot_schema()
+    return (
+        metadata.get(SNAPSHOT_METADATA_KEY) == SNAPSHOT_VERSION
+        and schema.remove_metadata().equals(expected.remove_metadata())
+    )
+
+
+def export_snapshot(file_path, file_format=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """把資料庫菜單寫成型別化快照，回傳寫出的筆數"""
+    pa = _pyarrow()
+    file_format = detect_format(file_path, file_format)
+    schema = snapshot_schema()
+
+    # 所有批次共用同一份類別字典（IPC 檔案格式不允許替換字典）
+    category_names = list(Category.objects.order_by('name').values_list('name', flat=True))
+    category_index = {name: i for i, name in enumerate(category_names)}
+    dictionary = pa.array(category_names, pa.string())
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(file_path, schema)
+    else:
+        writer = pa.ipc.new_file(file_path, schema)
+
+    count = 0
+    with writer:
+        for batch in chunked(iter_dish_rows(chunk_size), chunk_size):
+            names, categories, meal_times, prices, calories = zip(*batch)
+            writer.write_batch(pa.record_batch(
+                [
+                    pa.array(names, pa.string()),
+                    pa.DictionaryArray.from_arrays(
+                        pa.array([category_index[c] for c in categories], pa.int32()), dictionary
+                    ),
+                    pa.array(prices, pa.decimal128(6, 2)),
+                    pa.array(calories, pa.int32()),
+                    pa.array([m.split(',') if m else [] for m in meal_times], pa.list_(pa.string())),
+                ],
+                schema=schema,
+            ))
+            count += len(batch)
+    return count
+
+
+def iter_batches(file_path, file_format=None, batch_size=DEFAULT_CHUNK_SIZE):
+    """逐批讀取 Parquet/Feather 檔，產生 (RecordBatch, 是否為型別化快照)"""
+    pa = _pyarrow()
+    file_format = detect_format(file_path, file_format)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path)
+        typed = is_snapshot(parquet_file.schema_arrow)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield batch, typed
+    else:
+        reader = pa.ipc.open_file(str(file_path))
+        typed = is_snapshot(reader.schema)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i), typed
+
+
+def count_rows(file_path, file_format=None):
+    """檔案中的資料筆數（Parquet 只讀中繼資料），供匯入時估計剩餘時間"""
+    pa = _pyarrow()
+    if detect_format(file_path, file_format) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(file_path).metadata.num_rows
+    with pa.memory_map(str(file_path)) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def snapshot_records(batch):
+    """把型別化快照的批次直接轉成匯入紀錄（不需再清理）"""
+    columns = batch.to_pydict()
+    return [
+        {
+            'name': name,
+            'category': category,
+            'price': price,
+            'calories': calories,
+            'meal_times': meal_times,
+        }
+        for name, category, price, calories, meal_times in zip(
+            columns['name'], columns['category'], columns['price'], columns['calories'], columns['meal_times']
+        )
+    ]
+
+
+def raw_rows(batch):
+    """把一般（未型別化）的批次轉成與 csv.DictReader 相同的字串列"""
+    columns = batch.to_pydict()
+    keys = list(columns)
+    return [
+        {key: '' if value is None else str(value) for key, value in zip(keys, values)}
+        for values in zip(*columns.values())
+    ]
+
+
+def read_table(file_path, file_format=None):
+    """整份讀入，回傳 (pyarrow.Table, 是否為型別化快照)"""
+    pa = _pyarrow()
+    if detect_format(file_path, file_format) == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(file_path)
+    else:
+        table = pa.ipc.open_file(str(file_path)).read_all()
+    return table, is_snapshot(table.schema)
@@ -0,0 +1,327 @@
+"""
+近似重複菜名偵測 - 以 MinHash LSH 找出檔案內與資料庫中幾乎相同的菜名
+
+清理後仍然不同的菜名（「叉燒飯」與「叉燒 飯」、「ＢＬＴ三文治」與「BLT三文治」，
+或錯一個字）會成為不同的菜餚。這裡不做兩兩比對（O(n²)），流程如下：
+
+  1. 比對名稱：NFKC 正規化、轉小寫並去除空白與符號（canonical_name），
+     比對名稱相同的菜名直接歸為一組（相似度 1）
+  2. 每個比對名稱以 menu.search.name_grams 切成 n-gram 並雜湊成整數，計算
+     MinHash 簽章（MINHASH_PERMUTATIONS 個雜湊函式各自的最小值，以 numpy 整批計算）
+  3. LSH：簽章切成 BANDS 段，任一段完全相同的兩個名稱成為候選配對。某段的
+     桶子超過 MAX_BUCKET_SIZE 個名稱時（例如大量只差編號的菜名），桶內依名稱
+     排序後只比對前後 NEIGHBOR_WINDOW 個
+  4. 以簽章相同的比例估計相似度，先篩掉明顯不像的候選，其餘以 n-gram 雜湊
+     整批計算實際的相似度（與 menu.search 相同）；不低於 threshold 的配對以
+     union-find 合成群組
+  5. 每組選一個目標菜名：資料庫中已有的優先（合併到既有的菜餚），否則為檔案中
+     最先出現的。與目標的相似度不低於 merge_threshold 的菜名自動改為目標菜名，
+     其餘只列在報告中（群組以相似的配對串連，報告列出與目標實際的相似度）；
+     比對名稱相同的寫法則至少合併到同一個菜名
+
+資料庫中已有的菜名不會被改名；只存在於資料庫的重複不在這裡處理。需要 numpy。
+"""
+
+import csv
+import itertools
+import random
+import zlib
+
+from .models import Dish
+from .search import TOKEN_PATTERN, name_grams, normalize
+
+DEFAULT_THRESHOLD = 0.8
+# 1 表示只自動合併比對名稱相同的菜名（只差空白、符號、全形半形或大小寫）
+DEFAULT_MERGE_THRESHOLD = 1.0
+
+MINHASH_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = MINHASH_PERMUTATIONS // BANDS
+# 8 段 × 4 列：相似度 0.8 的配對有 98.5% 的機率成為候選，0.5 的只有 41%
+MAX_BUCKET_SIZE = 50
+NEIGHBOR_WINDOW = 4
+# 簽章估計的相似度比門檻低超過這個值的候選不再精確計算（32 個雜湊的估計誤差約 0.07）
+ESTIMATE_MARGIN = 0.2
+
+# 每次計算簽章的名稱數與估計相似度的配對數（控制暫存資料的大小）
+SIGNATURE_CHUNK = 100000
+ESTIMATE_CHUNK = 200000
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+REPORT_HEADER = ['菜名', '目標菜名', '相似度', '目標來源', '動作']
+
+
+def _permutations(seed=20240601):
+    """MinHash 的雜湊函式 (a, b)：h(x) = (a·x + b) mod (2^61 - 1)，x 為 32 位元的 n-gram 雜湊"""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, 1 << 32), rng.randrange(1 << 32)) for _ in range(MINHASH_PERMUTATIONS)]
+
+
+PERMUTATIONS = _permutations()
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("近似重複偵測需要安裝 numpy 套件")
+    return numpy
+
+
+def canonical_name(name):
+    """比對名稱：NFKC 正規化、轉小寫，只保留字母與數字（「叉燒 飯」→「叉燒飯」）"""
+    return ''.join(cjk or word for cjk, word in TOKEN_PATTERN.findall(normalize(name)))
+
+
+def jaccard(grams_a, grams_b):
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+def gram_hashes(np, texts):
+    """比對名稱的 n-gram 雜湊（crc32，每個名稱內不重複）：(flat, offsets, lengths)
+
+    第 i 個名稱的雜湊為 flat[offsets[i]:offsets[i] + lengths[i]]。texts 中的名稱
+    都必須至少有一個 n-gram（非空的比對名稱）。
+    """
+    lengths = np.empty(len(texts), dtype=np.int64)
+    parts = []
+    for start in range(0, len(texts), SIGNATURE_CHUNK):
+        hashes = [{zlib.crc32(gram.encode('utf-8')) for gram in name_grams(text)}
+                  for text in texts[start:start + SIGNATURE_CHUNK]]
+        lengths[start:start + len(hashes)] = [len(grams) for grams in hashes]
+        parts.append(np.fromiter(itertools.chain.from_iterable(hashes), dtype=np.uint64,
+                                 count=int(lengths[start:start + len(hashes)].sum())))
+    flat = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+    offsets = np.zeros(len(texts), dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)[:-1]
+    return flat, offsets, lengths
+
+
+def minhash_signatures(np, flat, offsets, lengths):
+    """MinHash 簽章：名稱數 × MINHASH_PERMUTATIONS 的 uint64 陣列"""
+    signatures = np.empty((len(offsets), MINHASH_PERMUTATIONS), dtype=np.uint64)
+    prime = np.uint64(MERSENNE_PRIME)
+    for start in range(0, len(offsets), SIGNATURE_CHUNK):
+        stop = min(start + SIGNATURE_CHUNK, len(offsets))
+        low, high = offsets[start], offsets[stop - 1] + lengths[stop - 1]
+        hashes = flat[low:high]
+        local_offsets = offsets[start:stop] - low
+        block = signatures[start:stop]
+        for k, (a, b) in enumerate(PERMUTATIONS):
+            # a、b、x 都小於 2^32，a·x + b 不會超過 uint64
+            values = (hashes * np.uint64(a) + np.uint64(b)) % prime
+            block[:, k] = np.minimum.reduceat(values, local_offsets)
+    return signatures
+
+
+def shared_grams(np, flat, offsets, lengths, left, right):
+    """每個配對 (left[k], right[k]) 共有的 n-gram 數
+
+    兩邊的雜湊各自標上配對編號後合併排序，相鄰相同的就是共有的 n-gram。
+    """
+    pair_ids = np.arange(len(left))
+    keys = []
+    for side in (left, right):
+        counts = lengths[side]
+        ends = np.cumsum(counts)
+        positions = np.arange(ends[-1]) + np.repeat(offsets[side] - (ends - counts), counts)
+        keys.append(np.repeat(pair_ids, counts).astype(np.uint64) << np.uint64(32) | flat[positions])
+    keys = np.sort(np.concatenate(keys))
+    duplicate = keys[1:] == keys[:-1]
+    return np.bincount((keys[1:][duplicate] >> np.uint64(32)).astype(np.int64), minlength=len(left))
+
+
+def _encode(np, left, right, count):
+    """配對 (i, j) 編碼為 min × count + max"""
+    return np.minimum(left, right) * count + np.maximum(left, right)
+
+
+def candidate_pairs(np, signatures, texts):
+    """LSH 候選配對，回傳編碼為 i × len(texts) + j（i < j）的遞增 int64 陣列"""
+    count = len(texts)
+    encoded = []
+    for band in range(BANDS):
+        columns = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys = columns[:, 0].copy()
+        for column in range(1, ROWS_PER_BAND):
+            keys = keys * np.uint64(1000003) ^ columns[:, column]
+
+        # 排序後相同的 key 相鄰，每一段連續相同的 key 就是一個桶子
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        ends = np.append(starts[1:], len(order))
+        sizes = ends - starts
+
+        # 小桶子內兩兩配對：同樣大小的桶子一起以 numpy 展開
+        for size in np.unique(sizes[(sizes >= 2) & (sizes <= MAX_BUCKET_SIZE)]).tolist():
+            members = order[starts[sizes == size][:, None] + np.arange(size)]
+            left, right = np.triu_indices(size, 1)
+            encoded.append(_encode(np, members[:, left].ravel(), members[:, right].ravel(), count))
+
+        # 大桶子（大量只差一點的菜名）依名稱排序後只配對相鄰的幾個
+        for start, end in zip(starts[sizes > MAX_BUCKET_SIZE].tolist(), ends[sizes > MAX_BUCKET_SIZE].tolist()):
+            members = sorted(order[start:end].tolist(), key=texts.__getitem__)
+            members = np.array(members, dtype=np.int64)
+            for offset in range(1, NEIGHBOR_WINDOW + 1):
+                encoded.append(_encode(np, members[:-offset], members[offset:], count))
+
+    if not encoded:
+        return np.empty(0, dtype=np.int64)
+    # 排序後去除重複（比 np.unique 的雜湊表快）
+    pairs = np.concatenate(encoded)
+    pairs.sort()
+    return pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+
+
+class DedupResult:
+    """偵測結果
+
+    matches: [{'name', 'target', 'similarity', 'target_in_db', 'merged'}]，依群組排列
+    mapping: {要合併的菜名: 目標菜名}
+    """
+
+    def __init__(self):
+        self.names = 0
+        self.candidate_pairs = 0
+        self.verified_pairs = 0
+        self.matches = []
+
+    @property
+    def mapping(self):
+        return {match['name']: match['target'] for match in self.matches if match['merged']}
+
+
+def _match(name, target, similarity, db_names, merge_threshold):
+    return {
+        'name': name,
+        'target': target,
+        'similarity': similarity,
+        'target_in_db': target in db_names,
+        'merged': similarity >= merge_threshold,
+    }
+
+
+def find_duplicates(names, existing=(), threshold=DEFAULT_THRESHOLD, merge_threshold=DEFAULT_MERGE_THRESHOLD):
+    """找出 names（檔案中清理後的菜名）之間，以及與 existing（資料庫中的菜名）近似重複的菜名"""
+    np = _numpy()
+    result = DedupResult()
+
+    # 比對名稱 → 項目編號；資料庫的菜名先加入，編號較小
+    items = {}
+    texts = []
+    members = []
+    db_names = set()
+    for in_db, source in ((True, existing), (False, names)):
+        for name in source:
+            if in_db:
+                db_names.add(name)
+            key = canonical_name(name)
+            if not key:
+                continue
+            index = items.get(key)
+            if index is None:
+                index = items[key] = len(texts)
+                texts.append(key)
+                members.append([])
+            if name not in members[index]:
+                members[index].append(name)
+                result.names += 1
+
+    parent = {}
+    linked = set()
+
+    def find(index):
+        root = index
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(index, index) != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    grams = {}
+
+    def item_grams(index):
+        if index not in grams:
+            grams[index] = name_grams(texts[index])
+        return grams[index]
+
+    if len(texts) > 1:
+        hashes = gram_hashes(np, texts)
+        lengths = hashes[2]
+        signatures = minhash_signatures(np, *hashes)
+        pairs = candidate_pairs(np, signatures, texts)
+        result.candidate_pairs = len(pairs)
+        for start in range(0, len(pairs), ESTIMATE_CHUNK):
+            chunk = pairs[start:start + ESTIMATE_CHUNK]
+            left, right = chunk // len(texts), chunk % len(texts)
+            estimates = (signatures[left] == signatures[right]).mean(axis=1)
+            keep = estimates >= threshold - ESTIMATE_MARGIN
+            left, right = left[keep], right[keep]
+            if not len(left):
+                continue
+            shared = shared_grams(np, *hashes, left, right)
+            similar = shared / (lengths[left] + lengths[right] - shared) >= threshold
+            for i, j in zip(left[similar].tolist(), right[similar].tolist()):
+                result.verified_pairs += 1
+                linked.update((i, j))
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    # 以編號較小（資料庫或較早出現）的項目為根
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for index in range(len(texts)):
+        if index in linked or len(members[index]) > 1:
+            groups.setdefault(find(index), []).append(index)
+
+    for root in sorted(groups):
+        group = sorted(groups[root])
+        if all(name in db_names for index in group for name in members[index]):
+            continue
+        # 每個比對名稱的代表：資料庫中的菜名優先，否則為最先出現的；群組的目標為
+        # 第一個在資料庫中的代表，否則為編號最小（最先出現）的代表
+        heads = {index: next((name for name in members[index] if name in db_names), members[index][0])
+                 for index in group}
+        target_index = next((index for index in group if heads[index] in db_names), group[0])
+        target = heads[target_index]
+        for index in group:
+            head = heads[index]
+            head_similarity = 1.0
+            if index != target_index:
+                head_similarity = jaccard(item_grams(index), item_grams(target_index))
+                if head not in db_names:
+                    result.matches.append(_match(head, target, head_similarity, db_names, merge_threshold))
+            # 比對名稱相同的其他寫法併入代表；代表本身也被合併時直接指向目標
+            head_merged = head_similarity >= merge_threshold and head not in db_names
+            for name in members[index]:
+                if name == head or name in db_names:
+                    continue
+                if index == target_index or head_merged:
+                    result.matches.append(_match(name, target, head_similarity, db_names, merge_threshold))
+                else:
+                    result.matches.append(_match(name, head, 1.0, db_names, merge_threshold))
+    return result
+
+
+def existing_dish_names(chunk_size=10000):
+    """資料庫中的菜名，依 id 排序（較早建立的菜餚優先成為合併目標）"""
+    return Dish.objects.order_by('id').values_list('name', flat=True).iterator(chunk_size=chunk_size)
+
+
+def write_report(result, file_path):
+    """把偵測結果寫成 CSV 合併報告（含 BOM，供 Excel 開啟）"""
+    with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_HEADER)
+        for match in result.matches:
+            writer.writerow([
+                match['name'],
+                match['target'],
+                f"{match['similarity']:.3f}",
+                '資料庫' if match['target_in_db'] else '檔案',
+                '合併' if match['merged'] else '僅報告',
+            ])
+    return len(result.matches)
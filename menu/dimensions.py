@@ -0,0 +1,47 @@
+"""
+維度快取 - Category / MealTime 的名稱 → id 對照
+
+這兩張表只有少數幾筆（五種食材類別、三個供應時段），每次執行第一次用到時
+整表載入，之後的查找都不需要查詢；缺少的名稱一次 bulk insert。新建立的
+供應時段隨即分配遮罩旗標（見 menu.meal_masks）。
+"""
+
+from .meal_masks import assign_bits
+from .models import Category, MealTime
+
+
+class DimensionCache:
+    """每個匯入／修復流程共用一份，資料表被清空後須呼叫 reset()
+
+    其他程序刪除了已快取的類別或時段時，使用舊 id 的寫入會因外鍵失敗
+    （IntegrityError）；批次寫入遇到時 reset() 後整批重試一次。
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def resolve(self, model, names):
+        """確保 names 都有 id（缺少的一次建立），回傳整份名稱 → id 對照"""
+        ids = self._ids.get(model)
+        if ids is None:
+            ids = self._ids[model] = dict(model.objects.values_list('name', 'id'))
+
+        missing = {name for name in names if name not in ids}
+        if missing:
+            # 並行匯入時可能已被其他程序建立，忽略衝突後再查一次取得實際的 id
+            model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+            if model is MealTime:
+                assign_bits()
+            ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        return ids
+
+    def category_id(self, name):
+        return self.resolve(Category, (name,))[name]
+
+    def meal_time_ids(self, names):
+        ids = self.resolve(MealTime, names)
+        return [ids[name] for name in names]
+
+    def reset(self):
+        """丟棄快取，下次使用時重新載入（例如寫入失敗或資料被刪除後）"""
+        self._ids.clear()
@@ -0,0 +1,70 @@
+"""
+串流匯出 - 以伺服器端游標分批讀取菜餚，供應時段由遮罩解碼後逐列寫出
+"""
+
+import csv
+import gzip
+import io
+
+from .importer import chunked
+from .meal_masks import MealTimeBits, meal_time_names
+from .models import Dish
+
+EXPORT_HEADER = ['菜名', '主要食材', '供應時段', '價格(元)', '熱量(卡路里)']
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def open_export_file(file_path, compression=None):
+    """開啟匯出檔（文字模式，含 Excel 用的 BOM）
+
+    compression 可為 None、'gzip' 或 'zstd'；未指定時依副檔名 .gz / .zst 判斷。
+    """
+    if compression is None:
+        if str(file_path).endswith('.gz'):
+            compression = 'gzip'
+        elif str(file_path).endswith('.zst'):
+            compression = 'zstd'
+
+    if compression == 'gzip':
+        return gzip.open(file_path, 'wt', encoding='utf-8-sig', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd 壓縮需要安裝 zstandard 套件")
+        stream = zstandard.ZstdCompressor().stream_writer(open(file_path, 'wb'))
+        return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if compression:
+        raise ValueError(f"不支援的壓縮格式: {compression}")
+    return open(file_path, 'w', encoding='utf-8-sig', newline='')
+
+
+def iter_dish_rows(chunk_size=DEFAULT_CHUNK_SIZE):
+    """依菜名順序產生 (菜名, 類別, 供應時段字串, 價格, 熱量)
+
+    透過 iterator() 分批讀取（PostgreSQL 上為伺服器端游標），供應時段由
+    Dish.meal_time_mask 解碼，只有遮罩尚未計算的菜餚才查詢中介表。
+    """
+    bits = MealTimeBits()
+    rows = (
+        Dish.objects.order_by('name')
+        .values_list('id', 'name', 'category__name', 'price', 'calories', 'meal_time_mask')
+        .iterator(chunk_size=chunk_size)
+    )
+    for batch in chunked(rows, chunk_size):
+        names = meal_time_names([(row[0], row[5]) for row in batch], bits)
+        for dish_id, name, category, price, calories, _ in batch:
+            yield name, category, ','.join(names[dish_id]), price, calories
+
+
+def write_export_csv(file_path, compression=None, chunk_size=DEFAULT_CHUNK_SIZE, price_as_float=False):
+    """串流寫出菜單 CSV，回傳寫出的筆數"""
+    count = 0
+    with open_export_file(file_path, compression) as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADER)
+        for name, category, meal_times, price, calories in iter_dish_rows(chunk_size):
+            writer.writerow([name, category, meal_times, float(price) if price_as_float else price, calories])
+            count += 1
+    return count
@@ -0,0 +1,89 @@
+"""
+資料庫健康報告 - 以兩個彙總查詢算出所有統計數字
+
+    1. 各食材類別：菜餚數、價格為 0 與熱量為 0 的菜餚數（LEFT JOIN + 條件彙總）
+    2. 各供應時段：菜餚數
+
+總數都由這兩個結果加總（每道菜餚都有類別），沒有菜餚的類別即為孤立類別。
+只有在有價格為 0 的菜餚時才另外取前幾筆菜名作為範例。執行時間除了資料庫
+的彙總本身之外與菜餚數無關。
+"""
+
+from django.db.models import Count, Q
+
+from .models import Category, Dish, MealTime
+
+DEFAULT_SAMPLE_SIZE = 5
+
+
+def health_report(sample_size=DEFAULT_SAMPLE_SIZE):
+    """回傳可直接轉成 JSON 的統計 dict"""
+    categories = list(
+        Category.objects.order_by('name')
+        .annotate(
+            dish_count=Count('dishes'),
+            zero_price=Count('dishes', filter=Q(dishes__price=0)),
+            zero_calories=Count('dishes', filter=Q(dishes__calories=0)),
+        )
+        .values_list('name', 'dish_count', 'zero_price', 'zero_calories')
+    )
+    meal_times = list(
+        MealTime.objects.order_by('name').annotate(dish_count=Count('dishes')).values_list('name', 'dish_count')
+    )
+
+    zero_price = sum(row[2] for row in categories)
+    samples = []
+    if zero_price and sample_size:
+        samples = list(Dish.objects.filter(price=0).values_list('name', flat=True)[:sample_size])
+
+    return {
+        'dishes': sum(row[1] for row in categories),
+        'categories': len(categories),
+        'meal_times': len(meal_times),
+        'zero_price': zero_price,
+        'zero_calories': sum(row[3] for row in categories),
+        'zero_price_samples': samples,
+        'orphan_categories': [name for name, dish_count, _, _ in categories if not dish_count],
+        'dishes_per_category': {name: dish_count for name, dish_count, _, _ in categories},
+        'problems_per_category': {
+            name: {'zero_price': zero_price_count, 'zero_calories': zero_calories_count}
+            for name, _, zero_price_count, zero_calories_count in categories
+            if zero_price_count or zero_calories_count
+        },
+        'dishes_per_meal_time': dict(meal_times),
+    }
+
+
+def format_report(report):
+    """把 health_report() 的結果轉成給人看的表格文字"""
+    lines = [
+        "資料庫狀態:",
+        f"  • 菜餚數量: {report['dishes']}",
+        f"  • 食材類別: {report['categories']}",
+        f"  • 供應時段: {report['meal_times']}",
+    ]
+
+    if report['zero_price'] > 0:
+        lines.append(f"  • 價格為0的菜餚: {report['zero_price']} (可能有問題)")
+        lines.append(f"  前{len(report['zero_price_samples'])}個價格為0的菜餚:")
+        lines.extend(f"    - {name}" for name in report['zero_price_samples'])
+    if report['zero_calories'] > 0:
+        lines.append(f"  • 熱量為0的菜餚: {report['zero_calories']} (可能有問題)")
+    if report['orphan_categories']:
+        lines.append(f"  • 沒有菜餚的食材類別: {', '.join(report['orphan_categories'])}")
+
+    lines.append("")
+    lines.append(f"{'食材類別':<10} {'菜餚數':<8} {'價格為0':<8} {'熱量為0':<8}")
+    lines.append("-" * 40)
+    for name, dish_count in report['dishes_per_category'].items():
+        problems = report['problems_per_category'].get(name, {})
+        lines.append(
+            f"{name[:8]:<10} {dish_count:<8} {problems.get('zero_price', 0):<8} {problems.get('zero_calories', 0):<8}"
+        )
+
+    lines.append("")
+    lines.append(f"{'供應時段':<10} {'菜餚數':<8}")
+    lines.append("-" * 20)
+    for name, dish_count in report['dishes_per_meal_time'].items():
+        lines.append(f"{name[:8]:<10} {dish_count:<8}")
+    return "\n".join(lines)
@@ -0,0 +1,264 @@
+"""
+批次匯入引擎 - 以集合為單位寫入菜餚、食材類別與供應時段
+
+每筆紀錄是一個 dict：
+    {'name': 菜名, 'category': 食材類別, 'price': 價格,
+     'calories': 熱量, 'meal_times': 供應時段列表 (None 表示不變更)}
+"""
+
+import hashlib
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .dimensions import DimensionCache
+from .meal_masks import refresh_masks
+from .models import Dish, Category, MealTime
+from .summary import summary_delta
+from .versioning import menu_write
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def chunked(iterable, size):
+    """把可迭代物件切成固定大小的區塊"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def dish_fingerprint(category, price, calories, meal_times):
+    """菜餚內容指紋：類別、價格（取到小數兩位）、熱量與排序後的供應時段"""
+    content = '\x1f'.join([
+        category,
+        str(Decimal(str(price)).quantize(Decimal('0.01'))),
+        str(int(calories)),
+        '\x1e'.join(sorted(set(meal_times))),
+    ])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def record_fingerprint(record):
+    """紀錄的內容指紋；供應時段不變更 (None) 時內容不完整，回傳空字串"""
+    if record['meal_times'] is None:
+        return ''
+    return dish_fingerprint(record['category'], record['price'], record['calories'], record['meal_times'])
+
+
+def sync_meal_times(dish_meal_time_ids):
+    """以批次新增/刪除同步 Dish.meal_times 中介表，並重算這些菜餚的供應時段遮罩
+
+    dish_meal_time_ids: {dish_id: set(meal_time_id)}，列出的菜餚會被完整覆寫
+    """
+    if not dish_meal_time_ids:
+        return
+
+    through = Dish.meal_times.through
+    existing = through.objects.filter(
+        dish_id__in=list(dish_meal_time_ids)
+    ).values_list('id', 'dish_id', 'mealtime_id')
+
+    stale_ids = []
+    present = set()
+    for row_id, dish_id, meal_time_id in existing:
+        if meal_time_id in dish_meal_time_ids[dish_id]:
+            present.add((dish_id, meal_time_id))
+        else:
+            stale_ids.append(row_id)
+
+    if stale_ids:
+        through.objects.filter(id__in=stale_ids).delete()
+
+    new_rows = [
+        through(dish_id=dish_id, mealtime_id=meal_time_id)
+        for dish_id, meal_time_ids in dish_meal_time_ids.items()
+        for meal_time_id in meal_time_ids
+        if (dish_id, meal_time_id) not in present
+    ]
+    if new_rows:
+        through.objects.bulk_create(new_rows)
+    
+    refresh_masks(dish_meal_time_ids)
+
+
+def _upsert_batch(batch, dimensions):
+    """在單一交易中寫入一批紀錄（菜名不重複），回傳寫入前已存在的菜名"""
+    names = [record['name'] for record in batch]
+
+    # 類別與時段在交易外建立，避免批次失敗回滾後快取了不存在的 id
+    category_ids = dimensions.resolve(Category, [r['category'] for r in batch])
+    meal_time_ids = dimensions.resolve(MealTime, [m for r in batch for m in r['meal_times'] or []])
+
+    with menu_write(), summary_delta(Dish.objects.filter(name__in=names)):
+        existing = set(Dish.objects.filter(name__in=names).values_list('name', flat=True))
+
+        Dish.objects.bulk_create(
+            [
+                Dish(
+                    name=record['name'],
+                    category_id=category_ids[record['category']],
+                    price=record['price'],
+                    calories=record['calories'],
+                    fingerprint=record['fingerprint'] if 'fingerprint' in record else record_fingerprint(record),
+                )
+                for record in batch
+            ],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['category', 'price', 'calories', 'fingerprint', 'updated_at'],
+        )
+
+        dish_ids = dict(Dish.objects.filter(name__in=names).values_list('name', 'id'))
+        sync_meal_times({
+            dish_ids[record['name']]: {meal_time_ids[m] for m in record['meal_times']}
+            for record in batch
+            if record['meal_times'] is not None
+        })
+    return existing
+
+
+def _write_batch(batch, dimensions, errors, retry=True):
+    """寫入一批紀錄，回傳成功寫入的 [(紀錄, 是否新增)]
+
+    IntegrityError 多半是快取中的類別或時段已被其他程序刪除：重新載入快取後
+    整批重試一次。仍然失敗時對半拆開重試，直到只剩有問題的單筆紀錄記到 errors
+    （「菜名: 錯誤」），與逐筆匯入相同只有壞掉的菜餚失敗；一批中只有少數壞資料
+    時只多幾次寫入。
+    """
+    try:
+        existing = _upsert_batch(batch, dimensions)
+    except Exception as e:
+        dimensions.reset()
+        if retry and isinstance(e, IntegrityError):
+            return _write_batch(batch, dimensions, errors, retry=False)
+        if len(batch) == 1:
+            errors.append(f"{batch[0]['name']}: {e}")
+            return []
+        middle = len(batch) // 2
+        return (_write_batch(batch[:middle], dimensions, errors, retry=False)
+                + _write_batch(batch[middle:], dimensions, errors, retry=False))
+    return [(record, record['name'] not in existing) for record in batch]
+
+
+def bulk_upsert_dishes(records, batch_size=DEFAULT_BATCH_SIZE, on_row=None, dimensions=None):
+    """以批次 upsert 菜餚，每批在單一交易中完成
+
+    on_row(record, created) 會在每批成功寫入後對每筆紀錄呼叫一次。
+    dimensions 為呼叫端共用的 DimensionCache，未提供時建立一份。
+    一批寫入失敗時拆成較小的批次重試，只有無法寫入的紀錄列為錯誤。
+    回傳 {'created': 新增數, 'updated': 更新數, 'errors': 錯誤清單}
+    """
+    result = {'created': 0, 'updated': 0, 'errors': []}
+    dimensions = DimensionCache() if dimensions is None else dimensions
+
+    for batch in chunked(records, batch_size):
+        # 同一批內重複的菜名以最後一筆為準
+        batch = list({record['name']: record for record in batch}.values())
+
+        for record, created in _write_batch(batch, dimensions, result['errors']):
+            if created:
+                result['created'] += 1
+            else:
+                result['updated'] += 1
+            if on_row:
+                on_row(record, created)
+
+    return result
+
+
+def _repair_batch(batch, dimensions):
+    """在單一交易中寫回一批 (dish, 類別名稱或 None, 供應時段列表或 None)"""
+    category_ids = dimensions.resolve(Category, [c for _, c, _ in batch if c])
+    meal_time_ids = dimensions.resolve(MealTime, [m for _, _, times in batch for m in times or []])
+
+    now = timezone.now()
+    with menu_write(), summary_delta(Dish.objects.filter(pk__in=[dish.id for dish, _, _ in batch])):
+        for dish, category_name, _ in batch:
+            if category_name:
+                dish.category_id = category_ids[category_name]
+            # 修復只更新部分欄位，清除指紋讓下次增量匯入重新寫入
+            dish.fingerprint = ''
+            # bulk_update 不會觸發 auto_now
+            dish.updated_at = now
+
+        Dish.objects.bulk_update(
+            [dish for dish, _, _ in batch],
+            ['price', 'calories', 'category', 'fingerprint', 'updated_at'],
+        )
+        sync_meal_times({
+            dish.id: {meal_time_ids[m] for m in times}
+            for dish, _, times in batch
+            if times is not None
+        })
+
+
+def bulk_repair_dishes(changes, batch_size=DEFAULT_BATCH_SIZE, on_row=None, dimensions=None):
+    """以 bulk_update 寫回修復後的菜餚，每批在單一交易中完成
+
+    changes 為 (dish, 類別名稱或 None, 供應時段列表或 None) 的可迭代物件，
+    dish 已設定好新的 price/calories；None 表示該欄不變更。
+    on_row(dish) 會在每批成功寫入後對每道菜呼叫一次。回傳修復的菜餚數。
+    """
+    dimensions = DimensionCache() if dimensions is None else dimensions
+    count = 0
+
+    for batch in chunked(changes, batch_size):
+        try:
+            _repair_batch(batch, dimensions)
+        except IntegrityError:
+            # 快取中的類別或時段可能已被其他程序刪除，重新載入後重試一次
+            dimensions.reset()
+            _repair_batch(batch, dimensions)
+
+        count += len(batch)
+        if on_row:
+            for dish, _, _ in batch:
+                on_row(dish)
+
+    return count
+
+
+def incremental_sync_dishes(records, batch_size=DEFAULT_BATCH_SIZE, on_row=None, dimensions=None):
+    """增量同步：records 視為完整菜單，只寫入新增、變更與移除的菜餚
+
+    先一次取回所有菜餚的指紋，內容相同的紀錄直接略過；資料庫中有但
+    records 沒有的菜餚會被刪除。
+    回傳 {'inserted': 新增數, 'changed': 變更數, 'removed': 移除數,
+          'unchanged': 未變更數, 'errors': 錯誤清單}
+    """
+    stored = dict(Dish.objects.values_list('name', 'fingerprint'))
+
+    pending = []
+    seen = set()
+    for record in records:
+        record['fingerprint'] = record_fingerprint(record)
+        seen.add(record['name'])
+        if not record['fingerprint'] or stored.get(record['name']) != record['fingerprint']:
+            pending.append(record)
+
+    result = bulk_upsert_dishes(pending, batch_size=batch_size, on_row=on_row, dimensions=dimensions)
+
+    removed = 0
+    for batch in chunked(sorted(stored.keys() - seen), batch_size):
+        try:
+            dishes = Dish.objects.filter(name__in=batch)
+            with menu_write(), summary_delta(dishes):
+                dishes.delete()
+        except Exception as e:
+            result['errors'].extend(f"{name}: {e}" for name in batch)
+            continue
+        removed += len(batch)
+
+    return {
+        'inserted': result['created'],
+        'changed': result['updated'],
+        'removed': removed,
+        'unchanged': len(seen) - len(pending),
+        'errors': result['errors'],
+    }
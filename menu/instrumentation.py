@@ -0,0 +1,272 @@
+"""
+效能量測 - 記錄每個管理工具操作的時間、筆數與 SQL
+
+預設關閉，關閉時被裝飾的方法直接執行、沒有額外負擔。啟用方式：
+  * 環境變數 MENU_INSTRUMENT=報告路徑.json（設為 1 時寫到 menu_instrument.json），
+    程式結束時寫出報告；MENU_PROFILE_DIR=目錄 另外為每個階段寫出 profile，
+    MENU_PROFILER=pyinstrument 時改用 pyinstrument（需另外安裝）
+  * manage.py menu_* 指令的 --instrument / --profile-dir 參數
+  * 程式中呼叫 enable() / write_report()
+
+每個階段記錄牆上時間、CPU 時間、處理筆數、查詢數、SQL 總時間與最慢的
+幾個查詢。巢狀呼叫（例如 run_full_import 內的 load_csv）各自成為一個階段，
+外層的數字包含內層；profile 則只記錄各階段本身（進入內層時暫停外層）。
+"""
+
+import atexit
+import functools
+import heapq
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from django.db import connection
+
+ENV_REPORT = 'MENU_INSTRUMENT'
+ENV_PROFILE_DIR = 'MENU_PROFILE_DIR'
+ENV_PROFILER = 'MENU_PROFILER'
+
+DEFAULT_REPORT_PATH = 'menu_instrument.json'
+DEFAULT_TOP_N = 10
+
+# 報告中每個查詢最多保留的字元數
+SQL_PREVIEW_CHARS = 500
+
+_session = None
+
+
+class QueryRecorder:
+    """以 connection.execute_wrapper 記錄查詢數、SQL 總時間與最慢的查詢"""
+
+    def __init__(self, top_n=DEFAULT_TOP_N):
+        self.top_n = top_n
+        self.count = 0
+        self.seconds = 0.0
+        self._slowest = []  # (秒數, 序號, sql) 的最小堆積，只保留 top_n 筆
+        self._sequence = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self._sequence += 1
+            entry = (elapsed, self._sequence, sql)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self):
+        return [
+            {'seconds': round(seconds, 6), 'sql': _preview(sql)}
+            for seconds, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+class Session:
+    """一次執行的所有階段紀錄"""
+
+    def __init__(self, report_path=None, profile_dir=None, profiler='cprofile', top_n=DEFAULT_TOP_N):
+        self.report_path = report_path or DEFAULT_REPORT_PATH
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.top_n = top_n
+        self.started = datetime.now()
+        self.stages = []
+        self._stack = []  # 進行中的階段的 profiler，進入內層時暫停外層
+
+    def run(self, name, func, args, kwargs, rows):
+        stage = {'name': name, 'depth': len(self._stack)}
+        self.stages.append(stage)
+        number = len(self.stages)
+        recorder = QueryRecorder(self.top_n)
+
+        profiler = self._start_profiler()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with connection.execute_wrapper(recorder):
+                result = func(*args, **kwargs)
+        except BaseException as e:
+            stage['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stage['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            stage['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            stage['profile'] = self._stop_profiler(profiler, number, name)
+            stage['queries'] = recorder.count
+            stage['sql_seconds'] = round(recorder.seconds, 6)
+            stage['slowest_queries'] = recorder.slowest()
+
+        count = _count_rows(rows, args, result)
+        stage['rows'] = count
+        stage['rows_per_sec'] = round(count / stage['wall_seconds'], 1) if count and stage['wall_seconds'] else None
+        return result
+
+    def _start_profiler(self):
+        if not self.profile_dir:
+            self._stack.append(None)
+            return None
+        if self._stack and self._stack[-1] is not None:
+            _pause(self._stack[-1])
+        profiler = _new_profiler(self.profiler)
+        self._stack.append(profiler)
+        return profiler
+
+    def _stop_profiler(self, profiler, number, name):
+        self._stack.pop()
+        if profiler is None:
+            return None
+        _pause(profiler)
+        path = _dump(profiler, self.profile_dir, f"{number:03d}_{re.sub(r'[^0-9A-Za-z_.]+', '_', name)}")
+        if self._stack and self._stack[-1] is not None:
+            _resume(self._stack[-1])
+        return path
+
+    def report(self):
+        totals = {
+            'wall_seconds': round(sum(s['wall_seconds'] for s in self.stages if s['depth'] == 0), 6),
+            'cpu_seconds': round(sum(s['cpu_seconds'] for s in self.stages if s['depth'] == 0), 6),
+            'queries': sum(s['queries'] for s in self.stages if s['depth'] == 0),
+            'sql_seconds': round(sum(s['sql_seconds'] for s in self.stages if s['depth'] == 0), 6),
+        }
+        slowest = heapq.nlargest(
+            self.top_n,
+            (query for s in self.stages if s['depth'] == 0 for query in s['slowest_queries']),
+            key=lambda query: query['seconds'],
+        )
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'totals': totals,
+            'slowest_queries': slowest,
+            'stages': self.stages,
+        }
+
+
+def _preview(sql):
+    sql = ' '.join(str(sql).split())
+    return sql if len(sql) <= SQL_PREVIEW_CHARS else sql[:SQL_PREVIEW_CHARS] + '…'
+
+
+def _count_rows(rows, args, result):
+    """rows 為 None、整數或 rows(self, result) 函式；無法計算時回傳 None"""
+    if rows is None or not callable(rows):
+        return rows
+    try:
+        return rows(args[0], result) if args else rows(None, result)
+    except Exception:
+        return None
+
+
+def _new_profiler(kind):
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("MENU_PROFILER=pyinstrument 需要安裝 pyinstrument 套件")
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _pause(profiler):
+    if hasattr(profiler, 'disable'):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _resume(profiler):
+    if hasattr(profiler, 'enable'):
+        profiler.enable()
+    else:
+        profiler.start()
+
+
+def _dump(profiler, directory, stem):
+    os.makedirs(directory, exist_ok=True)
+    if hasattr(profiler, 'dump_stats'):
+        path = os.path.join(directory, f"{stem}.prof")
+        profiler.dump_stats(path)
+    else:
+        path = os.path.join(directory, f"{stem}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    return path
+
+
+def enable(report_path=None, profile_dir=None, profiler='cprofile', top_n=DEFAULT_TOP_N):
+    """開始記錄；之後呼叫 write_report() 寫出報告"""
+    global _session
+    _session = Session(report_path, profile_dir, profiler, top_n)
+    return _session
+
+
+def disable():
+    global _session
+    _session = None
+
+
+def is_enabled():
+    return _session is not None
+
+
+def write_report(path=None):
+    """把目前的紀錄寫成 JSON 並結束記錄，回傳報告路徑；未啟用時回傳 None"""
+    session = _session
+    if session is None:
+        return None
+    disable()
+
+    path = path or session.report_path
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(session.report(), f, ensure_ascii=False, indent=2)
+    return path
+
+
+def instrumented(rows=None):
+    """裝飾管理工具的方法；rows(self, result) 回傳該操作處理的筆數"""
+
+    def decorator(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _session is None:
+                return func(*args, **kwargs)
+            return _session.run(name, func, args, kwargs, rows)
+
+        return wrapper
+
+    return decorator
+
+
+def _enable_from_environment():
+    import multiprocessing
+
+    report_path = os.environ.get(ENV_REPORT)
+    # 平行清理的子 process 也會匯入本模組，只有主 process 寫報告
+    if not report_path or multiprocessing.parent_process() is not None:
+        return
+    enable(
+        report_path=None if report_path == '1' else report_path,
+        profile_dir=os.environ.get(ENV_PROFILE_DIR) or None,
+        profiler=os.environ.get(ENV_PROFILER, 'cprofile'),
+    )
+    atexit.register(write_report)
+
+
+_enable_from_environment()
@@ -0,0 +1,115 @@
+"""
+菜單管理指令的共用基底
+
+管理工具（final_manager / data_manager）只在 handle() 中才匯入，
+--help 與參數錯誤時不需要載入它們的相依套件。
+"""
+
+import contextlib
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+SNAPSHOT_FORMATS = ('parquet', 'feather')
+
+
+class MenuCommand(BaseCommand):
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--instrument', metavar='REPORT.json',
+            help='記錄各階段的時間、筆數與 SQL，結束時寫成 JSON 報告',
+        )
+        parser.add_argument(
+            '--profile-dir',
+            help='搭配 --instrument，為每個階段另外寫出 cProfile 檔',
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        if not options.get('instrument'):
+            return super().execute(*args, **options)
+
+        from menu import instrumentation
+
+        instrumentation.enable(options['instrument'], options.get('profile_dir'))
+        try:
+            return super().execute(*args, **options)
+        finally:
+            path = instrumentation.write_report()
+            self.stderr.write(f'量測報告已寫入 {path}')
+
+    def add_batch_size_argument(self, parser):
+        from menu.importer import DEFAULT_BATCH_SIZE
+
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'每個交易寫入的筆數（預設 {DEFAULT_BATCH_SIZE}）',
+        )
+
+    def add_dry_run_argument(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='照常執行但最後回滾所有資料庫變更',
+        )
+
+    def add_rejects_argument(self, parser):
+        parser.add_argument(
+            '--rejects', metavar='REJECTS.jsonl',
+            help='逐筆的警告與錯誤（CSV 行號、菜名、欄位、原始值）寫到這個檔案，.csv 結尾時為 CSV，否則為 JSONL',
+        )
+
+    def manager(self):
+        from final_manager import FoodDataManager
+
+        return FoodDataManager()
+
+    def manager_output(self, options):
+        """管理工具以 print 輸出進度；verbosity 0 時不顯示"""
+        if options['verbosity'] == 0:
+            return contextlib.redirect_stdout(io.StringIO())
+        return contextlib.nullcontext()
+
+    @contextlib.contextmanager
+    def reporting(self, manager, options):
+        """-v 2 以上保留逐筆輸出（預設依筆數決定，見 menu.progress）；--rejects 開啟 rejects 檔案"""
+        from menu.progress import RejectsFile
+
+        if options['verbosity'] >= 2:
+            manager.verbose = True
+        if not options.get('rejects'):
+            yield
+            return
+        with RejectsFile(options['rejects']) as rejects:
+            manager.rejects = rejects
+            yield
+        self.stderr.write(f'{rejects.count} 筆警告與錯誤已寫入 {rejects.path}')
+
+    @contextlib.contextmanager
+    def dry_run(self, enabled):
+        """enabled 時把整個指令包在一個交易中，結束時回滾"""
+        if not enabled:
+            yield
+            return
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.WARNING('dry-run：所有資料庫變更已回滾'))
+
+    def check_result(self, ok, message):
+        if not ok:
+            raise CommandError(message)
+
+
+def detect_format(file_path, file_format=None):
+    """未指定 --format 時依副檔名判斷，預設為 CSV"""
+    if file_format:
+        return file_format
+    from menu.columnar import FORMAT_EXTENSIONS
+
+    for extension, detected in FORMAT_EXTENSIONS.items():
+        if str(file_path).endswith(extension):
+            return detected
+    return 'csv'
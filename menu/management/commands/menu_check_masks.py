@@ -0,0 +1,40 @@
+from django.core.management.base import CommandError
+
+from ._base import MenuCommand
+
+
+class Command(MenuCommand):
+    help = '檢查菜餚的供應時段遮罩 (meal_time_mask) 是否與中介表一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='為缺少旗標的供應時段分配旗標，並依中介表重算所有菜餚的遮罩',
+        )
+
+    def handle(self, *args, **options):
+        from menu.meal_masks import assign_bits, check_masks, refresh_masks
+        from menu.versioning import menu_write
+
+        if options['fix']:
+            with menu_write():
+                assigned = assign_bits()
+                refreshed = refresh_masks()
+            self.stdout.write(f'已分配 {assigned} 個旗標，重算 {refreshed} 道菜餚的遮罩')
+
+        report = check_masks()
+        for name, mask, expected in report['examples']:
+            self.stdout.write(f'  ✗ {name}: 遮罩 {mask}，應為 {expected}')
+        if report['uncomputed']:
+            self.stdout.write(f"{report['uncomputed']} 道菜餚的遮罩尚未計算（讀取時改查中介表）")
+
+        problems = []
+        if report['mismatched']:
+            problems.append(f"{report['mismatched']} 道菜餚的遮罩與中介表不一致")
+        if report['unflagged']:
+            problems.append(f"供應時段沒有旗標: {', '.join(report['unflagged'])}")
+        if report['invalid']:
+            problems.append(f"旗標不是 2 的次方: {', '.join(report['invalid'])}")
+        if problems:
+            raise CommandError('；'.join(problems) + '（可加上 --fix 修復）')
+        self.stdout.write(self.style.SUCCESS('✓ 供應時段遮罩與中介表一致'))
@@ -0,0 +1,36 @@
+from menu.exporting import DEFAULT_CHUNK_SIZE
+
+from ._base import SNAPSHOT_FORMATS, MenuCommand, detect_format
+
+
+class Command(MenuCommand):
+    help = '從資料庫匯出菜單（CSV / Parquet / Feather）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='輸出檔案')
+        parser.add_argument(
+            '--format', choices=('csv',) + SNAPSHOT_FORMATS,
+            help='檔案格式（預設依副檔名判斷）',
+        )
+        parser.add_argument(
+            '--compression', choices=('gzip', 'zstd'),
+            help='CSV 壓縮格式（預設依副檔名 .gz / .zst 判斷）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'每次從資料庫讀取的筆數（預設 {DEFAULT_CHUNK_SIZE}）',
+        )
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+        file_format = detect_format(file_path, options['format'])
+
+        with self.manager_output(options):
+            manager = self.manager()
+            if file_format in SNAPSHOT_FORMATS:
+                ok = manager.export_snapshot(file_path, file_format)
+            else:
+                ok = manager.export_to_csv(
+                    file_path, stream=True, compression=options['compression'], chunk_size=options['batch_size']
+                )
+            self.check_result(ok, f'匯出 {file_path} 失敗')
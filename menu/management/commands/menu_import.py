@@ -0,0 +1,91 @@
+from django.core.management.base import CommandError
+
+from ._base import SNAPSHOT_FORMATS, MenuCommand, detect_format
+
+IMPORT_MODES = ('bulk', 'row', 'incremental', 'stream', 'pipeline', 'copy')
+
+
+class Command(MenuCommand):
+    help = '匯入菜單檔案（CSV / Parquet / Feather）到資料庫'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='要匯入的檔案')
+        parser.add_argument(
+            '--format', choices=('csv',) + SNAPSHOT_FORMATS,
+            help='檔案格式（預設依副檔名判斷）',
+        )
+        parser.add_argument(
+            '--mode', choices=IMPORT_MODES, default='bulk',
+            help='CSV 匯入方式：bulk 批次 upsert（預設）、row 逐筆、incremental 增量同步、'
+                 'stream 串流、pipeline 非同步管線、copy PostgreSQL COPY',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='清理階段的平行 process 數',
+        )
+        parser.add_argument(
+            '--dedup', action='store_true',
+            help='匯入前偵測檔案內與資料庫中近似重複的菜名（見 menu.dedup，需要 numpy）',
+        )
+        parser.add_argument(
+            '--dedup-threshold', type=float, default=None,
+            help='列為近似重複的相似度門檻（0-1，預設 0.8）',
+        )
+        parser.add_argument(
+            '--merge-threshold', type=float, default=None,
+            help='相似度不低於此值的菜名自動合併到目標菜名（預設 1：只合併去除空白、符號、'
+                 '全形與大小寫差異後相同的菜名）',
+        )
+        parser.add_argument(
+            '--dedup-report', metavar='REPORT.csv',
+            help='寫出近似重複菜名的合併報告（隱含 --dedup）',
+        )
+        self.add_batch_size_argument(parser)
+        self.add_rejects_argument(parser)
+        self.add_dry_run_argument(parser)
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+        file_format = detect_format(file_path, options['format'])
+        mode = options['mode']
+        batch_size = options['batch_size']
+        workers = options['workers']
+
+        dedup = options['dedup'] or bool(options['dedup_report'])
+        if dedup and file_format in SNAPSHOT_FORMATS:
+            raise CommandError('--dedup 只支援 CSV 檔案')
+
+        manager = self.manager()
+        with self.manager_output(options), self.reporting(manager, options), self.dry_run(options['dry_run']):
+            if file_format in SNAPSHOT_FORMATS:
+                ok = manager.import_snapshot(file_path, file_format, batch_size=batch_size)
+            elif mode in ('stream', 'pipeline'):
+                # 串流模式不保留整份資料，先讀一次菜名偵測近似重複
+                ok = not dedup or self.dedupe(manager, options, manager.csv_dish_names(file_path))
+                if ok and mode == 'stream':
+                    ok = manager.run_streaming_import(file_path, batch_size=batch_size, workers=workers)
+                elif ok:
+                    ok = manager.run_async_import(file_path, batch_size=batch_size, workers=workers)
+            else:
+                ok = manager.load_csv(file_path) and manager.clean_data(workers=workers)
+                if ok and dedup:
+                    ok = self.dedupe(manager, options)
+                if ok and mode == 'copy':
+                    ok = manager.copy_to_database()
+                elif ok:
+                    ok = manager.import_to_database(
+                        bulk=mode != 'row', batch_size=batch_size, incremental=mode == 'incremental'
+                    )
+            self.check_result(ok, f'匯入 {file_path} 失敗')
+
+    def dedupe(self, manager, options, names=None):
+        from menu.dedup import DEFAULT_MERGE_THRESHOLD, DEFAULT_THRESHOLD
+
+        threshold = options['dedup_threshold']
+        merge_threshold = options['merge_threshold']
+        return manager.dedupe_names(
+            names,
+            threshold=DEFAULT_THRESHOLD if threshold is None else threshold,
+            merge_threshold=DEFAULT_MERGE_THRESHOLD if merge_threshold is None else merge_threshold,
+            report_path=options['dedup_report'],
+        )
@@ -0,0 +1,28 @@
+from ._base import MenuCommand
+
+
+class Command(MenuCommand):
+    help = '刪除所有菜餚、食材類別與供應時段'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='不詢問確認直接刪除',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='只顯示會刪除的筆數',
+        )
+
+    def handle(self, *args, **options):
+        manager = self.manager()
+        if options['dry_run']:
+            status = manager.get_status()
+            self.stdout.write(
+                f"將刪除 {status['dishes']} 道菜餚、{status['categories']} 個食材類別、"
+                f"{status['meal_times']} 個供應時段"
+            )
+            return
+        with self.manager_output(options):
+            ok = manager.delete_all_data(assume_yes=not options['interactive'])
+        self.check_result(ok, '已取消刪除')
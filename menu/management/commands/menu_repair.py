@@ -0,0 +1,28 @@
+from ._base import MenuCommand
+
+
+class Command(MenuCommand):
+    help = '依 CSV 修復資料庫中的菜品價格、熱量、類別與供應時段'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='作為修復依據的 CSV 檔案')
+        parser.add_argument(
+            '--all', action='store_true',
+            help='修復 CSV 中出現的所有菜品（預設只修復價格為0的菜品）',
+        )
+        self.add_batch_size_argument(parser)
+        self.add_rejects_argument(parser)
+        self.add_dry_run_argument(parser)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        manager = self.manager()
+        with self.manager_output(options), self.reporting(manager, options), self.dry_run(options['dry_run']):
+            self.check_result(manager.load_csv(options['file']), '修復失敗')
+            if options['all']:
+                self.check_result(manager.fix_all_prices_from_csv(batch_size=batch_size), '修復失敗')
+            else:
+                # 回傳值只表示是否修復了菜品：剩下的都無法修復（時價、CSV 中沒有）時
+                # 這些菜品已記為警告，排程執行不應因此失敗
+                manager.fix_zero_prices(batch_size=batch_size)
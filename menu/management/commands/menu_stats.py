@@ -0,0 +1,21 @@
+import json
+
+from ._base import MenuCommand
+
+
+class Command(MenuCommand):
+    help = '顯示資料庫狀態'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('table', 'json'), default='table',
+            help='輸出格式（預設 table）',
+        )
+
+    def handle(self, *args, **options):
+        manager = self.manager()
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(manager.get_status(), ensure_ascii=False, indent=2))
+            return
+        with self.manager_output(options):
+            manager.show_status()
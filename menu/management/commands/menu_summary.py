@@ -0,0 +1,52 @@
+from django.core.management.base import CommandError
+
+from ._base import MenuCommand
+
+
+class Command(MenuCommand):
+    help = '顯示、重建或驗證依類別與供應時段預先彙總的菜單統計表'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            '--rebuild', action='store_true',
+            help='以完整的 GROUP BY 重新計算整個統計表',
+        )
+        action.add_argument(
+            '--verify', action='store_true',
+            help='與完整重算的結果比對，有差異時回傳錯誤',
+        )
+
+    def handle(self, *args, **options):
+        from menu.summary import rebuild_summary, summary_rows, verify_summary
+        from menu.versioning import menu_write
+
+        if options['rebuild']:
+            with menu_write():
+                count = rebuild_summary()
+            self.stdout.write(self.style.SUCCESS(f'✓ 已重建 {count} 列統計'))
+            return
+
+        if options['verify']:
+            differences = verify_summary()
+            for (kind, key_id), field, stored, expected in differences[:20]:
+                self.stdout.write(f'  ✗ {kind} #{key_id} {field}: 統計表 {stored}，重算 {expected}')
+            if differences:
+                raise CommandError(f'統計表有 {len(differences)} 個欄位與重算結果不同（可加上 --rebuild 重建）')
+            self.stdout.write(self.style.SUCCESS('✓ 統計表與完整重算的結果一致'))
+            return
+
+        categories, meal_times = summary_rows()
+        for title, rows in (('食材類別', categories), ('供應時段', meal_times)):
+            self.stdout.write(f"\n{title:<10} {'菜餚數':<8} {'平均價格':<10} {'價格範圍':<18} {'平均熱量':<10} {'熱量範圍':<12}")
+            self.stdout.write('-' * 75)
+            for row in rows:
+                name = row.category.name if row.category_id else row.meal_time.name
+                avg_price = f'{row.avg_price:.2f}' if row.dish_count else '-'
+                avg_calories = f'{row.avg_calories:.0f}' if row.dish_count else '-'
+                price_range = f'{row.min_price}-{row.max_price}' if row.dish_count else '-'
+                calories_range = f'{row.min_calories}-{row.max_calories}' if row.dish_count else '-'
+                self.stdout.write(
+                    f'{name[:8]:<10} {row.dish_count:<8} {avg_price:<10} {price_range:<18} '
+                    f'{avg_calories:<10} {calories_range:<12}'
+                )
@@ -0,0 +1,158 @@
+"""
+供應時段位元遮罩 - Dish.meal_time_mask 的維護、篩選與解碼
+
+每個 MealTime 分配一個旗標（2 的次方，存在 MealTime.bit），菜餚的遮罩是它
+所有供應時段旗標的總和（旗標互不重疊，總和即 OR）。寫入中介表的地方在同
+一個交易中呼叫 refresh_masks()；新增時段後呼叫 assign_bits() 分配旗標。
+
+遮罩為空值（尚未計算）或時段沒有旗標（超過 MAX_BITS 個時段）時，篩選與
+列出都改查中介表，結果與直接 JOIN 相同。
+"""
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Dish, MealTime
+
+# BigIntegerField 為有號 64 位元，旗標最多用到 2**62
+MAX_BITS = 63
+
+
+class MealTimeBits:
+    """時段名稱與旗標的對照，第一次使用時以一個查詢載入"""
+
+    def __init__(self):
+        self._rows = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = sorted(MealTime.objects.values_list('name', 'bit'))
+        return self._rows
+
+    @property
+    def by_name(self):
+        return dict(self.rows)
+
+    @property
+    def complete(self):
+        """每個時段都有旗標時，遮罩可以完整表示菜餚的供應時段"""
+        return all(bit is not None for _, bit in self.rows)
+
+    def names(self, mask):
+        """遮罩中的時段名稱（依名稱排序）"""
+        return [name for name, bit in self.rows if bit is not None and mask & bit]
+
+
+def assign_bits():
+    """為尚未分配旗標的時段分配最小的空閒旗標，回傳分配的數量"""
+    with transaction.atomic():
+        rows = list(MealTime.objects.select_for_update().order_by('id').values_list('id', 'bit'))
+        used = {bit for _, bit in rows if bit is not None}
+        free = (1 << position for position in range(MAX_BITS) if 1 << position not in used)
+
+        count = 0
+        for meal_time_id, bit in rows:
+            if bit is not None:
+                continue
+            bit = next(free, None)
+            if bit is None:
+                break
+            MealTime.objects.filter(pk=meal_time_id).update(bit=bit)
+            count += 1
+    return count
+
+
+def mask_expression():
+    """依中介表計算菜餚遮罩的子查詢（沒有供應時段時為 0）"""
+    total = (
+        Dish.meal_times.through.objects
+        .filter(dish_id=OuterRef('pk'), mealtime__bit__isnull=False)
+        .values('dish_id')
+        .annotate(total=Sum('mealtime__bit'))
+        .values('total')
+    )
+    return Coalesce(Subquery(total), Value(0), output_field=BigIntegerField())
+
+
+def refresh_masks(dish_ids=None):
+    """依中介表重新計算遮罩（dish_ids 為 None 時重算全部），回傳更新的筆數"""
+    dishes = Dish.objects.all() if dish_ids is None else Dish.objects.filter(pk__in=list(dish_ids))
+    return dishes.update(meal_time_mask=mask_expression())
+
+
+def filter_meal_times(queryset, names, bits=None):
+    """只留下供應時段包含 names 全部的菜餚"""
+    names = list(names)
+    if not names:
+        return queryset
+
+    bits = MealTimeBits() if bits is None else bits
+    by_name = bits.by_name
+    if any(name not in by_name for name in names):
+        return queryset.none()
+
+    through = Dish.meal_times.through
+    joined = {
+        name: Exists(through.objects.filter(dish_id=OuterRef('pk'), mealtime__name=name))
+        for name in names
+    }
+    wanted = sum({by_name[name] for name in names if by_name[name] is not None})
+    # 沒有旗標的時段只能查中介表
+    unflagged = [joined[name] for name in names if by_name[name] is None]
+
+    queryset = queryset.alias(_meal_time_bits=F('meal_time_mask').bitand(wanted))
+    masked = Q(meal_time_mask__isnull=False, _meal_time_bits=wanted) & Q(*unflagged)
+    return queryset.filter(masked | Q(*joined.values(), meal_time_mask__isnull=True))
+
+
+def meal_time_names(dishes, bits=None):
+    """dishes 為 (id, 遮罩) 的序列，回傳 {id: [時段名稱, ...]}（依名稱排序）
+
+    遮罩可用時直接解碼，其餘菜餚一次查詢中介表。
+    """
+    bits = MealTimeBits() if bits is None else bits
+    names = {}
+    fallback = []
+    for dish_id, mask in dishes:
+        if mask is None or not bits.complete:
+            fallback.append(dish_id)
+        else:
+            names[dish_id] = bits.names(mask)
+
+    if fallback:
+        names.update((dish_id, []) for dish_id in fallback)
+        rows = (
+            Dish.meal_times.through.objects
+            .filter(dish_id__in=fallback)
+            .order_by('mealtime__name')
+            .values_list('dish_id', 'mealtime__name')
+        )
+        for dish_id, name in rows:
+            names[dish_id].append(name)
+    return names
+
+
+def check_masks(limit=20):
+    """比對遮罩與中介表
+
+    回傳 {'mismatched': 不一致的菜餚數, 'examples': [(菜名, 目前遮罩, 正確遮罩)]（最多 limit 筆）,
+          'uncomputed': 遮罩為空值的菜餚數, 'unflagged': 還有空閒旗標卻沒有分配的時段,
+          'invalid': 旗標不是 2 的次方的時段}
+    """
+    mismatched = (
+        Dish.objects.filter(meal_time_mask__isnull=False)
+        .annotate(expected_mask=mask_expression())
+        .exclude(meal_time_mask=F('expected_mask'))
+    )
+    meal_times = list(MealTime.objects.order_by('id').values_list('name', 'bit'))
+    has_free_bits = sum(bit is not None for _, bit in meal_times) < MAX_BITS
+
+    return {
+        'mismatched': mismatched.count(),
+        'examples': list(mismatched.order_by('name').values_list('name', 'meal_time_mask', 'expected_mask')[:limit]),
+        'uncomputed': Dish.objects.filter(meal_time_mask__isnull=True).count(),
+        'unflagged': [name for name, bit in meal_times if bit is None and has_free_bits],
+        'invalid': [name for name, bit in meal_times if bit is not None and (bit <= 0 or bit & (bit - 1))],
+    }
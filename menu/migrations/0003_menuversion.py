@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    MenuVersion = apps.get_model('menu', 'MenuVersion')
+    MenuVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0002_dish_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-17 00:27
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """PostgreSQL 上以 CREATE INDEX CONCURRENTLY 建立，不鎖住菜餚表的寫入；其他資料庫照一般 AddIndex 建立"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在交易中執行
+    atomic = False
+
+    dependencies = [
+        ('menu', '0003_menuversion'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('price', 0)), fields=['price'], name='dish_zero_price_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='dish',
+            index=models.Index(fields=['category', 'price'], name='dish_category_price_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='dish',
+            index=models.Index(fields=['category', 'calories'], name='dish_category_calories_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='dish',
+            index=models.Index(fields=['updated_at'], name='dish_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-17 00:29
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+MAX_BITS = 63
+
+
+def backfill_masks(apps, schema_editor):
+    MealTime = apps.get_model('menu', 'MealTime')
+    Dish = apps.get_model('menu', 'Dish')
+
+    for position, meal_time_id in enumerate(MealTime.objects.order_by('id').values_list('id', flat=True)[:MAX_BITS]):
+        MealTime.objects.filter(pk=meal_time_id).update(bit=1 << position)
+
+    total = (
+        Dish.meal_times.through.objects
+        .filter(dish_id=OuterRef('pk'), mealtime__bit__isnull=False)
+        .values('dish_id')
+        .annotate(total=Sum('mealtime__bit'))
+        .values('total')
+    )
+    Dish.objects.update(meal_time_mask=Coalesce(Subquery(total), Value(0), output_field=BigIntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0004_dish_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='meal_time_mask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='mealtime',
+            name='bit',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2 on 2026-10-17 00:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def build_summary(apps, schema_editor):
+    Category = apps.get_model('menu', 'Category')
+    MealTime = apps.get_model('menu', 'MealTime')
+    Dish = apps.get_model('menu', 'Dish')
+    MenuSummary = apps.get_model('menu', 'MenuSummary')
+
+    def aggregates(prefix=''):
+        return {
+            'dish_count': Count(f'{prefix}id'),
+            'price_sum': Sum(f'{prefix}price'),
+            'calories_sum': Sum(f'{prefix}calories'),
+            'min_price': Min(f'{prefix}price'),
+            'max_price': Max(f'{prefix}price'),
+            'min_calories': Min(f'{prefix}calories'),
+            'max_calories': Max(f'{prefix}calories'),
+        }
+
+    by_category = {
+        row.pop('category_id'): row
+        for row in Dish.objects.order_by().values('category_id').annotate(**aggregates())
+    }
+    by_meal_time = {
+        row.pop('mealtime_id'): row
+        for row in Dish.meal_times.through.objects.order_by().values('mealtime_id').annotate(**aggregates('dish__'))
+    }
+    empty = {'dish_count': 0, 'price_sum': 0, 'calories_sum': 0}
+    MenuSummary.objects.bulk_create(
+        [MenuSummary(category_id=pk, **by_category.get(pk, empty)) for pk in Category.objects.values_list('id', flat=True)]
+        + [MenuSummary(meal_time_id=pk, **by_meal_time.get(pk, empty)) for pk in MealTime.objects.values_list('id', flat=True)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0005_meal_time_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dish_count', models.IntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('calories_sum', models.BigIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('min_calories', models.IntegerField(blank=True, null=True)),
+                ('max_calories', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='menu.category')),
+                ('meal_time', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='menu.mealtime')),
+            ],
+            options={
+                'verbose_name_plural': 'Menu summaries',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', False), ('meal_time__isnull', True)), models.Q(('category__isnull', True), ('meal_time__isnull', False)), _connector='OR'), name='menu_summary_one_key')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 00:45
+
+from django.db import DatabaseError, migrations, transaction
+
+
+def create_trigram_index(apps, schema_editor):
+    """PostgreSQL 上可安裝 pg_trgm 時建立菜名的三字元組 GIN 索引，否則略過（改用行程內索引）"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            # 沒有建立擴充功能的權限
+            return
+        cursor.execute('CREATE INDEX IF NOT EXISTS dish_name_trgm_idx ON menu_dish USING gin (name gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS dish_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0006_menusummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -14,6 +14,9 @@ class Category(models.Model):
 class MealTime(models.Model):
     """供應時段"""
     name = models.CharField(max_length=50, unique=True)
+    # 在 Dish.meal_time_mask 中代表此時段的旗標（2 的次方），建立時由 menu.meal_masks 分配；
+    # 時段超過 63 個時其餘為空值，篩選這些時段時改查中介表
+    bit = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
     
     def __str__(self):
         return self.name
@@ -25,12 +28,74 @@ class Dish(models.Model):
     meal_times = models.ManyToManyField(MealTime, related_name='dishes')
     price = models.DecimalField(max_digits=6, decimal_places=2)
     calories = models.IntegerField()
+    # 內容指紋（類別、價格、熱量、供應時段），增量匯入用來略過未變更的菜餚；空字串表示未知
+    fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False)
+    # 供應時段旗標的總和（見 MealTime.bit），依時段篩選與列出時不需要 JOIN 中介表；
+    # 空值表示尚未計算，讀取時改查中介表
+    meal_time_mask = models.BigIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Dishes"
         ordering = ['name']
+        indexes = [
+            # 狀態畫面與 fix_zero_prices 反覆查詢價格為 0 的菜餚，只索引這一小部分
+            models.Index(fields=['price'], condition=models.Q(price=0), name='dish_zero_price_idx'),
+            # 依類別再以價格／熱量範圍篩選（API 清單）
+            models.Index(fields=['category', 'price'], name='dish_category_price_idx'),
+            models.Index(fields=['category', 'calories'], name='dish_category_calories_idx'),
+            models.Index(fields=['updated_at'], name='dish_updated_at_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.name} - ¥{self.price}"
\ No newline at end of file
+        return f"{self.name} - ¥{self.price}"
+
+class MenuVersion(models.Model):
+    """菜單資料版本（單列）：匯入、修復、刪除或後台修改提交時加一，API 快取以此判斷是否過期"""
+    SINGLETON_ID = 1
+    
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"v{self.version}"
+
+class MenuSummary(models.Model):
+    """依食材類別或供應時段預先彙總的統計（每列只設定 category 或 meal_time 其中之一）
+
+    由 menu.summary 隨匯入、修復與刪除以差值維護；讀取時不需要掃描菜餚。
+    """
+    category = models.OneToOneField(Category, null=True, blank=True, on_delete=models.CASCADE, related_name='summary')
+    meal_time = models.OneToOneField(MealTime, null=True, blank=True, on_delete=models.CASCADE, related_name='summary')
+    dish_count = models.IntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    calories_sum = models.BigIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    min_calories = models.IntegerField(null=True, blank=True)
+    max_calories = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Menu summaries"
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(category__isnull=False, meal_time__isnull=True)
+                    | models.Q(category__isnull=True, meal_time__isnull=False)
+                ),
+                name='menu_summary_one_key',
+            ),
+        ]
+    
+    @property
+    def avg_price(self):
+        return self.price_sum / self.dish_count if self.dish_count else None
+    
+    @property
+    def avg_calories(self):
+        return self.calories_sum / self.dish_count if self.dish_count else None
+    
+    def __str__(self):
+        return f"{self.category or self.meal_time}: {self.dish_count} 道菜"
\ No newline at end of file
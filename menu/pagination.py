@@ -0,0 +1,44 @@
+"""
+估計筆數的分頁 - 百萬筆的資料表上避免每頁都執行 COUNT(*)
+
+PostgreSQL 上未篩選的清單以 pg_class.reltuples（VACUUM / ANALYZE 時更新）
+作為總筆數；資料表很小、尚未 ANALYZE 或有篩選條件時照常精確計算。
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# 估計值低於此筆數時改為精確計算（小表 COUNT(*) 很便宜，估計值也可能不準）
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimated_table_count(model, using='default'):
+    """資料表的估計筆數；不是 PostgreSQL 或從未 ANALYZE 時回傳 None"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # 從未 ANALYZE 的資料表 reltuples 為 -1（PostgreSQL 14 起）或 0
+    if not row or row[0] is None or row[0] <= 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """未篩選的 QuerySet 以估計筆數分頁"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_table_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,188 @@
+"""
+PostgreSQL COPY 匯入 - 把整份菜單串流進暫存表，再以 INSERT ... ON CONFLICT 合併
+
+紀錄格式與 menu.importer 相同。整個流程在單一交易中完成，結果與
+bulk_upsert_dishes 相同（同名菜餚以最後一筆為準）。
+"""
+
+import csv
+import io
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .importer import record_fingerprint
+from .meal_masks import assign_bits
+from .models import Dish, Category, MealTime
+from .summary import apply_delta, group_stats
+from .versioning import menu_write
+
+# 每次寫入 COPY 串流的列數
+COPY_CHUNK_ROWS = 10000
+
+STAGING_COLUMNS = ['seq', 'name', 'category', 'price', 'calories', 'meal_times', 'sync_meal_times', 'fingerprint']
+
+
+def _csv_chunks(records, chunk_rows=COPY_CHUNK_ROWS):
+    """把紀錄轉成 COPY (FORMAT csv) 的文字區塊"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for seq, record in enumerate(records):
+        meal_times = record['meal_times']
+        writer.writerow([
+            seq,
+            record['name'],
+            record['category'],
+            record['price'],
+            record['calories'],
+            ','.join(meal_times or []),
+            't' if meal_times is not None else 'f',
+            record_fingerprint(record),
+        ])
+        if seq % chunk_rows == chunk_rows - 1:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _copy_from(cursor, sql, chunks):
+    """相容 psycopg 3 與 psycopg2 的 COPY FROM STDIN"""
+    raw = cursor.cursor
+    if hasattr(raw, 'copy'):
+        # psycopg 3：同一個 COPY 串流持續寫入
+        with raw.copy(sql) as copy:
+            for chunk in chunks:
+                copy.write(chunk)
+    else:
+        # psycopg2：每個區塊一次 copy_expert
+        for chunk in chunks:
+            raw.copy_expert(sql, io.StringIO(chunk))
+
+
+def copy_import(records):
+    """以 COPY + INSERT ... ON CONFLICT 匯入紀錄
+
+    回傳 {'created': 新增數, 'updated': 更新數}
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError(f"COPY 匯入只支援 PostgreSQL（目前為 {connection.vendor}）")
+
+    qn = connection.ops.quote_name
+    dish_table = qn(Dish._meta.db_table)
+    category_table = qn(Category._meta.db_table)
+    meal_time_table = qn(MealTime._meta.db_table)
+    through_table = qn(Dish.meal_times.through._meta.db_table)
+
+    with menu_write(), connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE menu_import_staging (
+                seq bigint,
+                name varchar(200),
+                category varchar(50),
+                price numeric(6, 2),
+                calories integer,
+                meal_times text,
+                sync_meal_times boolean,
+                fingerprint varchar(40)
+            ) ON COMMIT DROP
+        """)
+        _copy_from(
+            cursor,
+            f"COPY menu_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            "WITH (FORMAT csv, FORCE_NOT_NULL (name, category, meal_times, fingerprint))",
+            _csv_chunks(records),
+        )
+
+        # 同名菜餚以最後一筆為準
+        cursor.execute("""
+            CREATE TEMP TABLE menu_import_dish ON COMMIT DROP AS
+            SELECT DISTINCT ON (name) * FROM menu_import_staging ORDER BY name, seq DESC
+        """)
+        cursor.execute("ANALYZE menu_import_dish")
+        
+        # 統計表只依這次匯入的菜餚前後差值更新
+        imported = Dish.objects.filter(name__in=RawSQL('SELECT name FROM menu_import_dish', []))
+        before = group_stats(imported)
+
+        cursor.execute(f"""
+            INSERT INTO {category_table} (name, description)
+            SELECT DISTINCT category, '' FROM menu_import_dish
+            ON CONFLICT (name) DO NOTHING
+        """)
+        cursor.execute(f"""
+            INSERT INTO {meal_time_table} (name)
+            SELECT DISTINCT t.name
+            FROM menu_import_dish s
+            CROSS JOIN LATERAL unnest(string_to_array(s.meal_times, ',')) AS t(name)
+            WHERE t.name <> ''
+            ON CONFLICT (name) DO NOTHING
+        """)
+        assign_bits()
+
+        cursor.execute(f"""
+            WITH upserted AS (
+                INSERT INTO {dish_table} (name, category_id, price, calories, fingerprint, created_at, updated_at)
+                SELECT s.name, c.id, s.price, s.calories, s.fingerprint, now(), now()
+                FROM menu_import_dish s
+                JOIN {category_table} c ON c.name = s.category
+                ON CONFLICT (name) DO UPDATE SET
+                    category_id = EXCLUDED.category_id,
+                    price = EXCLUDED.price,
+                    calories = EXCLUDED.calories,
+                    fingerprint = EXCLUDED.fingerprint,
+                    updated_at = EXCLUDED.updated_at
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+        """)
+        created, updated = cursor.fetchone()
+
+        # 供應時段：先算出目標關聯，再刪除多餘的、補上缺少的
+        cursor.execute(f"""
+            CREATE TEMP TABLE menu_import_meal_time ON COMMIT DROP AS
+            SELECT DISTINCT d.id AS dish_id, m.id AS mealtime_id
+            FROM menu_import_dish s
+            JOIN {dish_table} d ON d.name = s.name
+            CROSS JOIN LATERAL unnest(string_to_array(s.meal_times, ',')) AS t(name)
+            JOIN {meal_time_table} m ON m.name = t.name
+            WHERE s.sync_meal_times
+        """)
+        cursor.execute(f"""
+            DELETE FROM {through_table} j
+            USING menu_import_dish s, {dish_table} d
+            WHERE s.sync_meal_times
+              AND d.name = s.name
+              AND j.dish_id = d.id
+              AND NOT EXISTS (
+                  SELECT 1 FROM menu_import_meal_time w
+                  WHERE w.dish_id = j.dish_id AND w.mealtime_id = j.mealtime_id
+              )
+        """)
+        cursor.execute(f"""
+            INSERT INTO {through_table} (dish_id, mealtime_id)
+            SELECT dish_id, mealtime_id FROM menu_import_meal_time
+            ON CONFLICT (dish_id, mealtime_id) DO NOTHING
+        """)
+        # 供應時段遮罩：各旗標不重複，重複的時段名稱只算一次
+        cursor.execute(f"""
+            UPDATE {dish_table} d
+            SET meal_time_mask = masks.mask
+            FROM (
+                SELECT w.dish_id, COALESCE(SUM(DISTINCT m.bit), 0) AS mask
+                FROM (
+                    SELECT d.id AS dish_id
+                    FROM menu_import_dish s
+                    JOIN {dish_table} d ON d.name = s.name
+                    WHERE s.sync_meal_times
+                ) w
+                LEFT JOIN menu_import_meal_time j ON j.dish_id = w.dish_id
+                LEFT JOIN {meal_time_table} m ON m.id = j.mealtime_id
+                GROUP BY w.dish_id
+            ) masks
+            WHERE d.id = masks.dish_id
+        """)
+        apply_delta(before, group_stats(imported))
+
+    return {'created': created, 'updated': updated}
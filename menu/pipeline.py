@@ -0,0 +1,137 @@
+"""
+非同步管線匯入 - 讀取、清理、寫入三個階段以有界佇列串接並同時進行
+
+    讀取（執行緒） ──佇列──▶ 清理（執行緒或 executor） ──佇列──▶ 寫入（sync_to_async）
+
+佇列容量 queue_size 決定背壓：下游較慢時上游最多超前 queue_size 個區塊，
+記憶體用量因此有上限。各階段依輸入順序處理區塊，結果與循序匯入相同。
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class StageStats:
+    """單一階段的統計：處理的區塊數、筆數與實際工作時間（不含等待佇列）"""
+
+    def __init__(self, name):
+        self.name = name
+        self.chunks = 0
+        self.rows = 0
+        self.busy = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.busy if self.busy else 0.0
+
+
+class PipelineStats:
+    def __init__(self):
+        self.read = StageStats('讀取')
+        self.clean = StageStats('清理')
+        self.write = StageStats('寫入')
+        self.wall = 0.0
+
+    @property
+    def stages(self):
+        return [self.read, self.clean, self.write]
+
+
+async def _read(chunks, output, stats):
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = await asyncio.to_thread(next, iterator, _DONE)
+        stats.busy += time.perf_counter() - start
+        if chunk is _DONE:
+            break
+        stats.chunks += 1
+        stats.rows += len(chunk)
+        await output.put(chunk)
+    await output.put(_DONE)
+
+
+async def _clean(clean_chunk, source, output, stats, executor, concurrency):
+    loop = asyncio.get_running_loop()
+    # 最多同時送出 concurrency 個區塊，依送出順序取回結果
+    pending = deque()
+    last_finished = 0.0
+
+    async def emit():
+        nonlocal last_finished
+        chunk, future, submitted = pending.popleft()
+        result = await future
+        # 平行時各區塊的執行時間互相重疊，只計算與前一個區塊不重疊的部分；
+        # 等待下游佇列的時間不算在內
+        stats.busy += time.perf_counter() - max(submitted, last_finished)
+        stats.chunks += 1
+        stats.rows += len(chunk)
+        await output.put(result)
+        last_finished = time.perf_counter()
+
+    while True:
+        chunk = await source.get()
+        if chunk is _DONE:
+            break
+        pending.append((chunk, loop.run_in_executor(executor, clean_chunk, chunk), time.perf_counter()))
+        if len(pending) >= concurrency:
+            await emit()
+    while pending:
+        await emit()
+    await output.put(_DONE)
+
+
+async def _write(write_chunk, source, stats):
+    # thread_sensitive：所有寫入都在同一個執行緒（同一個資料庫連線）中進行
+    write = sync_to_async(write_chunk, thread_sensitive=True)
+    while True:
+        chunk = await source.get()
+        if chunk is _DONE:
+            break
+        start = time.perf_counter()
+        rows = await write(chunk)
+        stats.busy += time.perf_counter() - start
+        stats.chunks += 1
+        stats.rows += rows
+
+
+async def run_pipeline(chunks, clean_chunk, write_chunk, queue_size=DEFAULT_QUEUE_SIZE,
+                       executor=None, concurrency=1):
+    """執行三階段管線，回傳 PipelineStats
+
+    chunks: 產生原始區塊的同步可迭代物件，在執行緒中逐塊讀取
+    clean_chunk(chunk): 清理一個區塊；在 executor 中執行（None 為預設執行緒池），
+        使用 ProcessPoolExecutor 時必須是可 pickle 的模組層級函式
+    write_chunk(cleaned): 寫入一個清理後的區塊並回傳寫入的筆數
+    concurrency: 清理階段最多同時處理的區塊數
+
+    由同步程式碼以 async_to_sync(run_pipeline)(...) 呼叫時，寫入會回到呼叫端
+    的執行緒執行，沿用原本的 Django 資料庫連線。任一階段失敗時取消其他
+    階段並拋出該例外。
+    """
+    stats = PipelineStats()
+    raw = asyncio.Queue(maxsize=queue_size)
+    cleaned = asyncio.Queue(maxsize=queue_size)
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_read(chunks, raw, stats.read)),
+        asyncio.create_task(_clean(clean_chunk, raw, cleaned, stats.clean, executor, max(concurrency, 1))),
+        asyncio.create_task(_write(write_chunk, cleaned, stats.write)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    stats.wall = time.perf_counter() - start
+    return stats
@@ -0,0 +1,199 @@
+"""
+匯入與修復的進度回報 - 彙總計數、限速的進度列，逐筆的警告與錯誤寫到 rejects 檔案
+
+百萬筆的匯入若每筆都 print 一行，光是終端機輸出就要數分鐘，也會塞爆日誌收集。
+ProgressReporter 只累計計數，每 PROGRESS_INTERVAL 秒最多輸出一行進度（筆數、
+筆/秒、預計剩餘時間與各項計數）；逐筆的警告與錯誤寫到 RejectsFile（JSONL 或
+CSV：CSV 行號、菜名、欄位、原始值、訊息），結束時只顯示總數與前幾筆。
+
+verbose 決定是否保留原本的逐筆輸出：True 一律輸出、False 一律不輸出、None 時
+只有不超過 VERBOSE_ROW_LIMIT 筆的資料才輸出（小檔案的輸出與以前相同）。
+manage.py 指令以 -v 2 與 --rejects 設定；互動選單可以用環境變數
+MENU_VERBOSE=1/0 與 MENU_REJECTS=檔案路徑。
+"""
+
+import csv
+import json
+import os
+import time
+from collections import Counter
+
+ENV_VERBOSE = 'MENU_VERBOSE'
+ENV_REJECTS = 'MENU_REJECTS'
+
+PROGRESS_INTERVAL = 2.0
+VERBOSE_ROW_LIMIT = 1000
+# 沒有逐筆輸出、也沒有 rejects 檔案時，結束時列出的警告與錯誤筆數
+SHOWN_REJECTS = 5
+
+REJECT_FIELDS = ['row', 'level', 'name', 'field', 'value', 'message']
+LEVEL_LABELS = {'warning': '警告', 'error': '錯誤'}
+COUNT_LABELS = {'created': '新增', 'updated': '更新', 'fixed': '修復', 'warning': '警告', 'error': '錯誤'}
+
+
+def env_verbose():
+    """MENU_VERBOSE：1 一律逐筆輸出、0 一律不輸出，未設定時為 None（依筆數決定）"""
+    value = os.environ.get(ENV_VERBOSE, '').strip().lower()
+    if not value:
+        return None
+    return value not in ('0', 'false', 'no')
+
+
+def resolve_verbose(verbose, total):
+    """verbose 為 None 時依筆數決定：筆數已知且不超過 VERBOSE_ROW_LIMIT 才逐筆輸出"""
+    if verbose is not None:
+        return verbose
+    return total is not None and total <= VERBOSE_ROW_LIMIT
+
+
+def count_csv_rows(file_path):
+    """估計 CSV 的資料筆數：換行數減去標題列（欄位內含換行時會略多），供估計剩餘時間"""
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} 秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} 分 {seconds:02d} 秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} 小時 {minutes:02d} 分"
+
+
+def format_reject(record):
+    """一筆警告或錯誤的單行文字"""
+    where = []
+    if record['row'] is not None:
+        where.append(f"第 {record['row']} 行")
+    if record['name']:
+        where.append(record['name'])
+    if record['field']:
+        where.append(f"{record['field']}={record['value']!r}")
+    label = LEVEL_LABELS.get(record['level'], record['level'])
+    if not where:
+        return f"  {label}: {record['message']}"
+    return f"  {label}: {' '.join(where)}：{record['message']}"
+
+
+class RejectsFile:
+    """逐筆的警告與錯誤，路徑以 .csv 結尾時寫成 CSV（含 BOM），否則為 JSONL
+
+    建立時即清空檔案；同一個 RejectsFile 可以由多個操作共用（載入、清理、匯入），
+    內容依發生順序附加。欄位見 REJECT_FIELDS，row 為 CSV 檔案中的行號（標題為第 1 行）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._csv = str(path).lower().endswith('.csv')
+        if self._csv:
+            self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(REJECT_FIELDS)
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        if self._csv:
+            self._writer.writerow(['' if record[field] is None else record[field] for field in REJECT_FIELDS])
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ProgressReporter:
+    """一個操作（清理、匯入、修復）的進度：累計計數、限速輸出進度列、收集警告與錯誤
+
+    total 為預計的筆數，未知時為 None（不顯示百分比與剩餘時間）。rejects 為共用的
+    RejectsFile，None 時只保留前 SHOWN_REJECTS 筆在結束時顯示。逐筆輸出由呼叫端
+    檢查 self.verbose 後自行 print，不輸出時連字串都不必組。
+    """
+
+    def __init__(self, label, total=None, verbose=None, rejects=None, interval=PROGRESS_INTERVAL,
+                 clock=time.monotonic):
+        self.label = label
+        self.total = total
+        self.verbose = resolve_verbose(verbose, total)
+        self.rejects = rejects
+        self.interval = interval
+        self.clock = clock
+        self.rows = 0
+        self.counts = Counter()
+        self.shown = []
+        self.started = clock()
+        self._last_line = self.started
+        self._lines = 0
+
+    def advance(self, rows=1, **counts):
+        """累計處理的筆數與計數（例如 created=1），距上次進度列超過 interval 秒時輸出一行"""
+        self.rows += rows
+        if counts:
+            self.counts.update(counts)
+        now = self.clock()
+        if now - self._last_line >= self.interval:
+            self._last_line = now
+            self._lines += 1
+            print(self.progress_line(now))
+
+    def reject(self, message, row=None, name=None, field=None, value=None, level='warning'):
+        """記錄一筆警告（level='warning'）或錯誤（level='error'）"""
+        record = {'row': row, 'level': level, 'name': name, 'field': field, 'value': value, 'message': message}
+        self.counts[level] += 1
+        if self.rejects is not None:
+            self.rejects.write(record)
+        if self.verbose:
+            print(format_reject(record))
+        elif len(self.shown) < SHOWN_REJECTS:
+            self.shown.append(record)
+
+    def progress_line(self, now=None):
+        elapsed = (self.clock() if now is None else now) - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            parts = [f"{self.rows}/{self.total} 筆 ({min(self.rows / self.total, 1):.1%})"]
+        else:
+            parts = [f"{self.rows} 筆"]
+        parts.append(f"{rate:.0f} 筆/秒")
+        if self.total and rate and self.rows < self.total:
+            parts.append(f"預計剩餘 {format_duration((self.total - self.rows) / rate)}")
+        counts = '、'.join(f"{COUNT_LABELS.get(key, key)} {value}" for key, value in self.counts.items() if value)
+        return f"  {self.label}進度: {'，'.join(parts)}" + (f"（{counts}）" if counts else "")
+
+    def close(self):
+        """結束：輸出過進度列時補上總耗時；沒有逐筆輸出時列出警告與錯誤的總數與前幾筆"""
+        if self._lines:
+            elapsed = self.clock() - self.started
+            rate = self.rows / elapsed if elapsed > 0 else 0.0
+            print(f"  {self.label}共 {self.rows} 筆，耗時 {format_duration(elapsed)}（{rate:.0f} 筆/秒）")
+
+        rejected = self.counts['warning'] + self.counts['error']
+        if not rejected or self.verbose:
+            return
+        summary = f"警告 {self.counts['warning']} 筆、錯誤 {self.counts['error']} 筆"
+        if self.rejects is not None:
+            print(f"{summary}，明細已寫入 {self.rejects.path}")
+            return
+        print(f"{summary}（前{len(self.shown)}個）:" if rejected > len(self.shown) else f"{summary}:")
+        for record in self.shown:
+            print(format_reject(record))
+        if rejected > len(self.shown):
+            print(f"  ... 還有 {rejected - len(self.shown)} 個")
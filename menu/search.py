@@ -0,0 +1,302 @@
+"""
+菜名模糊搜尋 - 以字元 n-gram 的相似度排序，容許打錯字（例如「鮮蝦云吞麵」）
+
+兩種實作：
+  * PostgreSQL 且已安裝 pg_trgm：查詢不含中日韓文字時，以 GIN (name gin_trgm_ops)
+    索引（遷移 0007 在可安裝擴充功能時建立）的 % 運算子找候選，similarity() 排序
+  * 其他情況：行程內的 n-gram 反向索引（NameIndex）
+
+pg_trgm 一律切三字元組，對三、五個字的中文菜名太粗：「叉燒飯」打錯一個字只剩
+一個三字元組相同，相似度 0.14，低於門檻。因此中日韓文字一律由行程內索引處理，
+切分方式如下（名稱先做 NFKC 正規化並轉小寫，只保留字母與數字）：
+  * 中日韓文字：前後補一個空白切成二字元組，打錯一個字仍有一半以上相同
+  * 其他文字（英文、數字）：與 pg_trgm 相同，單字前補兩個空白、後補一個空白切成
+    三字元組
+相似度也與 pg_trgm 相同：共有的 n-gram 數 / 兩者 n-gram 聯集的數量。
+
+行程內索引以菜單版本為準（見 menu.versioning）。第一次搜尋時建立；之後版本
+改變時在背景執行緒重建（百萬筆菜餚約需數秒），重建完成前搜尋繼續使用舊的索引，
+請求不會等待重建，但結果暫時不含最新的變更（search_matches() 會標示）。重建與
+查詢搶同一個 GIL，因此兩次重建至少相隔 REBUILD_INTERVAL 秒：持續寫入時不會
+一直重建拖慢查詢，結果最多落後約 REBUILD_INTERVAL 秒加上重建的時間。在交易中
+搜尋（例如測試或 ATOMIC_REQUESTS）時直接重建：背景執行緒使用另一個資料庫連線，
+看不到這個交易還沒提交的寫入。查詢時只讀取查詢字串各 n-gram 的 posting：有 numpy 時
+逐一累加各 posting 計數，只對共有 n-gram 夠多、可能進入前幾名的菜餚計算
+相似度，百萬筆菜餚約數毫秒；沒有 numpy 時以 Counter 計數。
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .models import Dish
+from .versioning import current_version
+
+# 與 pg_trgm 的 similarity_threshold 預設值相同
+SIMILARITY_THRESHOLD = 0.3
+DEFAULT_LIMIT = 20
+# 查詢字串只取前面這麼多字，避免超長的輸入產生大量 n-gram
+MAX_QUERY_LENGTH = 64
+# 兩次背景重建索引之間至少相隔的秒數
+REBUILD_INTERVAL = 2.0
+
+# 平假名、片假名、中日韓統一表意文字（含擴充 A、B 以後）、諺文音節、相容表意文字
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0003134f'
+# 一段連續的中日韓文字，或一個由其他字母、數字組成的單字
+TOKEN_PATTERN = re.compile(f'([{CJK_CHARS}]+)|([^\\W_{CJK_CHARS}]+)')
+CJK_PATTERN = re.compile(f'[{CJK_CHARS}]')
+
+
+def normalize(text):
+    """NFKC 正規化（全形英數轉半形）並轉小寫"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def name_grams(text):
+    """切成 n-gram 集合：中日韓文字為二字元組，其他單字為三字元組"""
+    grams = set()
+    for cjk, word in TOKEN_PATTERN.findall(normalize(text)):
+        if cjk:
+            padded = f' {cjk} '
+            grams.update(padded[i:i + 2] for i in range(len(padded) - 1))
+        else:
+            padded = f'  {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """兩個字串的 n-gram 相似度（0 到 1）"""
+    grams_a, grams_b = name_grams(a), name_grams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class NameIndex:
+    """菜名的 n-gram 反向索引：n-gram → 含有它的菜餚位置（遞增）
+
+    rows 為依 id 遞增的 (菜餚 id, 菜名)；位置順序即 id 順序，相似度相同時
+    id 小的排在前面。use_numpy=False 可強制使用純 Python 的計數。
+    """
+
+    def __init__(self, rows, version=None, use_numpy=None):
+        self.version = version
+        ids = array('q')
+        gram_counts = array('i')
+        # 位置以 64 位元整數存放：numpy 以陣列為索引時不需先轉型（約快一倍）
+        postings = defaultdict(lambda: array('q'))
+        for position, (dish_id, name) in enumerate(rows):
+            grams = name_grams(name)
+            ids.append(dish_id)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(position)
+
+        np = _numpy() if use_numpy is not False else None
+        self.numpy = np
+        if np is not None:
+            # array 與 numpy 共用同一塊記憶體，不複製
+            self.ids = np.frombuffer(ids, dtype=np.int64)
+            self.gram_counts = np.frombuffer(gram_counts, dtype=np.int32)
+            self.postings = {gram: np.frombuffer(positions, dtype=np.int64) for gram, positions in postings.items()}
+        else:
+            self.ids = ids
+            self.gram_counts = gram_counts
+            self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, limit=DEFAULT_LIMIT, threshold=SIMILARITY_THRESHOLD):
+        """回傳 [(菜餚 id, 相似度)]，依相似度由高到低"""
+        grams = name_grams(query[:MAX_QUERY_LENGTH])
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists or limit < 1:
+            return []
+        query_count = len(grams)
+        # 菜名的 n-gram 數不少於共有的數量，相似度 >= threshold 至少要有
+        # threshold × 查詢 n-gram 數個共有的 n-gram
+        min_shared = max(1, math.ceil(threshold * query_count - 1e-9))
+        if self.numpy is not None:
+            return self._search_numpy(lists, query_count, min_shared, limit, threshold)
+        return self._search_python(lists, query_count, min_shared, limit, threshold)
+
+    def _search_numpy(self, lists, query_count, min_shared, limit, threshold):
+        np = self.numpy
+        # 每個 posting 內的位置不重複，逐一累加即為共有的 n-gram 數（查詢最多約
+        # 130 個 n-gram，uint8 足夠，掃描也只需讀 1 byte／菜餚）
+        shared = np.zeros(len(self.ids), dtype=np.uint8)
+        for positions in lists:
+            shared[positions] += 1
+
+        # 先從共有 n-gram 最多的菜餚往下找到至少 limit 個候選並計算相似度；
+        # 共有 c 個 n-gram 的菜名相似度不超過 c / 查詢的 n-gram 數，因此只有共有數
+        # 不少於「第 limit 高的相似度 × 查詢 n-gram 數」的菜餚可能進入前 limit 名
+        floor = int(shared.max())
+        while floor > min_shared and np.count_nonzero(shared >= floor) < limit:
+            floor -= 1
+        positions, scores = self._scores(shared, floor, query_count, threshold)
+        needed = min_shared
+        if len(scores) >= limit:
+            cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            needed = max(min_shared, math.ceil(cutoff * query_count - 1e-9))
+        if needed < floor:
+            positions, scores = self._scores(shared, needed, query_count, threshold)
+
+        if len(positions) > limit:
+            # 先留下不低於第 limit 高分數的候選，再排序
+            cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= cutoff
+            positions, scores = positions[keep], scores[keep]
+        order = self.numpy.lexsort((positions, -scores))[:limit]
+        return [(int(self.ids[i]), float(score)) for i, score in zip(positions[order], scores[order])]
+
+    def _scores(self, shared, floor, query_count, threshold):
+        """共有 n-gram 數不少於 floor 的菜餚位置與相似度（只留下達到門檻的）"""
+        positions = self.numpy.flatnonzero(shared >= floor)
+        counts = shared[positions].astype(self.numpy.int32)
+        scores = counts / (query_count + self.gram_counts[positions] - counts)
+        keep = scores >= threshold
+        return positions[keep], scores[keep]
+
+    def _search_python(self, lists, query_count, min_shared, limit, threshold):
+        counter = Counter()
+        for positions in lists:
+            counter.update(positions)
+        candidates = []
+        for position, shared in counter.items():
+            if shared < min_shared:
+                continue
+            score = shared / (query_count + self.gram_counts[position] - shared)
+            if score >= threshold:
+                candidates.append((-score, position))
+        return [(self.ids[position], -score) for score, position in heapq.nsmallest(limit, candidates)]
+
+
+_index = None
+_index_lock = threading.Lock()
+# 背景重建索引的執行緒，同一時間最多一個
+_rebuild_thread = None
+# 上一次背景重建開始的時間（time.monotonic()）
+_last_rebuild = None
+
+
+def _build_index(version):
+    # 先讀版本再讀資料，索引內容一定不舊於該版本
+    rows = Dish.objects.order_by('id').values_list('id', 'name').iterator(chunk_size=10000)
+    return NameIndex(rows, version=version)
+
+
+def _rebuild():
+    """背景執行緒：以最新的版本重建索引，完成後取代舊的索引"""
+    global _index, _rebuild_thread, _last_rebuild
+    try:
+        if _last_rebuild is not None:
+            time.sleep(max(0.0, _last_rebuild + REBUILD_INTERVAL - time.monotonic()))
+        _last_rebuild = time.monotonic()
+        index = _build_index(current_version())
+        with _index_lock:
+            _index = index
+    finally:
+        with _index_lock:
+            _rebuild_thread = None
+        # 這個執行緒的資料庫連線不會再被使用
+        connections.close_all()
+
+
+def name_index(version=None):
+    """行程內索引；版本改變後在背景重建，重建完成前回傳舊的索引
+
+    version 為目前的菜單版本（呼叫端已讀取時傳入，省一個查詢）。回傳的索引
+    的 version 與它不同時，表示索引還沒跟上最新的變更。
+    """
+    global _index, _rebuild_thread
+    if version is None:
+        version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    if index is None or connection.in_atomic_block:
+        with _index_lock:
+            # 等待鎖的期間可能已由其他執行緒建好
+            if _index is None or _index.version != version:
+                _index = _build_index(version)
+            return _index
+    with _index_lock:
+        if _rebuild_thread is None:
+            _rebuild_thread = threading.Thread(target=_rebuild, name='menu-name-index', daemon=True)
+            _rebuild_thread.start()
+    return index
+
+
+_pg_trgm_installed = {}
+
+
+def pg_trgm_installed(using='default'):
+    """PostgreSQL 上是否已安裝 pg_trgm（每個資料庫連線設定只查一次）"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    if using not in _pg_trgm_installed:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _pg_trgm_installed[using] = cursor.fetchone() is not None
+    return _pg_trgm_installed[using]
+
+
+def search_backend(query, using='default'):
+    """'pg_trgm' 或 'ngram'；settings.MENU_SEARCH_BACKEND = 'ngram' 可強制使用行程內索引"""
+    if getattr(settings, 'MENU_SEARCH_BACKEND', 'auto') == 'ngram':
+        return 'ngram'
+    if CJK_PATTERN.search(query) or not pg_trgm_installed(using):
+        return 'ngram'
+    return 'pg_trgm'
+
+
+def search_matches(query, limit=DEFAULT_LIMIT):
+    """模糊搜尋菜名，回傳 ([(菜餚 id, 相似度)], 結果是否反映目前的菜單版本)
+
+    行程內索引正在背景重建時結果來自舊的索引，第二個值為 False。
+    """
+    query = query.strip()[:MAX_QUERY_LENGTH]
+    if not query:
+        return [], True
+    if search_backend(query) == 'pg_trgm':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        # % 運算子使用 GIN 索引，門檻為 pg_trgm.similarity_threshold（預設 0.3）
+        matches = (
+            Dish.objects.filter(RawSQL('"menu_dish"."name" %% %s', [query], output_field=BooleanField()))
+            .annotate(similarity=TrigramSimilarity('name', query))
+            .order_by('-similarity', 'id')
+            .values_list('id', 'similarity')[:limit]
+        )
+        return list(matches), True
+    version = current_version()
+    index = name_index(version)
+    return index.search(query, limit), index.version == version
+
+
+def search_dishes(query, limit=DEFAULT_LIMIT):
+    """模糊搜尋菜名，回傳 [(菜餚 id, 相似度)]，依相似度由高到低"""
+    return search_matches(query, limit)[0]
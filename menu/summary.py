@@ -0,0 +1,225 @@
+"""
+菜單統計表 - 依食材類別與供應時段預先彙總的 MenuSummary，隨寫入以差值維護
+
+每個寫入批次以 summary_delta(受影響的菜餚) 包住：寫入前後各對這批菜餚做一次
+分組彙總（只掃描這批菜餚），兩者的差值加到對應的統計列。數量與總和直接相加；
+最小／最大值在新值更極端時直接取代，若被修改或刪除的菜餚原本就是極值，
+則只對該組重新計算（(category, price) 等索引讓類別的重算很便宜）。
+
+讀取統計只需要讀 MenuSummary，與菜餚數無關。rebuild_summary() 以完整的
+GROUP BY 重建，verify_summary() 比對兩者。
+"""
+
+import contextlib
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Sum
+
+from .models import Category, Dish, MealTime, MenuSummary
+
+# 統計列上以差值維護的欄位與極值欄位
+SUM_FIELDS = ('dish_count', 'price_sum', 'calories_sum')
+EXTREME_FIELDS = ('min_price', 'max_price', 'min_calories', 'max_calories')
+STAT_FIELDS = SUM_FIELDS + EXTREME_FIELDS
+
+# 分組的 key：('category', 類別 id) 或 ('meal_time', 時段 id)
+KEY_FIELDS = {'category': 'category_id', 'meal_time': 'meal_time_id'}
+
+CENT = Decimal('0.01')
+
+
+def _aggregates(prefix=''):
+    return {
+        'dish_count': Count(f'{prefix}id'),
+        'price_sum': Sum(f'{prefix}price'),
+        'calories_sum': Sum(f'{prefix}calories'),
+        'min_price': Min(f'{prefix}price'),
+        'max_price': Max(f'{prefix}price'),
+        'min_calories': Min(f'{prefix}calories'),
+        'max_calories': Max(f'{prefix}calories'),
+    }
+
+
+def _stats(row):
+    stats = {field: row[field] for field in STAT_FIELDS}
+    # SQLite 以浮點數加總 DecimalField，取到小數兩位與統計表欄位一致
+    if stats['price_sum'] is not None:
+        stats['price_sum'] = Decimal(stats['price_sum']).quantize(CENT)
+    return stats
+
+
+def group_stats(dishes):
+    """對 dishes (QuerySet) 依類別與供應時段分組彙總（兩個查詢）
+
+    回傳 {('category', id) 或 ('meal_time', id): {欄位: 值}}
+    """
+    stats = {}
+    for row in dishes.order_by().values('category_id').annotate(**_aggregates()):
+        stats['category', row['category_id']] = _stats(row)
+
+    through = Dish.meal_times.through.objects.filter(dish__in=dishes.values('pk'))
+    for row in through.order_by().values('mealtime_id').annotate(**_aggregates('dish__')):
+        stats['meal_time', row['mealtime_id']] = _stats(row)
+    return stats
+
+
+def _group_dishes(key):
+    kind, key_id = key
+    if kind == 'category':
+        return Dish.objects.filter(category_id=key_id)
+    return Dish.objects.filter(meal_times=key_id)
+
+
+def _empty_stats():
+    return {'dish_count': 0, 'price_sum': 0, 'calories_sum': 0,
+            'min_price': None, 'max_price': None, 'min_calories': None, 'max_calories': None}
+
+
+def _extreme(function, *values):
+    values = [value for value in values if value is not None]
+    return function(values) if values else None
+
+
+def _touches_extreme(row, before):
+    """被修改或刪除的菜餚中有目前的極值時，該組的極值必須重新計算"""
+    return any(
+        before[field] is not None and getattr(row, field) is not None and before[field] == getattr(row, field)
+        for field in EXTREME_FIELDS
+    )
+
+
+def apply_delta(before, after):
+    """把同一批菜餚寫入前後的分組統計差值套用到 MenuSummary（應在寫入的交易中呼叫）"""
+    keys = before.keys() | after.keys()
+    if not keys:
+        return
+
+    category_ids = [key_id for kind, key_id in keys if kind == 'category']
+    meal_time_ids = [key_id for kind, key_id in keys if kind == 'meal_time']
+    rows = {}
+    # 鎖住要更新的統計列，並行的匯入依序套用差值
+    for row in MenuSummary.objects.select_for_update().filter(category_id__in=category_ids):
+        rows['category', row.category_id] = row
+    for row in MenuSummary.objects.select_for_update().filter(meal_time_id__in=meal_time_ids):
+        rows['meal_time', row.meal_time_id] = row
+
+    changed = []
+    created = []
+    for key in keys:
+        old = before.get(key) or _empty_stats()
+        new = after.get(key) or _empty_stats()
+        row = rows.get(key)
+        if row is None:
+            if not new['dish_count']:
+                # 分組已清空（例如類別連同菜餚一起刪除），不需要統計列
+                continue
+            if not old['dish_count']:
+                # 新的分組：寫入後的統計就是整組的統計
+                created.append(MenuSummary(**{KEY_FIELDS[key[0]]: key[1]}, **new))
+                continue
+            # 統計列不存在卻有舊資料（尚未建立統計表）：整組重新計算
+            row = MenuSummary(**{KEY_FIELDS[key[0]]: key[1]})
+            _recompute(row, key)
+            created.append(row)
+            continue
+
+        for field in SUM_FIELDS:
+            setattr(row, field, getattr(row, field) + (new[field] or 0) - (old[field] or 0))
+        if old['dish_count'] and _touches_extreme(row, old):
+            _recompute_extremes(row, key)
+        else:
+            row.min_price = _extreme(min, row.min_price, new['min_price'])
+            row.max_price = _extreme(max, row.max_price, new['max_price'])
+            row.min_calories = _extreme(min, row.min_calories, new['min_calories'])
+            row.max_calories = _extreme(max, row.max_calories, new['max_calories'])
+        changed.append(row)
+
+    if changed:
+        MenuSummary.objects.bulk_update(changed, list(STAT_FIELDS))
+    if created:
+        MenuSummary.objects.bulk_create(created)
+
+
+def _recompute(row, key):
+    stats = _stats(_group_dishes(key).aggregate(**_aggregates()))
+    for field in STAT_FIELDS:
+        # 空的分組：總和為 0，極值為空值
+        value = stats[field]
+        setattr(row, field, 0 if value is None and field in SUM_FIELDS else value)
+
+
+def _recompute_extremes(row, key):
+    if not row.dish_count:
+        for field in EXTREME_FIELDS:
+            setattr(row, field, None)
+        return
+    stats = _group_dishes(key).aggregate(**{field: _aggregates()[field] for field in EXTREME_FIELDS})
+    for field in EXTREME_FIELDS:
+        setattr(row, field, stats[field])
+
+
+@contextlib.contextmanager
+def summary_delta(dishes):
+    """包住一批寫入，寫入後依差值更新統計表
+
+    dishes 為受影響菜餚的 QuerySet（寫入前後各評估一次，例如 name__in=這批菜名），
+    須在 menu_write() 的交易之內使用。
+    """
+    before = group_stats(dishes)
+    yield
+    apply_delta(before, group_stats(dishes))
+
+
+def full_stats():
+    """所有類別與時段的完整統計（沒有菜餚的也列出）"""
+    stats = group_stats(Dish.objects.all())
+    for category_id in Category.objects.values_list('id', flat=True):
+        stats.setdefault(('category', category_id), _empty_stats())
+    for meal_time_id in MealTime.objects.values_list('id', flat=True):
+        stats.setdefault(('meal_time', meal_time_id), _empty_stats())
+    return stats
+
+
+def rebuild_summary():
+    """以完整的 GROUP BY 重建統計表，回傳寫入的列數（應在 menu_write() 中呼叫）"""
+    stats = full_stats()
+    MenuSummary.objects.all().delete()
+    MenuSummary.objects.bulk_create(
+        MenuSummary(**{KEY_FIELDS[kind]: key_id}, **values) for (kind, key_id), values in stats.items()
+    )
+    return len(stats)
+
+
+def stored_stats():
+    stats = {}
+    for row in MenuSummary.objects.all():
+        kind = 'category' if row.category_id is not None else 'meal_time'
+        stats[kind, getattr(row, KEY_FIELDS[kind])] = {field: getattr(row, field) for field in STAT_FIELDS}
+    return stats
+
+
+def verify_summary():
+    """比對統計表與完整重算的結果，回傳差異清單 [(key, 欄位, 統計表的值, 重算的值)]"""
+    expected = full_stats()
+    stored = stored_stats()
+    differences = []
+    for key in sorted(expected.keys() | stored.keys()):
+        actual = stored.get(key) or {}
+        wanted = expected.get(key) or {}
+        for field in STAT_FIELDS:
+            stored_value = actual.get(field)
+            expected_value = wanted.get(field)
+            if field in SUM_FIELDS:
+                stored_value = stored_value or 0
+                expected_value = expected_value or 0
+            if stored_value != expected_value:
+                differences.append((key, field, stored_value, expected_value))
+    return differences
+
+
+def summary_rows():
+    """讀取統計表：(類別統計列, 供應時段統計列)，各依名稱排序"""
+    rows = list(MenuSummary.objects.select_related('category', 'meal_time'))
+    categories = sorted((row for row in rows if row.category_id is not None), key=lambda row: row.category.name)
+    meal_times = sorted((row for row in rows if row.meal_time_id is not None), key=lambda row: row.meal_time.name)
+    return categories, meal_times
@@ -1,3 +1,1583 @@
-from django.test import TestCase
+"""
+menu 的測試 - python manage.py test menu
 
-# Create your tests here.
+只適用於 PostgreSQL 的測試（COPY 匯入、查詢計畫）在其他資料庫上略過。
+"""
+
+import codecs
+import contextlib
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from data_manager import DataManager
+from final_manager import FoodDataManager
+
+from . import cleaning, columnar, instrumentation, search
+from .caching import CACHE_ALIAS
+from .dedup import find_duplicates
+from .dimensions import DimensionCache
+from .exporting import EXPORT_HEADER, write_export_csv
+from .health import format_report, health_report
+from .importer import bulk_repair_dishes, bulk_upsert_dishes, chunked, incremental_sync_dishes
+from .meal_masks import check_masks, meal_time_names, refresh_masks
+from .models import Category, Dish, MealTime
+from .pg_loader import copy_import
+from .progress import ProgressReporter, RejectsFile
+from .summary import verify_summary
+from .versioning import current_version
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+HAS_PANDAS = importlib.util.find_spec('pandas') is not None
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+HAS_ZSTANDARD = importlib.util.find_spec('zstandard') is not None
+
+CSV_HEADER = ['菜名', '主要食材', '供應時段', '價格(元)', '熱量(卡路里)']
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+
+
+def run_quietly(func, *args, **kwargs):
+    """執行管理工具的操作，回傳 (結果, 輸出)"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = func(*args, **kwargs)
+    return result, output.getvalue()
+
+
+def seed_menu():
+    """寫入幾道涵蓋多個類別與供應時段的菜餚"""
+    bulk_upsert_dishes([
+        dish_record('叉燒飯', '豬肉', 80, 700, ['午餐', '晚餐']),
+        dish_record('乾炒牛河', '牛肉', 90.5, 800, ['晚餐']),
+        dish_record('鮮蝦雲吞麵', '海鮮', 65, 450, ['早餐', '午餐']),
+        dish_record('凱撒沙拉', '蔬菜', 120, 350, []),
+        dish_record('時價海鮮', '海鮮', 0, 600, ['晚餐']),
+    ])
+
+
+class CsvTestCase(TestCase):
+    """提供暫存目錄與寫入 CSV 的 helper"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def csv_file(self, rows, name='menu.csv'):
+        path = os.path.join(self.tmp, name)
+        write_csv(path, rows)
+        return path
+
+
+def menu_state():
+    """{菜名: (類別, 價格, 熱量, 中介表的供應時段, 遮罩解碼的供應時段, 指紋)}"""
+    dishes = list(Dish.objects.select_related('category').prefetch_related('meal_times'))
+    masks = meal_time_names((dish.id, dish.meal_time_mask) for dish in dishes)
+    return {
+        dish.name: (dish.category.name, dish.price, dish.calories,
+                    sorted(meal_time.name for meal_time in dish.meal_times.all()), masks[dish.id], dish.fingerprint)
+        for dish in dishes
+    }
+
+
+def dish_record(name, category='牛肉', price=100, calories=500, meal_times=('午餐',)):
+    """批次匯入引擎使用的一筆紀錄；meal_times 為 None 表示不變更供應時段"""
+    return {'name': name, 'category': category, 'price': price, 'calories': calories,
+            'meal_times': None if meal_times is None else list(meal_times)}
+
+
+class BulkUpsertTests(TestCase):
+    def test_bad_record_fails_alone(self):
+        """一批中有一筆寫不進去時，只有這一筆列為錯誤，其餘照常寫入"""
+        records = [dish_record(f'菜{i}') for i in range(10)]
+        records[6]['calories'] = 10 ** 20  # 超出整數欄位的範圍
+
+        result = bulk_upsert_dishes(records, batch_size=20)
+
+        self.assertEqual(result['created'], 9)
+        self.assertEqual(len(result['errors']), 1)
+        self.assertTrue(result['errors'][0].startswith('菜6: '))
+        self.assertEqual(Dish.objects.count(), 9)
+        self.assertFalse(Dish.objects.filter(name='菜6').exists())
+
+    def test_created_and_updated(self):
+        bulk_upsert_dishes([dish_record('叉燒飯'), dish_record('乾炒牛河')])
+
+        result = bulk_upsert_dishes([dish_record('叉燒飯', price=80), dish_record('羅宋湯')])
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (1, 1, []))
+        self.assertEqual(Dish.objects.get(name='叉燒飯').price, 80)
+
+
+class StaleDimensionTests(TransactionTestCase):
+    """其他程序刪除了已快取的類別：外鍵在提交時才檢查，需要真的提交交易"""
+
+    def setUp(self):
+        self.dimensions = DimensionCache()
+        bulk_upsert_dishes([dish_record('叉燒飯', '豬肉')], dimensions=self.dimensions)
+        bulk_upsert_dishes([dish_record('乾炒牛河', '牛肉')], dimensions=self.dimensions)
+        # 快取中仍是舊的「豬肉」id
+        Category.objects.filter(name='豬肉').delete()
+
+    def test_upsert_retries_with_fresh_ids(self):
+        version = current_version()
+
+        result = bulk_upsert_dishes([dish_record('咕嚕肉', '豬肉'), dish_record('乾炒牛河', '牛肉', price=95)],
+                                    dimensions=self.dimensions)
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (1, 1, []))
+        # 整批重試一次成功，不是拆成單筆寫入
+        self.assertEqual(current_version(), version + 1)
+        self.assertEqual(Dish.objects.get(name='咕嚕肉').category.name, '豬肉')
+
+    def test_repair_retries_with_fresh_ids(self):
+        dish = Dish.objects.get(name='乾炒牛河')
+        dish.price = 95
+
+        bulk_repair_dishes([(dish, '豬肉', None)], dimensions=self.dimensions)
+
+        dish = Dish.objects.get(name='乾炒牛河')
+        self.assertEqual((dish.category.name, dish.price), ('豬肉', 95))
+
+    def test_row_import_retries_with_fresh_ids(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'menu.csv')
+        write_csv(path, [['咕嚕肉', '豬肉', '晚餐', '78', '650'], ['乾炒牛河', '牛肉', '晚餐', '95', '800']])
+        manager = FoodDataManager()
+        manager.dimensions = self.dimensions
+        run_quietly(manager.load_csv, path)
+        run_quietly(manager.clean_data)
+        version = current_version()
+
+        result, output = run_quietly(manager.import_to_database, bulk=False)
+
+        self.assertTrue(result)
+        self.assertIn('新增: 1, 更新: 1), 失敗: 0', output)
+        self.assertEqual(current_version(), version + 1)
+        self.assertEqual(Dish.objects.get(name='咕嚕肉').category.name, '豬肉')
+
+
+def menu_rows(count, start=0):
+    """count 筆菜名不重複的 CSV 資料列（類別與供應時段輪流使用）"""
+    categories = ['豬肉', '牛肉', '海鮮']
+    meal_times = ['午餐', '晚餐', '早餐 午餐', '午餐晚餐']
+    return [[f'菜{i}', categories[i % 3], meal_times[i % 4], f'{50 + i}元', f'{300 + i}卡']
+            for i in range(start, start + count)]
+
+
+class ImportQueryCountTests(CsvTestCase):
+    """預設的批次匯入：查詢數與筆數無關"""
+
+    # 各類別與供應時段價格與熱量的極值（之後的匯入不會動到極值，統計表不需要重算極值）
+    EXTREMES = [[f'{label}{category}', category, '早餐,午餐,晚餐', value, value]
+                for category in ('豬肉', '牛肉', '海鮮')
+                for label, value in (('最低', '1'), ('最高', '9999'))]
+
+    def import_queries(self, rows, **options):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, self.csv_file(rows))
+        run_quietly(manager.clean_data)
+        with CaptureQueriesContext(connection) as queries:
+            result, _ = run_quietly(manager.import_to_database, **options)
+        self.assertTrue(result)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # 先建立類別、供應時段與各組的極值
+        self.import_queries(self.EXTREMES)
+
+        self.assertEqual(self.import_queries(menu_rows(20, start=100)), self.import_queries(menu_rows(40, start=200)))
+        # 重新匯入（全部更新）也一樣
+        self.assertEqual(self.import_queries(menu_rows(20, start=100)), self.import_queries(menu_rows(40, start=200)))
+
+    def test_row_import_queries(self):
+        """逐筆匯入：每筆固定的查詢數，統計表、遮罩與菜單版本每批（或每次匯入）只更新一次"""
+        self.import_queries(self.EXTREMES)
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, self.csv_file(menu_rows(40, start=100)))
+        run_quietly(manager.clean_data)
+        dish_name_to_data = manager._map_by_name(manager.data, {})
+
+        # 每筆：新增 10 個查詢、更新 7 個（savepoint、菜餚與中介表）；每批 10 個（交易、
+        # 統計表差值、遮罩）；每次匯入 3 個（菜單版本），第一次另外載入類別與時段的快取
+        with self.assertNumQueries(40 * 10 + 2 * 10 + 5):
+            run_quietly(manager._row_import, dish_name_to_data, manager._reporter('匯入'), batch_size=20)
+        with self.assertNumQueries(40 * 7 + 2 * 10 + 3):
+            run_quietly(manager._row_import, dish_name_to_data, manager._reporter('匯入'), batch_size=20)
+
+
+class IncrementalImportTests(CsvTestCase):
+    """增量匯入只寫入新增、變更與移除的菜餚"""
+
+    ROWS = [
+        ['叉燒飯', '豬肉', '午餐晚餐', '80', '700'],
+        ['乾炒牛河', '牛肉', '晚餐', '90', '800'],
+        ['鮮蝦雲吞麵', '海鮮', '早餐 午餐', '65', '450'],
+        ['凱撒沙拉', '蔬菜', '午餐', '120', '350'],
+        ['羅宋湯', '牛肉', '早餐', '38', '220'],
+    ]
+    MODIFIED = [
+        ['叉燒飯', '豬肉', '午餐晚餐', '85', '700'],  # 改價
+        ['乾炒牛河', '牛肉', '午餐', '90', '800'],  # 換供應時段
+        ['鮮蝦雲吞麵', '蝦', '早餐 午餐', '65', '450'],  # 換類別
+        ['凱撒沙拉', '蔬菜', '午餐', '120', '350'],  # 未變更
+        ['白切雞', '雞肉', '午餐', '98', '650'],
+        ['西炒飯', '雞肉', '晚餐', '60', '750'],
+    ]
+
+    def incremental_import(self, rows):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, self.csv_file(rows))
+        run_quietly(manager.clean_data)
+        result, output = run_quietly(manager.import_to_database, incremental=True)
+        self.assertTrue(result)
+        return output
+
+    def test_unchanged_file(self):
+        """重新匯入內容相同的檔案只需要讀取指紋的一個查詢"""
+        self.incremental_import(self.ROWS)
+        version = current_version()
+
+        with self.assertNumQueries(1):
+            output = self.incremental_import(self.ROWS)
+
+        self.assertIn('新增: 0, 變更: 0, 移除: 0, 未變更: 5, 失敗: 0', output)
+        self.assertEqual(current_version(), version)
+
+    def test_modified_file(self):
+        self.incremental_import(self.ROWS)
+
+        output = self.incremental_import(self.MODIFIED)
+
+        self.assertIn('新增: 2, 變更: 3, 移除: 1, 未變更: 1, 失敗: 0', output)
+        state = menu_state()
+        self.assertEqual(sorted(state), sorted(row[0] for row in self.MODIFIED))
+        self.assertEqual(state['叉燒飯'][1], 85)
+        self.assertEqual(state['乾炒牛河'][3], ['午餐'])
+        self.assertEqual(state['鮮蝦雲吞麵'][0], '蝦')
+        self.assertEqual(verify_summary(), [])
+
+    def test_sync_counts(self):
+        incremental_sync_dishes([dish_record('叉燒飯'), dish_record('乾炒牛河'), dish_record('羅宋湯')])
+
+        result = incremental_sync_dishes([
+            dish_record('叉燒飯'),
+            dish_record('乾炒牛河', calories=820),
+            dish_record('白切雞'),
+        ])
+
+        self.assertEqual(result, {'inserted': 1, 'changed': 1, 'removed': 1, 'unchanged': 1, 'errors': []})
+
+
+class MealTimeMaskTests(CsvTestCase):
+    """逐筆匯入每批重算一次遮罩；新增的供應時段分配到旗標後遮罩即包含它"""
+
+    def import_rows(self, rows, **options):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, self.csv_file(rows))
+        run_quietly(manager.clean_data)
+        result, _ = run_quietly(manager.import_to_database, **options)
+        self.assertTrue(result)
+
+    def assert_masks_match(self):
+        self.assertEqual(check_masks()['mismatched'], 0)
+        for name, state in menu_state().items():
+            self.assertEqual(state[3], state[4], name)
+
+    def test_row_import_refreshes_once_per_batch(self):
+        with mock.patch('final_manager.refresh_masks', wraps=refresh_masks) as refresh:
+            self.import_rows(menu_rows(5), bulk=False, batch_size=2)
+
+        self.assertEqual(refresh.call_count, 3)
+        self.assertEqual(Dish.objects.count(), 5)
+        self.assert_masks_match()
+
+    def test_import_new_meal_time(self):
+        self.import_rows(menu_rows(4))
+        bits = set(MealTime.objects.values_list('bit', flat=True))
+
+        self.import_rows([['宵夜粥', '海鮮', '宵夜 晚餐', '45', '300']], bulk=False)
+
+        bit = MealTime.objects.get(name='宵夜').bit
+        self.assertIsNotNone(bit)
+        self.assertNotIn(bit, bits)
+        self.assertEqual(menu_state()['宵夜粥'][4], sorted(['宵夜', '晚餐']))
+        self.assert_masks_match()
+
+    def test_admin_new_meal_time(self):
+        seed_menu()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.post('/admin/menu/mealtime/add/', {'name': '下午茶'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNotNone(MealTime.objects.get(name='下午茶').bit)
+
+        dish = Dish.objects.get(name='凱撒沙拉')
+        response = self.client.post(f'/admin/menu/dish/{dish.pk}/change/', {
+            'name': dish.name,
+            'category': dish.category_id,
+            'meal_times': [MealTime.objects.get(name='下午茶').pk],
+            'price': dish.price,
+            'calories': dish.calories,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(menu_state()['凱撒沙拉'][4], ['下午茶'])
+        self.assert_masks_match()
+
+
+class CheckMasksCommandTests(TestCase):
+    def setUp(self):
+        seed_menu()
+
+    def run_command(self, *args):
+        stdout = io.StringIO()
+        call_command('menu_check_masks', *args, stdout=stdout, stderr=io.StringIO())
+        return stdout.getvalue()
+
+    def test_consistent(self):
+        self.assertIn('✓ 供應時段遮罩與中介表一致', self.run_command())
+
+    def test_mismatch(self):
+        Dish.objects.filter(name='叉燒飯').update(meal_time_mask=0)
+
+        with self.assertRaisesMessage(CommandError, '1 道菜餚的遮罩與中介表不一致'):
+            self.run_command()
+
+        output = self.run_command('--fix')
+        self.assertIn('已分配 0 個旗標，重算 5 道菜餚的遮罩', output)
+        self.assertIn('✓', output)
+
+    def test_unflagged_meal_time(self):
+        # 不經過 DimensionCache 建立的時段沒有旗標
+        MealTime.objects.create(name='宵夜')
+
+        with self.assertRaisesMessage(CommandError, '供應時段沒有旗標: 宵夜'):
+            self.run_command()
+
+        self.assertIn('已分配 1 個旗標', self.run_command('--fix'))
+        self.assertIsNotNone(MealTime.objects.get(name='宵夜').bit)
+
+    def test_uncomputed_masks(self):
+        """遮罩為空值時讀取改查中介表，只提示不算錯誤"""
+        Dish.objects.update(meal_time_mask=None)
+
+        self.assertIn('5 道菜餚的遮罩尚未計算', self.run_command())
+
+
+class StreamingImportTests(CsvTestCase):
+    ROWS = [
+        ['叉燒飯', '豬肉', '午餐', '80', '700'],
+        ['乾炒牛河', '牛肉', '晚餐', '90', '800'],
+        ['叉燒飯', '豬肉', '晚餐', '85', '700'],
+    ]
+
+    def assert_counted_once(self, output):
+        self.assertIn('新增: 2, 更新: 0, 失敗: 0', output)
+        self.assertEqual(Dish.objects.count(), 2)
+        self.assertEqual(Dish.objects.get(name='叉燒飯').price, 85)
+
+    def test_repeated_name_counted_once(self):
+        """同一道菜出現在後面的區塊時以最後一筆為準，但只計數一次"""
+        _, output = run_quietly(FoodDataManager().run_streaming_import, self.csv_file(self.ROWS), chunk_size=2)
+        self.assert_counted_once(output)
+
+    def test_pipeline_repeated_name_counted_once(self):
+        _, output = run_quietly(FoodDataManager().run_async_import, self.csv_file(self.ROWS), chunk_size=2)
+        self.assert_counted_once(output)
+
+
+def legacy_clean_text(text):
+    """改用 TextCleaner 之前逐條 str.replace 的清理（對照用）"""
+    text = re.sub(r'[#$%^&*()_+=\[\]{}|;:"<>?/~`@]', '', text)
+    for wrong, correct in cleaning.PHRASE_CORRECTIONS.items():
+        text = text.replace(wrong, correct)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+class TextCleanerTests(SimpleTestCase):
+    """編譯後的清理規則（對照表 + 合併的正規表示式）與逐條 str.replace 的結果相同"""
+
+    CASES = [
+        # 單一詞組
+        '午餐晚餐',
+        '早餐午餐',
+        '午餐 晚餐',
+        '早餐 午餐',
+        # 修正後與相鄰文字組成新的錯誤，或多個修正重疊
+        '早餐午餐晚餐',
+        '早餐 午餐晚餐',
+        '早餐午餐 晚餐',
+        '早餐 午餐 晚餐',
+        '早餐午餐午餐晚餐',
+        '午餐晚餐午餐晚餐',
+        '晚餐午餐',
+        # 移除符號後才成為錯誤
+        '午餐#晚餐',
+        '午@餐 晚餐',
+        '早(餐)午餐',
+        # 空白：修正在正規化之前套用
+        '午餐  晚餐',
+        '午餐\t晚餐',
+        '午餐\u3000晚餐',
+        '  咖喱    牛腩飯 ',
+        # 範例資料中的菜名
+        '香菇!@#$%^&*雞肉粥',
+        '蠔油*****生菜',
+        '椒鹽# 鮮魷',
+        '早餐特.  選三明治',
+        '#@',
+        '',
+    ]
+
+    def test_matches_sequential_replace(self):
+        for text in self.CASES:
+            with self.subTest(text=text):
+                self.assertEqual(cleaning.clean_text(text), legacy_clean_text(text))
+
+    @skipUnless(HAS_PANDAS, '需要 pandas')
+    def test_series_matches_sequential_replace(self):
+        import pandas as pd
+
+        # 重複一次，讓去重後的值少於一半，也走展開回原長度的路徑
+        for cases in (self.CASES, self.CASES * 2):
+            cleaned = cleaning.clean_text.clean_series(pd.Series(cases, dtype=object))
+            self.assertEqual(list(cleaned), [legacy_clean_text(text) for text in cases])
+
+    def test_missing_values(self):
+        manager = FoodDataManager()
+        for text in (None, '', 'nan', 'NaN'):
+            with self.subTest(text=text):
+                self.assertEqual(manager.clean_text(text), '')
+
+
+def sample_rows(name):
+    """repo 根目錄的範例 CSV 的資料列（不含標題）"""
+    with open(os.path.join(ROOT, name), encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))[1:]
+
+
+@skipUnless(HAS_PANDAS, '需要 pandas')
+class DataManagerCleaningTests(CsvTestCase):
+    """DataManager 的整欄清理與逐格 apply 的舊方法產生相同的 DataFrame"""
+
+    def cleaned(self, path, vectorized):
+        manager = DataManager()
+        run_quietly(manager.load_csv, path)
+        run_quietly(manager.clean_data, vectorized=vectorized)
+        return manager.df
+
+    def assert_same_frame(self, path):
+        from pandas.testing import assert_frame_equal
+
+        assert_frame_equal(self.cleaned(path, True), self.cleaned(path, False))
+
+    def test_sample_files(self):
+        for name in ('sample_dirty.csv', 'sample_clean.csv'):
+            with self.subTest(name=name):
+                self.assert_same_frame(os.path.join(ROOT, name))
+
+    def test_repeated_and_missing_values(self):
+        """重複度高的欄位走去重再展開的路徑；空白欄位與含「價格」「熱量」字樣的值"""
+        rows = sample_rows('sample_dirty.csv') * 3 + [
+            ['', '', '', '', ''],
+            ['價格表特餐', '熱量 牛肉', '早餐  午餐', '價格 68元', '熱量: 500'],
+            ['nan', '海鮮', 'nan', '時價', ''],
+        ]
+        self.assert_same_frame(self.csv_file(rows))
+
+
+class ParallelCleaningTests(CsvTestCase):
+    """平行清理（ProcessPoolExecutor）與逐塊清理的結果與警告完全相同"""
+
+    def cleaned(self, path, **options):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, path)
+        run_quietly(manager.clean_data, **options)
+        return manager.data
+
+    def chunks(self, path, workers):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, path)
+        return list(manager._iter_cleaned(chunked(manager.data, 50), workers, debug=False))
+
+    def test_sample_dirty(self):
+        path = os.path.join(ROOT, 'sample_dirty.csv')
+
+        self.assertEqual(self.cleaned(path, workers=2, chunk_size=3), self.cleaned(path))
+
+    def test_many_chunks(self):
+        """多個區塊、其中夾雜無效的價格、熱量與時段，依輸入順序取回"""
+        rows = []
+        for i, (name, category, meal_times, price, calories) in enumerate(sample_rows('sample_dirty.csv') * 30):
+            if i % 7 == 0:
+                price = '時價'
+            if i % 11 == 0:
+                calories = 'abc'
+            if i % 13 == 0:
+                meal_times = ''
+            rows.append([f'{name}{i}', category, meal_times, price, calories])
+        path = self.csv_file(rows)
+
+        serial = self.chunks(path, None)
+        self.assertEqual(len(serial), 12)
+        self.assertTrue(any(warnings for _, warnings in serial))
+        self.assertEqual(self.chunks(path, 3), serial)
+        self.assertEqual(self.cleaned(path, workers=3, chunk_size=50), self.cleaned(path))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY 匯入只支援 PostgreSQL')
+class CopyImportTests(TestCase):
+    SEED = [
+        ('叉燒飯', '豬肉', 80, 700, ['午餐']),
+        ('乾炒牛河', '牛肉', 90, 800, ['午餐', '晚餐']),
+        ('羅宋湯', '牛肉', 40, 300, ['早餐']),
+    ]
+    RECORDS = [
+        ('叉燒飯', '豬肉', 85, 700, ['晚餐']),  # 更換供應時段
+        ('乾炒牛河', '牛肉', 95, 800, None),  # 供應時段不變更
+        ('鮮蝦雲吞麵', '海鮮', 60, 450, ['午餐']),
+        ('鮮蝦雲吞麵', '海鮮', 65, 450, ['宵夜', '晚餐']),  # 同名以最後一筆為準，新的類別與時段
+        ('羅宋湯', '蔬菜', 40, 300, []),  # 更換類別並清空供應時段
+        ('凱撒沙拉', '蔬菜', 120, 350, ['午餐', '午餐']),  # 重複的時段名稱
+    ]
+
+    def records(self, rows):
+        return [dish_record(*row) for row in rows]
+
+    def test_matches_bulk_upsert(self):
+        """COPY 匯入與批次 upsert 對同一份資料的結果相同"""
+        bulk_upsert_dishes(self.records(self.SEED))
+        with transaction.atomic():
+            expected_result = bulk_upsert_dishes(self.records(self.RECORDS))
+            expected = menu_state()
+            transaction.set_rollback(True)
+        self.assertEqual((expected_result['created'], expected_result['updated']), (2, 3))
+
+        result = copy_import(self.records(self.RECORDS))
+
+        self.assertEqual(result, {'created': 2, 'updated': 3})
+        self.assertEqual(menu_state(), expected)
+        self.assertEqual(menu_state()['鮮蝦雲吞麵'][1], 65)
+        self.assertEqual(verify_summary(), [])
+        self.assertEqual(check_masks()['mismatched'], 0)
+
+
+@skipUnless(HAS_NUMPY, '近似重複偵測需要 numpy')
+class FindDuplicatesTests(SimpleTestCase):
+    def test_whitespace_and_full_width_merge(self):
+        result = find_duplicates(['叉燒飯', '叉燒 飯', 'ＢＬＴ三文治', 'BLT三文治', '凱撒沙拉'])
+
+        # 只差空白或全形半形的菜名併入最先出現的寫法
+        self.assertEqual(result.mapping, {'叉燒 飯': '叉燒飯', 'BLT三文治': 'ＢＬＴ三文治'})
+
+    def test_database_name_is_target(self):
+        result = find_duplicates(['鮮蝦 雲吞麵', '鮮蝦雲吞麵'], existing=['乾炒牛河', '鮮蝦雲吞麵'])
+
+        # 資料庫中的菜名不會被改名，檔案中的其他寫法合併到既有的菜餚
+        self.assertEqual(result.mapping, {'鮮蝦 雲吞麵': '鮮蝦雲吞麵'})
+        self.assertTrue(result.matches[0]['target_in_db'])
+
+    def test_typo_reported_but_not_merged(self):
+        result = find_duplicates(['鮮蝦云吞麵'], existing=['鮮蝦雲吞麵'], threshold=0.5)
+
+        self.assertEqual(result.mapping, {})
+        self.assertEqual([(match['name'], match['target'], match['merged']) for match in result.matches],
+                         [('鮮蝦云吞麵', '鮮蝦雲吞麵', False)])
+
+
+@skipUnless(HAS_NUMPY, '近似重複偵測需要 numpy')
+class NameMappingTests(CsvTestCase):
+    def test_mapping_applies_to_next_import_only(self):
+        manager = FoodDataManager()
+        first = self.csv_file([['叉燒飯', '豬肉', '午餐', '80', '700'], ['叉燒 飯', '豬肉', '晚餐', '85', '700']])
+        run_quietly(manager.load_csv, first)
+        run_quietly(manager.clean_data)
+        run_quietly(manager.dedupe_names)
+        run_quietly(manager.import_to_database, bulk=True)
+        self.assertEqual(list(Dish.objects.values_list('name', flat=True)), ['叉燒飯'])
+
+        # 同一個 manager 匯入另一個檔案時不沿用上一次的合併對照
+        second = self.csv_file([['叉燒 飯', '豬肉', '晚餐', '90', '700']], 'second.csv')
+        run_quietly(manager.run_streaming_import, second)
+
+        self.assertEqual(Dish.objects.get(name='叉燒飯').price, 85)
+        self.assertEqual(Dish.objects.get(name='叉燒 飯').price, 90)
+
+
+@skipUnless(HAS_PYARROW, '需要 pyarrow')
+class SnapshotTests(CsvTestCase):
+    def setUp(self):
+        super().setUp()
+        seed_menu()
+
+    def test_exported_snapshot_is_typed(self):
+        """export_snapshot() 寫出的檔案走型別化快照的匯入路徑（不重新清理）"""
+        for extension in ('parquet', 'feather'):
+            path = os.path.join(self.tmp, f'menu.{extension}')
+            columnar.export_snapshot(path)
+
+            batches = list(columnar.iter_batches(path))
+
+            self.assertTrue(batches)
+            self.assertTrue(all(typed for _, typed in batches), extension)
+            self.assertEqual(sum(batch.num_rows for batch, _ in batches), Dish.objects.count())
+
+    def test_parquet_round_trip(self):
+        """Parquet → 資料庫 → Parquet 得到相同的資料表"""
+        first = os.path.join(self.tmp, 'first.parquet')
+        second = os.path.join(self.tmp, 'second.parquet')
+        columnar.export_snapshot(first)
+        manager = FoodDataManager()
+        run_quietly(manager.delete_all_data, assume_yes=True)
+
+        imported, _ = run_quietly(manager.import_snapshot, first)
+        columnar.export_snapshot(second)
+
+        self.assertTrue(imported)
+        first_table, _ = columnar.read_table(first)
+        second_table, _ = columnar.read_table(second)
+        self.assertEqual(first_table.num_rows, 5)
+        self.assertTrue(first_table.equals(second_table))
+
+
+class RepairCommandTests(CsvTestCase):
+    def test_unfixable_dishes_are_warnings(self):
+        """還有無法修復的菜品（時價、CSV 中沒有）時指令照常成功，這些菜品記為警告"""
+        bulk_upsert_dishes([
+            dish_record('叉燒飯', '豬肉', 0, 700),
+            dish_record('時價海鮮', '海鮮', 0, 600),
+            dish_record('隱藏菜單', '豬肉', 0, 500),
+        ])
+        path = self.csv_file([
+            ['叉燒飯', '豬肉', '午餐', '80元', '700'],
+            ['時價海鮮', '海鮮', '晚餐', '時價', '600'],
+        ])
+        rejects = os.path.join(self.tmp, 'rejects.jsonl')
+
+        call_command('menu_repair', path, '--rejects', rejects, verbosity=0, stderr=io.StringIO())
+
+        self.assertEqual(Dish.objects.get(name='叉燒飯').price, 80)
+        with open(rejects, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            sorted((record['name'], record['level'], record['value']) for record in records),
+            [('時價海鮮', 'warning', '時價'), ('隱藏菜單', 'warning', None)],
+        )
+
+    def fix_zero_prices(self, rows):
+        manager = FoodDataManager()
+        run_quietly(manager.load_csv, self.csv_file(rows))
+        result, _ = run_quietly(manager.fix_zero_prices)
+        return result
+
+    def test_fix_zero_prices_result(self):
+        """回傳是否修復了任何菜品"""
+        bulk_upsert_dishes([dish_record('叉燒飯', '豬肉', 0, 700), dish_record('時價海鮮', '海鮮', 0, 600)])
+        unfixable = [['時價海鮮', '海鮮', '晚餐', '時價', '600']]
+
+        self.assertFalse(self.fix_zero_prices(unfixable))
+        self.assertTrue(self.fix_zero_prices(unfixable + [['叉燒飯', '豬肉', '午餐', '80元', '700']]))
+        self.assertEqual(Dish.objects.get(name='叉燒飯').price, 80)
+        # 剩下的都無法修復時沒有修復任何菜品，指令仍然成功
+        self.assertFalse(self.fix_zero_prices(unfixable))
+        call_command('menu_repair', self.csv_file(unfixable), verbosity=0, stderr=io.StringIO())
+
+        Dish.objects.filter(price=0).delete()
+        self.assertTrue(self.fix_zero_prices(unfixable))
+
+
+class FakeClock:
+    """可注入 ProgressReporter 的時鐘，由測試推進時間"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProgressReporterTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def output(self, func, *args, **kwargs):
+        return run_quietly(func, *args, **kwargs)[1].splitlines()
+
+    def test_progress_lines_are_throttled(self):
+        reporter = ProgressReporter('匯入', 100, verbose=False, interval=2, clock=self.clock)
+        lines = []
+        for now in (0.5, 1.0, 1.9, 2.0, 3.0, 3.9, 4.5):
+            self.clock.now = now
+            lines += self.output(reporter.advance, created=1)
+
+        # 每 2 秒最多一行：t=2.0 與 t=4.5
+        self.assertEqual(lines, [
+            '  匯入進度: 4/100 筆 (4.0%)，2 筆/秒，預計剩餘 48 秒（新增 4）',
+            '  匯入進度: 7/100 筆 (7.0%)，2 筆/秒，預計剩餘 1 分 00 秒（新增 7）',
+        ])
+        self.clock.now = 5.0
+        self.assertEqual(self.output(reporter.close), ['  匯入共 7 筆，耗時 5 秒（1 筆/秒）'])
+
+    def test_no_progress_line_within_interval(self):
+        reporter = ProgressReporter('清理', verbose=False, interval=2, clock=self.clock)
+        self.clock.now = 1.5
+        self.assertEqual(self.output(reporter.advance, 1000), [])
+        self.assertEqual(self.output(reporter.close), [])
+
+    def test_shown_rejects_are_capped(self):
+        reporter = ProgressReporter('匯入', verbose=False, clock=self.clock)
+        for i in range(7):
+            reporter.reject('價格為0', row=i + 2, name=f'菜{i}', field='價格(元)', value='0')
+
+        lines = self.output(reporter.close)
+        self.assertEqual(lines[0], '警告 7 筆、錯誤 0 筆（前5個）:')
+        self.assertEqual(lines[1], "  警告: 第 2 行 菜0 價格(元)='0'：價格為0")
+        self.assertEqual(lines[-1], '  ... 還有 2 個')
+
+    def write_rejects(self, path):
+        with RejectsFile(path) as rejects:
+            reporter = ProgressReporter('匯入', verbose=False, rejects=rejects, clock=self.clock)
+            reporter.reject('價格為0', row=3, name='叉燒飯', field='價格(元)', value='時價')
+            reporter.reject('菜名: 寫入失敗', level='error')
+            lines = self.output(reporter.close)
+        self.assertEqual(rejects.count, 2)
+        self.assertEqual(lines, [f'警告 1 筆、錯誤 1 筆，明細已寫入 {path}'])
+
+    def test_rejects_jsonl(self):
+        path = os.path.join(self.tmp, 'rejects.jsonl')
+        self.write_rejects(path)
+
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records, [
+            {'row': 3, 'level': 'warning', 'name': '叉燒飯', 'field': '價格(元)', 'value': '時價', 'message': '價格為0'},
+            {'row': None, 'level': 'error', 'name': None, 'field': None, 'value': None, 'message': '菜名: 寫入失敗'},
+        ])
+
+    def test_rejects_csv(self):
+        path = os.path.join(self.tmp, 'rejects.csv')
+        self.write_rejects(path)
+
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            ['row', 'level', 'name', 'field', 'value', 'message'],
+            ['3', 'warning', '叉燒飯', '價格(元)', '時價', '價格為0'],
+            ['', 'error', '', '', '', '菜名: 寫入失敗'],
+        ])
+
+
+class PreviewTests(CsvTestCase):
+    def test_preview_omits_line_numbers(self):
+        manager = FoodDataManager()
+        manager.verbose = True
+        path = self.csv_file([['叉燒飯', '豬肉', '午餐', '80元', '700卡']])
+
+        _, loaded = run_quietly(manager.load_csv, path)
+        _, cleaned = run_quietly(manager.clean_data)
+
+        self.assertIn("第1筆: {'菜名': '叉燒飯', '主要食材': '豬肉'", loaded)
+        self.assertIn("第1筆: {'菜名': '叉燒飯'", cleaned)
+        self.assertNotIn('行號', loaded + cleaned)
+        # 行號仍保留在資料中，供警告與 rejects 檔案使用
+        self.assertEqual(manager.original_csv_data[0]['行號'], 2)
+
+
+# 管理指令 --help 超過此秒數視為啟動過慢
+STARTUP_LIMIT_SECONDS = 1.0
+@instrumentation.instrumented(rows=lambda count, result: len(result))
+def count_dishes(count):
+    """執行 count 個查詢"""
+    return [Dish.objects.count() for _ in range(count)]
+
+
+@instrumentation.instrumented()
+def count_menu():
+    """兩個巢狀階段（2 + 3 個查詢），本身另外一個查詢"""
+    count_dishes(2)
+    count_dishes(3)
+    return Category.objects.count()
+
+
+class InstrumentationTests(CsvTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(instrumentation.disable)
+
+    def test_query_recorder(self):
+        recorder = instrumentation.QueryRecorder(top_n=3)
+        with CaptureQueriesContext(connection) as queries:
+            with connection.execute_wrapper(recorder):
+                count_dishes(5)
+
+        self.assertEqual(recorder.count, 5)
+        self.assertGreater(recorder.seconds, 0)
+        slowest = recorder.slowest()
+        self.assertEqual(len(slowest), 3)
+        self.assertEqual([query['seconds'] for query in slowest],
+                         sorted((query['seconds'] for query in slowest), reverse=True))
+        self.assertLessEqual(sum(query['seconds'] for query in slowest), recorder.seconds + 1e-5)
+        self.assertEqual({query['sql'] for query in slowest}, {' '.join(queries[0]['sql'].split())})
+
+    def test_recorder_timings(self):
+        """以假的時鐘確認每個查詢的時間與最慢查詢的排序"""
+        recorder = instrumentation.QueryRecorder(top_n=2)
+        ticks = iter([0.0, 0.1, 1.0, 1.3, 2.0, 2.05])
+        with mock.patch.object(instrumentation.time, 'perf_counter', lambda: next(ticks)):
+            for sql in ('SELECT 1', 'SELECT 2', 'SELECT 3'):
+                recorder(lambda *args: None, sql, None, False, {})
+
+        self.assertEqual(recorder.count, 3)
+        self.assertAlmostEqual(recorder.seconds, 0.45)
+        self.assertEqual([(query['sql'], query['seconds']) for query in recorder.slowest()],
+                         [('SELECT 2', 0.3), ('SELECT 1', 0.1)])
+
+    def test_report(self):
+        path = os.path.join(self.tmp, 'report.json')
+        instrumentation.enable(path)
+
+        self.assertEqual(count_menu(), 0)
+        self.assertEqual(instrumentation.write_report(), path)
+
+        self.assertFalse(instrumentation.is_enabled())
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report['database'], connection.vendor)
+        outer, first, second = report['stages']
+        self.assertEqual((outer['name'], outer['depth'], outer['queries'], outer['rows']), ('count_menu', 0, 6, None))
+        self.assertEqual((first['name'], first['depth'], first['queries'], first['rows']), ('count_dishes', 1, 2, 2))
+        self.assertEqual((second['depth'], second['queries'], second['rows']), (1, 3, 3))
+        # 外層的數字包含內層，總計只加總最外層
+        self.assertEqual(report['totals']['queries'], 6)
+        self.assertEqual(report['totals']['wall_seconds'], outer['wall_seconds'])
+        self.assertGreaterEqual(outer['wall_seconds'], first['wall_seconds'] + second['wall_seconds'])
+        for stage in report['stages']:
+            self.assertLessEqual(stage['sql_seconds'], stage['wall_seconds'])
+            self.assertEqual(len(stage['slowest_queries']), stage['queries'])
+        self.assertEqual(len(report['slowest_queries']), 6)
+
+    def test_profile_dir(self):
+        profile_dir = os.path.join(self.tmp, 'profiles')
+        instrumentation.enable(os.path.join(self.tmp, 'report.json'), profile_dir)
+
+        count_menu()
+
+        stages = instrumentation._session.report()['stages']
+        self.assertEqual([os.path.basename(stage['profile']) for stage in stages],
+                         ['001_count_menu.prof', '002_count_dishes.prof', '003_count_dishes.prof'])
+        self.assertTrue(all(os.path.exists(stage['profile']) for stage in stages))
+
+    def test_error_recorded(self):
+        instrumentation.enable(os.path.join(self.tmp, 'report.json'))
+
+        with self.assertRaises(TypeError):
+            count_dishes(None)
+
+        stage, = instrumentation._session.report()['stages']
+        self.assertTrue(stage['error'].startswith('TypeError: '))
+
+    def test_disabled(self):
+        with mock.patch.object(instrumentation.Session, 'run') as run:
+            self.assertEqual(count_dishes(2), [0, 0])
+        run.assert_not_called()
+
+
+def read_export(path):
+    """讀回匯出檔（依副檔名解壓縮），回傳 (是否有 BOM, 資料列)；供應時段排序後比較"""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            raw = f.read()
+    elif path.endswith('.zst'):
+        import zstandard
+
+        with open(path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            raw = reader.read()
+    else:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    rows = list(csv.reader(io.StringIO(raw.decode('utf-8-sig'), newline='')))
+    for row in rows[1:]:
+        row[2] = ','.join(sorted(filter(None, row[2].split(','))))
+    return raw.startswith(codecs.BOM_UTF8), rows
+
+
+class ExportTests(CsvTestCase):
+    def setUp(self):
+        super().setUp()
+        seed_menu()
+        # 需要加上引號的菜名，以及遮罩尚未計算（改查中介表）的菜餚
+        bulk_upsert_dishes([dish_record('豉汁, "鳳爪"', '雞肉', 32, 200, ['早餐', '晚餐'])])
+        Dish.objects.filter(name='叉燒飯').update(meal_time_mask=None)
+
+    def export(self, name, manager=None, **options):
+        path = os.path.join(self.tmp, name)
+        manager = FoodDataManager() if manager is None else manager
+        result, _ = run_quietly(manager.export_to_csv, path, **options)
+        self.assertTrue(result)
+        return read_export(path)
+
+    def expected_rows(self):
+        return [EXPORT_HEADER] + [
+            [dish.name, dish.category.name, ','.join(sorted(mt.name for mt in dish.meal_times.all())),
+             str(dish.price), str(dish.calories)]
+            for dish in Dish.objects.select_related('category').prefetch_related('meal_times').order_by('name')
+        ]
+
+    def test_bom(self):
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                has_bom, rows = self.export('menu.csv', stream=stream)
+                self.assertTrue(has_bom)
+                self.assertEqual(rows, self.expected_rows())
+
+    def test_gzip(self):
+        for name, options in (('menu.csv.gz', {}), ('menu-gzip.csv.gz', {'compression': 'gzip'})):
+            for stream in (False, True):
+                with self.subTest(name=name, stream=stream):
+                    self.assertEqual(self.export(name, stream=stream, **options), (True, self.expected_rows()))
+
+    @skipUnless(HAS_ZSTANDARD, '需要 zstandard')
+    def test_zstd(self):
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                self.assertEqual(self.export('menu.csv.zst', stream=stream), (True, self.expected_rows()))
+
+    def test_stream_matches_export(self):
+        self.assertEqual(self.export('stream.csv', stream=True), self.export('menu.csv'))
+
+    def test_stream_query_count(self):
+        """串流匯出的查詢數與筆數無關：旗標對照、菜餚，以及遮罩尚未計算的菜餚的中介表"""
+        path = os.path.join(self.tmp, 'menu.csv')
+        with self.assertNumQueries(3):
+            count = write_export_csv(path, chunk_size=100)
+        self.assertEqual(count, Dish.objects.count())
+
+        refresh_masks()
+        bulk_upsert_dishes([dish_record(f'菜{i}') for i in range(50)])
+        with self.assertNumQueries(2):
+            count = write_export_csv(path, chunk_size=100)
+        self.assertEqual(count, Dish.objects.count())
+
+    def test_unsupported_compression(self):
+        path = os.path.join(self.tmp, 'menu.csv')
+        result, output = run_quietly(FoodDataManager().export_to_csv, path, compression='bz2')
+
+        self.assertFalse(result)
+        self.assertIn('不支援的壓縮格式: bz2', output)
+
+    @skipUnless(HAS_PANDAS, '需要 pandas')
+    def test_data_manager(self):
+        """DataManager 的價格以浮點數寫出，串流與 DataFrame 版本相同"""
+        for name in ('menu.csv', 'menu.csv.gz'):
+            with self.subTest(name=name):
+                expected = self.export(name, DataManager())
+                self.assertTrue(expected[0])
+                self.assertEqual(self.export(f'stream-{name}', DataManager(), stream=True), expected)
+                self.assertIn(['凱撒沙拉', '蔬菜', '', '120.0', '350'], expected[1])
+
+
+class HealthReportTests(TestCase):
+    def setUp(self):
+        seed_menu()
+        bulk_upsert_dishes([dish_record('清湯', '蔬菜', 20, 0, ['午餐'])])
+        Category.objects.create(name='雞肉')  # 沒有菜餚的類別
+
+    def test_report(self):
+        with self.assertNumQueries(3):
+            report = health_report()
+
+        self.assertEqual(report, {
+            'dishes': 6,
+            'categories': 5,
+            'meal_times': 3,
+            'zero_price': 1,
+            'zero_calories': 1,
+            'zero_price_samples': ['時價海鮮'],
+            'orphan_categories': ['雞肉'],
+            'dishes_per_category': {'海鮮': 2, '牛肉': 1, '蔬菜': 2, '豬肉': 1, '雞肉': 0},
+            'problems_per_category': {
+                '海鮮': {'zero_price': 1, 'zero_calories': 0},
+                '蔬菜': {'zero_price': 0, 'zero_calories': 1},
+            },
+            'dishes_per_meal_time': {'午餐': 3, '早餐': 1, '晚餐': 3},
+        })
+
+    def test_no_problems(self):
+        """沒有價格為 0 的菜餚時不查範例，查詢數與菜餚數無關"""
+        Dish.objects.filter(price=0).delete()
+        bulk_upsert_dishes([dish_record(f'菜{i}') for i in range(20)])
+
+        with self.assertNumQueries(2):
+            report = health_report()
+
+        self.assertEqual((report['dishes'], report['zero_price'], report['zero_price_samples']), (25, 0, []))
+        self.assertEqual(report['orphan_categories'], ['雞肉'])
+
+    def test_format_report(self):
+        text = format_report(health_report())
+
+        self.assertIn('菜餚數量: 6', text)
+        self.assertIn('    - 時價海鮮', text)
+        self.assertIn('沒有菜餚的食材類別: 雞肉', text)
+
+    def run_check_data(self, *args):
+        """在目前的測試資料庫上執行 check_data.py，回傳輸出"""
+        output = io.StringIO()
+        with mock.patch.object(sys, 'argv', ['check_data.py', *args]), contextlib.redirect_stdout(output):
+            try:
+                runpy.run_path(os.path.join(ROOT, 'check_data.py'), run_name='__main__')
+            except SystemExit as e:
+                self.assertEqual(e.code, 0)
+        return output.getvalue()
+
+    def test_check_data_json(self):
+        data = json.loads(self.run_check_data('--json'))
+
+        self.assertEqual(data, json.loads(json.dumps(health_report(), ensure_ascii=False)))
+        self.assertEqual(data['orphan_categories'], ['雞肉'])
+        self.assertEqual(data['dishes_per_meal_time'], {'午餐': 3, '早餐': 1, '晚餐': 3})
+
+    def test_check_data_text(self):
+        output = self.run_check_data()
+
+        self.assertIn('沒有菜餚的食材類別: 雞肉', output)
+        self.assertIn('✗ 菜餚數量不正確: 6 筆，應為 20 筆', output)
+        self.assertIn('✓ 食材類別數量正確 (5種)', output)
+
+
+MENU_COMMANDS = ['menu_import', 'menu_export', 'menu_repair', 'menu_stats', 'menu_purge', 'menu_check_masks',
+                 'menu_summary']
+
+
+class StartupTests(SimpleTestCase):
+    def test_command_help_is_fast(self):
+        for command in MENU_COMMANDS:
+            with self.subTest(command=command):
+                start = time.perf_counter()
+                with self.assertRaises(SystemExit), contextlib.redirect_stdout(io.StringIO()):
+                    call_command(command, '--help')
+                self.assertLess(time.perf_counter() - start, STARTUP_LIMIT_SECONDS)
+
+    def test_managers_do_not_import_heavy_packages(self):
+        """在新的 process 中匯入管理工具，pandas 與 pyarrow 要等到用到時才載入"""
+        code = ("import sys, final_manager, data_manager; "
+                "print(','.join(name for name in ('pandas', 'pyarrow') if name in sys.modules))")
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout.strip()
+        self.assertEqual(output, '')
+
+
+class ApiTestCase(CsvTestCase):
+    """API 的測試：回應快取以菜單版本為 key，每個測試的資料庫版本會重複，先清空快取"""
+
+    def setUp(self):
+        super().setUp()
+        caches[CACHE_ALIAS].clear()
+        seed_menu()
+
+
+# 清單每頁：菜單版本、菜餚（JOIN 類別）、供應時段旗標各一個查詢，與頁面大小無關
+QUERIES_PER_PAGE = 3
+# 命中快取時只讀菜單版本
+QUERIES_PER_CACHED_PAGE = 1
+
+
+class DishListQueryTests(ApiTestCase):
+    def get_page(self, queries, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/dishes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, dishes=None):
+        dishes = Dish.objects.all() if dishes is None else dishes
+        return list(dishes.order_by('name', 'id').values_list('name', flat=True))
+
+    def test_first_page(self):
+        for limit in (1, 2, 50):
+            with self.subTest(limit=limit):
+                data = self.get_page(QUERIES_PER_PAGE, limit=limit)
+                self.assertEqual([dish['name'] for dish in data['results']], self.names()[:limit])
+
+    def test_cursor_page(self):
+        first = self.get_page(QUERIES_PER_PAGE, limit=2)
+        second = self.get_page(QUERIES_PER_PAGE, limit=2, cursor=first['next_cursor'])
+
+        self.assertEqual([dish['name'] for dish in first['results'] + second['results']], self.names()[:4])
+        self.assertIsNotNone(second['next_cursor'])
+
+    def test_meal_time_filter(self):
+        """供應時段以遮罩篩選，不需要 JOIN 中介表"""
+        data = self.get_page(QUERIES_PER_PAGE, meal_time='午餐')
+
+        self.assertEqual([dish['name'] for dish in data['results']],
+                         self.names(Dish.objects.filter(meal_times__name='午餐')))
+        self.assertTrue(all('午餐' in dish['meal_times'] for dish in data['results']))
+
+    def test_cached_page(self):
+        self.get_page(QUERIES_PER_PAGE, limit=2)
+        self.get_page(QUERIES_PER_CACHED_PAGE, limit=2)
+
+    def test_bad_params(self):
+        for params in (
+            {'min_price': 'abc'},
+            {'min_price': 'NaN'},
+            {'max_price': 'Infinity'},
+            {'max_price': '-inf'},
+            {'min_price': 'sNaN'},
+            {'min_price': '1e-20000'},
+            {'max_price': '1e200000'},
+            {'min_calories': '1.5'},
+            {'max_calories': str(2 ** 31)},
+            {'min_calories': str(-2 ** 31 - 1)},
+            {'limit': '0'},
+            {'limit': str(10 ** 30)},
+            {'cursor': '!!!'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/dishes/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_large_params(self):
+        """範圍內的極端值照常查詢"""
+        data = self.get_page(QUERIES_PER_PAGE, min_price='-1e12', max_price='99999.0000000001', max_calories=str(2 ** 31 - 1))
+        self.assertEqual(len(data['results']), Dish.objects.count())
+
+
+class CacheInvalidationTests(ApiTestCase):
+    """每一種寫入之後，快取中的舊回應都不會再被讀到"""
+
+    URL = '/api/dishes/'
+
+    def setUp(self):
+        super().setUp()
+        response = self.client.get(self.URL)
+        self.etag = response['ETag']
+        self.assertEqual(self.prices(response), self.stored_prices())
+
+    def prices(self, response):
+        return {dish['name']: dish['price'] for dish in response.json()['results']}
+
+    def stored_prices(self):
+        return {name: str(price) for name, price in Dish.objects.values_list('name', 'price')}
+
+    def assert_fresh(self):
+        """以寫入前的 ETag 重新驗證：拿到新的資料與新的 ETag"""
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        self.assertEqual(self.prices(response), self.stored_prices())
+        return self.prices(response)
+
+    def test_unchanged_version_not_modified(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+
+    def test_bulk_upsert(self):
+        bulk_upsert_dishes([dish_record('叉燒飯', '豬肉', 99), dish_record('羅宋湯', '牛肉', 45)])
+        prices = self.assert_fresh()
+        self.assertEqual((prices['叉燒飯'], prices['羅宋湯']), ('99.00', '45.00'))
+
+    def test_bulk_repair(self):
+        dish = Dish.objects.get(name='時價海鮮')
+        dish.price = 150
+        bulk_repair_dishes([(dish, None, None)])
+        self.assertEqual(self.assert_fresh()['時價海鮮'], '150.00')
+
+    def test_incremental_sync_delete(self):
+        records = [dish_record(dish.name, dish.category.name, dish.price, dish.calories,
+                               [meal_time.name for meal_time in dish.meal_times.all()])
+                   for dish in Dish.objects.exclude(name='凱撒沙拉').select_related('category')]
+        result = incremental_sync_dishes(records)
+        self.assertEqual((result['removed'], result['unchanged']), (1, 4))
+        self.assertNotIn('凱撒沙拉', self.assert_fresh())
+
+    def test_row_import(self):
+        path = self.csv_file([['叉燒飯', '豬肉', '午餐', '88', '700'], ['乾炒牛河', '牛肉', '晚餐', '77', '800']])
+        version = current_version()
+
+        run_quietly(FoodDataManager().run_full_import, path, bulk=False)
+
+        # 逐筆匯入整次只更新一次版本
+        self.assertEqual(current_version(), version + 1)
+        prices = self.assert_fresh()
+        self.assertEqual((prices['叉燒飯'], prices['乾炒牛河']), ('88.00', '77.00'))
+
+    def test_admin_save(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        dish = Dish.objects.get(name='凱撒沙拉')
+
+        response = self.client.post(f'/admin/menu/dish/{dish.pk}/change/', {
+            'name': dish.name,
+            'category': dish.category_id,
+            'meal_times': [MealTime.objects.get(name='午餐').pk],
+            'price': '130.00',
+            'calories': dish.calories,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.assert_fresh()['凱撒沙拉'], '130.00')
+
+
+class SummaryTests(CsvTestCase):
+    """各種寫入之後 MenuSummary 都與完整重算的結果一致"""
+
+    ROWS = [
+        ['叉燒飯', '豬肉', '午餐晚餐', '80元', '700卡'],
+        ['乾炒牛河', '牛肉', '晚餐', '90.5', '800'],
+        ['鮮蝦雲吞麵', '海鮮', '早餐 午餐', '¥65', '450'],
+        ['凱撒沙拉', '蔬菜', '午餐', '120', '350'],
+        ['時價海鮮', '海鮮', '晚餐', '時價', '600'],
+        ['白切雞', '雞肉', '午餐,晚餐', '98', '650'],
+        ['羅宋湯', '牛肉', '早餐', '38', '220'],
+    ]
+    # 改價、換類別與時段，並移除最後兩道菜
+    VARIANT = [
+        ['叉燒飯', '豬肉', '晚餐', '85', '700'],
+        ['乾炒牛河', '豬肉', '午餐', '95', '820'],
+        ['鮮蝦雲吞麵', '海鮮', '早餐', '70', '450'],
+        ['凱撒沙拉', '蔬菜', '午餐晚餐', '20', '350'],
+        ['時價海鮮', '海鮮', '晚餐', '188', '600'],
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.base = self.csv_file(self.ROWS, 'base.csv')
+        self.variant = self.csv_file(self.VARIANT, 'variant.csv')
+
+    def run_command(self, *args, **options):
+        call_command(*args, verbosity=0, stdout=io.StringIO(), stderr=io.StringIO(), **options)
+
+    def assert_consistent(self, label):
+        self.assertEqual(verify_summary(), [], label)
+
+    def test_import_modes(self):
+        steps = [
+            ('bulk', self.base),
+            ('bulk', self.variant),
+            ('row', self.base),
+            ('incremental', self.variant),
+            ('stream', self.base),
+            ('pipeline', self.variant),
+        ]
+        if connection.vendor == 'postgresql':
+            steps.append(('copy', self.base))
+        for mode, path in steps:
+            self.run_command('menu_import', path, mode=mode)
+            self.assert_consistent(f'{mode} 匯入 {os.path.basename(path)}')
+
+    def test_incremental_delete(self):
+        self.run_command('menu_import', self.base, mode='incremental')
+        self.run_command('menu_import', self.variant, mode='incremental')
+
+        self.assertEqual(Dish.objects.count(), len(self.VARIANT))
+        self.assert_consistent('增量同步移除菜餚')
+
+    def test_repair(self):
+        self.run_command('menu_import', self.base)
+        self.run_command('menu_repair', self.base)
+        self.assert_consistent('修復價格為 0 的菜餚')
+
+        self.run_command('menu_repair', self.variant, all=True)
+        self.assertEqual(Dish.objects.get(name='時價海鮮').price, 188)
+        self.assert_consistent('依改價版本修復全部菜餚')
+
+    def test_delete_all(self):
+        self.run_command('menu_import', self.base)
+        self.run_command('menu_purge', interactive=False)
+        self.assert_consistent('刪除全部資料')
+
+
+class AdminSummaryTests(TestCase):
+    """後台的新增、修改、刪除之後統計表仍然一致"""
+
+    def setUp(self):
+        seed_menu()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def post(self, url, data):
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302, url)
+        self.assertEqual(verify_summary(), [], url)
+
+    def dish_form(self, dish, **changes):
+        data = {
+            'name': dish.name,
+            'category': dish.category_id,
+            'meal_times': [meal_time.pk for meal_time in dish.meal_times.all()],
+            'price': dish.price,
+            'calories': dish.calories,
+        }
+        data.update(changes)
+        return data
+
+    def test_dish_add_and_change(self):
+        pork = Category.objects.get(name='豬肉')
+        breakfast = MealTime.objects.get(name='早餐')
+        self.post('/admin/menu/dish/add/', {
+            'name': '豬扒包', 'category': pork.pk, 'meal_times': [breakfast.pk], 'price': '35', 'calories': '520',
+        })
+
+        dish = Dish.objects.get(name='乾炒牛河')
+        self.post(f'/admin/menu/dish/{dish.pk}/change/',
+                  self.dish_form(dish, category=pork.pk, price='300', meal_times=[breakfast.pk]))
+
+    def test_dish_delete(self):
+        dish = Dish.objects.get(name='鮮蝦雲吞麵')
+        self.post(f'/admin/menu/dish/{dish.pk}/delete/', {'post': 'yes'})
+
+        selected = Dish.objects.filter(category__name='海鮮').values_list('pk', flat=True)
+        self.post('/admin/menu/dish/', {'action': 'delete_selected', '_selected_action': list(selected), 'post': 'yes'})
+
+    def test_category_delete(self):
+        category = Category.objects.get(name='海鮮')
+        self.post(f'/admin/menu/category/{category.pk}/delete/', {'post': 'yes'})
+
+        selected = Category.objects.filter(name__in=['豬肉', '牛肉']).values_list('pk', flat=True)
+        self.post('/admin/menu/category/', {'action': 'delete_selected', '_selected_action': list(selected),
+                                            'post': 'yes'})
+
+    def test_meal_time_add_and_delete(self):
+        self.post('/admin/menu/mealtime/add/', {'name': '宵夜'})
+
+        meal_time = MealTime.objects.get(name='晚餐')
+        self.post(f'/admin/menu/mealtime/{meal_time.pk}/delete/', {'post': 'yes'})
+
+        selected = MealTime.objects.filter(name__in=['早餐', '宵夜']).values_list('pk', flat=True)
+        self.post('/admin/menu/mealtime/', {'action': 'delete_selected', '_selected_action': list(selected),
+                                            'post': 'yes'})
+
+
+class NameIndexRebuildTests(TransactionTestCase):
+    """版本改變後菜名索引在背景重建，重建完成前搜尋不等待、繼續使用舊的索引"""
+
+    # 測試以 mock 替換 search._build_index，這裡保留原本的函式
+    build_index = staticmethod(search._build_index)
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        # 不受前一個測試的重建間隔影響
+        search._index = search._last_rebuild = None
+        seed_menu()
+        self.old_index = search.name_index()
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+        search._index = search._last_rebuild = None
+
+    def gated_build(self, version):
+        # 重建卡在這裡，直到測試放行
+        self.gate.wait(5)
+        return self.build_index(version)
+
+    def finish_rebuild(self, thread):
+        self.gate.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_serves_old_index_while_rebuilding(self):
+        bulk_upsert_dishes([dish_record('麻婆豆腐', '豬肉', 68)])
+        dish_id = Dish.objects.get(name='麻婆豆腐').pk
+
+        with mock.patch.object(search, '_build_index', self.gated_build):
+            matches, current = search.search_matches('麻婆豆腐')
+            thread = search._rebuild_thread
+            self.assertFalse(current)
+            self.assertNotIn(dish_id, [match_id for match_id, _ in matches])
+            # 重建中的搜尋不會再啟動另一個重建
+            self.assertIs(search.name_index(), self.old_index)
+            self.assertIs(search._rebuild_thread, thread)
+            self.finish_rebuild(thread)
+
+        matches, current = search.search_matches('麻婆豆腐')
+        self.assertTrue(current)
+        self.assertEqual(matches[0][0], dish_id)
+
+    def test_api_does_not_cache_stale_results(self):
+        bulk_upsert_dishes([dish_record('麻婆豆腐', '豬肉', 68)])
+        url = '/api/dishes/search/?q=麻婆豆腐'
+
+        with mock.patch.object(search, '_build_index', self.gated_build):
+            stale = self.client.get(url)
+            thread = search._rebuild_thread
+            self.finish_rebuild(thread)
+
+        self.assertEqual(stale.status_code, 200)
+        self.assertNotIn('ETag', stale)
+        fresh = self.client.get(url)
+        self.assertIn('ETag', fresh)
+        self.assertEqual(fresh.json()['results'][0]['name'], '麻婆豆腐')
+
+
+# 後台清單頁：session、使用者、類別與供應時段的篩選選項、筆數、菜餚（JOIN 類別）、
+# 這一頁的供應時段，與每頁筆數無關
+ADMIN_CHANGELIST_QUERIES = 7
+# 依供應時段篩選另外讀取時段的遮罩位元；搜尋另外讀取菜單版本（菜名索引）
+ADMIN_FILTERED_QUERIES = ADMIN_SEARCH_QUERIES = 8
+# 未篩選時 PostgreSQL 先讀 pg_class 的估計筆數（見 menu.pagination），筆數太少才 COUNT(*)
+ADMIN_UNFILTERED_QUERIES = ADMIN_CHANGELIST_QUERIES + (connection.vendor == 'postgresql')
+
+
+class AdminChangelistQueryTests(TestCase):
+    """後台菜餚清單頁的查詢數固定，與每頁筆數無關（沒有 N+1）"""
+
+    DISHES = 30
+    PAGE_SIZES = [5, 20]
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = ['豬肉', '牛肉', '海鮮']
+        meal_times = [('午餐',), ('晚餐',), ('早餐', '午餐'), ('午餐', '晚餐')]
+        bulk_upsert_dishes([dish_record(f'測試菜{i:02d}', categories[i % 3], 50 + i, 300 + i, meal_times[i % 4])
+                            for i in range(cls.DISHES)])
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.model_admin = admin.site._registry[Dish]
+
+    def changelist(self, params):
+        response = self.client.get('/admin/menu/dish/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_queries(self, params, queries):
+        # 暖機：第一次搜尋會建立行程內的菜名索引（見 menu.search），不列入比較
+        self.changelist(params)
+        for per_page in self.PAGE_SIZES:
+            with self.subTest(per_page=per_page), mock.patch.object(self.model_admin, 'list_per_page', per_page):
+                with self.assertNumQueries(queries):
+                    response = self.changelist(params)
+                changelist = response.context['cl']
+                remaining = changelist.result_count - (changelist.page_num - 1) * per_page
+                self.assertEqual(len(changelist.result_list), min(per_page, remaining))
+
+    def test_plain(self):
+        self.assert_queries({}, ADMIN_UNFILTERED_QUERIES)
+
+    def test_second_page(self):
+        self.assert_queries({'p': 2}, ADMIN_UNFILTERED_QUERIES)
+
+    def test_category_filter(self):
+        category = Category.objects.get(name='豬肉')
+        self.assert_queries({'category__id__exact': category.pk}, ADMIN_CHANGELIST_QUERIES)
+
+    def test_meal_time_filter(self):
+        self.assert_queries({'meal_time': '午餐'}, ADMIN_FILTERED_QUERIES)
+
+    def test_updated_at_filter(self):
+        self.assert_queries({'updated_at__gte': '2000-01-01'}, ADMIN_CHANGELIST_QUERIES)
+
+    def test_search(self):
+        self.assert_queries({'q': '測試'}, ADMIN_SEARCH_QUERIES)
+
+    def test_fuzzy_search(self):
+        self.assert_queries({'q': '測式菜1'}, ADMIN_SEARCH_QUERIES)
+
+
+@skipUnless(connection.vendor == 'postgresql', '查詢計畫檢查只支援 PostgreSQL')
+class QueryPlanTests(TestCase):
+    """在足夠多的菜餚上確認 Dish 的常用查詢都走遷移 0004 建立的索引"""
+
+    # 以 1,000,000 筆執行時各查詢走的索引相同（約一分鐘）：這些條件的選擇性（價格為 0 佔 1%、
+    # 最近一分鐘 60 筆）與筆數無關，20000 筆時循序掃描的成本已經高於索引掃描
+    ROWS = 20000
+    # 每 ZERO_PRICE_EVERY 筆有一筆價格為 0
+    ZERO_PRICE_EVERY = 100
+    INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+    @classmethod
+    def setUpTestData(cls):
+        category_ids = [Category.objects.create(name=name).id for name in ('豬肉', '牛肉', '海鮮', '蔬菜', '雞肉')]
+        cls.category_id = category_ids[0]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT setseed(0.42)')
+            # 第 i 筆在 i 秒前更新，最近一分鐘內只有 60 筆
+            cursor.execute("""
+                INSERT INTO menu_dish (name, category_id, price, calories, fingerprint, created_at, updated_at)
+                SELECT
+                    'plan-' || i,
+                    (%s::bigint[])[1 + i %% %s],
+                    CASE WHEN i %% %s = 0 THEN 0 ELSE round((20 + random() * 280)::numeric, 2) END,
+                    100 + floor(random() * 1100)::int,
+                    '',
+                    now() - make_interval(secs => i),
+                    now() - make_interval(secs => i)
+                FROM generate_series(1, %s) AS i
+            """, [category_ids, len(category_ids), cls.ZERO_PRICE_EVERY, cls.ROWS])
+            cursor.execute('ANALYZE menu_dish')
+
+    def index_scans(self, plan):
+        """走訪計畫樹，回傳 [(節點類型, 索引名稱), ...]"""
+        found = []
+        if plan.get('Node Type') in self.INDEX_NODES:
+            found.append((plan['Node Type'], plan.get('Index Name', '')))
+        for child in plan.get('Plans', []):
+            found.extend(self.index_scans(child))
+        return found
+
+    def assert_uses_index(self, queryset, index_name):
+        plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        scans = self.index_scans(plan)
+        self.assertTrue(any(name.startswith(index_name) for _, name in scans),
+                        f"預期使用 {index_name}，實際: {scans or plan['Node Type']}")
+
+    def test_zero_price(self):
+        self.assert_uses_index(Dish.objects.filter(price=0).only('id', 'name', 'category'), 'dish_zero_price_idx')
+        self.assert_uses_index(Dish.objects.filter(price=0).values('pk'), 'dish_zero_price_idx')
+
+    def test_category_price_range(self):
+        self.assert_uses_index(Dish.objects.filter(category_id=self.category_id, price__gte=50, price__lte=55),
+                               'dish_category_price_idx')
+
+    def test_category_calories_range(self):
+        self.assert_uses_index(
+            Dish.objects.filter(category_id=self.category_id, calories__gte=300, calories__lte=305),
+            'dish_category_calories_idx',
+        )
+
+    def test_recently_updated(self):
+        recent = timezone.now() - timedelta(minutes=1)
+        self.assert_uses_index(Dish.objects.filter(updated_at__gte=recent), 'dish_updated_at_idx')
+
+    def test_first_page_by_name(self):
+        self.assert_uses_index(Dish.objects.order_by('name')[:50], 'menu_dish_name')
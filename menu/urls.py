@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'menu'
+
+urlpatterns = [
+    path('dishes/', views.dish_list, name='dish-list'),
+    path('dishes/search/', views.dish_search, name='dish-search'),
+    path('dishes/<int:pk>/', views.dish_detail, name='dish-detail'),
+    path('summary/', views.menu_summary, name='summary'),
+]
@@ -0,0 +1,70 @@
+"""
+菜單資料版本 - 每次寫入菜單的交易提交時版本加一
+
+所有寫入菜餚／類別／時段的地方都包在 menu_write() 中：版本更新與資料變更
+在同一個交易內提交，讀取端先讀版本再讀資料，因此以版本為 key 的快取項目
+內容一定不舊於該版本，匯入提交後也不會再讀到舊的快取。
+
+逐筆匯入每道菜一個交易，若每個交易都更新版本，每道菜都要鎖住同一列版本
+並多一次 UPDATE；這類流程包在 deferred_version() 中，整個流程結束時只更新
+一次。流程進行中已提交的菜餚可能仍以舊版本被快取，結束時版本加一後失效。
+"""
+
+import contextlib
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MenuVersion
+
+_deferred = threading.local()
+
+
+def current_version():
+    """目前的菜單版本；尚未有版本列時為 0"""
+    version = MenuVersion.objects.filter(pk=MenuVersion.SINGLETON_ID).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_version():
+    """版本加一；應在寫入資料的同一個交易中呼叫"""
+    versions = MenuVersion.objects.filter(pk=MenuVersion.SINGLETON_ID)
+    if not versions.update(version=F('version') + 1, updated_at=timezone.now()):
+        # 版本列不存在（例如資料庫被 flush 過）時先建立再加一
+        MenuVersion.objects.get_or_create(pk=MenuVersion.SINGLETON_ID)
+        versions.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+@contextlib.contextmanager
+def menu_write():
+    """寫入菜單資料的交易：區塊成功結束時在同一個交易中更新版本
+
+    在 deferred_version() 之內時不更新版本，只記下有寫入，由 deferred_version() 結束時更新。
+    """
+    if getattr(_deferred, 'active', False):
+        with transaction.atomic():
+            yield
+        _deferred.written = True
+        return
+    with transaction.atomic():
+        yield
+        bump_version()
+
+
+@contextlib.contextmanager
+def deferred_version():
+    """區塊中的 menu_write() 不各自更新版本，區塊結束時若有任何寫入只更新一次（即使區塊拋出例外）"""
+    if getattr(_deferred, 'active', False):
+        yield
+        return
+    _deferred.active = True
+    _deferred.written = False
+    try:
+        yield
+    finally:
+        _deferred.active = False
+        if _deferred.written:
+            with transaction.atomic():
+                bump_version()
@@ -1,3 +1,246 @@
-from django.shortcuts import render
+"""
+菜單 JSON API（唯讀）
 
-# Create your views here.
+    GET /api/dishes/          菜餚清單，可依類別、供應時段、價格與熱量範圍篩選
+    GET /api/dishes/<id>/     單一菜餚
+    GET /api/dishes/search/   菜名模糊搜尋，依相似度排序（容許打錯字）
+    GET /api/summary/         各食材類別與供應時段的菜餚數、價格與熱量統計
+
+清單以 (name, id) 做 keyset 分頁：回應中的 next_cursor 原樣傳回 ?cursor=
+即可取得下一頁，不使用 OFFSET，翻到多後面的頁都一樣快。每一頁固定兩個
+查詢：一個取菜餚（JOIN 類別），一個取供應時段的旗標對照表；供應時段的
+篩選與列出都使用 Dish.meal_time_mask，不需要 JOIN 中介表。
+
+搜尋見 menu.search：取得排序後的菜餚 id 之後，以與清單相同的欄位讀取菜餚。
+菜名索引正在背景重建時，結果不快取也不附 ETag。
+
+參數格式錯誤或超出範圍（NaN、Infinity、超出整數欄位的熱量等）時回應 400，
+不會送到資料庫。
+
+統計讀取預先彙總的 MenuSummary（見 menu.summary），一個查詢，與菜餚數無關。
+
+回應以菜單版本快取並附 ETag（見 menu.caching）：快取命中或 304 時只需要
+讀取版本的一個查詢。
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.views.decorators.http import require_GET
+
+from .caching import versioned_json
+from .meal_masks import MealTimeBits, filter_meal_times, meal_time_names
+from .models import Dish
+from .search import search_matches
+from .summary import summary_rows
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# IntegerField 的範圍
+MIN_INT = -2 ** 31
+MAX_INT = 2 ** 31 - 1
+# 價格篩選值的範圍（遠大於 DecimalField(max_digits=6) 能存的價格）與小數位數上限
+MAX_DECIMAL = Decimal('1e15')
+MAX_DECIMAL_PLACES = 10
+
+DISH_FIELDS = ('id', 'name', 'category__name', 'price', 'calories', 'meal_time_mask')
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _json(data, status=200, cacheable=True):
+    return status, json.dumps(data, ensure_ascii=False), cacheable
+
+
+def encode_cursor(name, dish_id):
+    raw = json.dumps([name, dish_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, dish_id = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise BadRequest('cursor 格式錯誤')
+    if not isinstance(name, str) or not isinstance(dish_id, int):
+        raise BadRequest('cursor 格式錯誤')
+    return name, dish_id
+
+
+def _decimal_param(params, key):
+    value = params.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise BadRequest(f'{key} 必須是數字')
+    # Decimal 接受 NaN 與 Infinity，資料庫無法比較
+    if not value.is_finite():
+        raise BadRequest(f'{key} 必須是數字')
+    # 指數太大或太小的值（例如 1e-20000）在 PostgreSQL 上無法轉換（DataError）
+    if abs(value) >= MAX_DECIMAL or -value.normalize().as_tuple().exponent > MAX_DECIMAL_PLACES:
+        raise BadRequest(f'{key} 超出範圍')
+    return value
+
+
+def _int_param(params, key, default=None):
+    value = params.get(key)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f'{key} 必須是整數')
+    # 超出整數欄位範圍的值在 PostgreSQL 上查詢會失敗（DataError）
+    if not MIN_INT <= value <= MAX_INT:
+        raise BadRequest(f'{key} 超出範圍')
+    return value
+
+
+def filter_dishes(queryset, params, bits=None):
+    """依查詢參數篩選；category 可重複（任一符合），meal_time 可重複（全部符合）"""
+    categories = params.getlist('category')
+    if categories:
+        queryset = queryset.filter(category__name__in=categories)
+
+    queryset = filter_meal_times(queryset, params.getlist('meal_time'), bits)
+
+    for key, lookup, parse in (
+        ('min_price', 'price__gte', _decimal_param),
+        ('max_price', 'price__lte', _decimal_param),
+        ('min_calories', 'calories__gte', _int_param),
+        ('max_calories', 'calories__lte', _int_param),
+    ):
+        value = parse(params, key)
+        if value is not None:
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+
+def serialize_dishes(rows, bits=None):
+    """把 values_list(*DISH_FIELDS) 的結果轉成 JSON 用的 dict（不建立 model 物件）"""
+    if not rows:
+        return []
+    meal_times = meal_time_names([(row[0], row[5]) for row in rows], bits)
+    return [
+        {
+            'id': dish_id,
+            'name': name,
+            'category': category,
+            'price': str(price),
+            'calories': calories,
+            'meal_times': meal_times[dish_id],
+        }
+        for dish_id, name, category, price, calories, _ in rows
+    ]
+
+
+@require_GET
+def dish_list(request):
+    return versioned_json(request, lambda: build_dish_list(request.GET))
+
+
+def build_dish_list(params):
+    # 篩選與列出共用一份旗標對照表
+    bits = MealTimeBits()
+    try:
+        limit = _int_param(params, 'limit', DEFAULT_PAGE_SIZE)
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise BadRequest(f'limit 必須介於 1 到 {MAX_PAGE_SIZE}')
+
+        queryset = filter_dishes(Dish.objects.all(), params, bits)
+        cursor = params.get('cursor')
+        if cursor:
+            name, dish_id = decode_cursor(cursor)
+            queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=dish_id))
+    except BadRequest as e:
+        return _json({'error': str(e)}, status=400)
+
+    # 多取一筆判斷是否還有下一頁
+    rows = list(queryset.order_by('name', 'id').values_list(*DISH_FIELDS)[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    return _json({
+        'results': serialize_dishes(rows, bits),
+        'next_cursor': encode_cursor(rows[-1][1], rows[-1][0]) if has_next else None,
+    })
+
+
+@require_GET
+def dish_detail(request, pk):
+    return versioned_json(request, lambda: build_dish_detail(pk))
+
+
+def build_dish_detail(pk):
+    rows = list(Dish.objects.filter(pk=pk).values_list(*DISH_FIELDS))
+    if not rows:
+        return _json({'error': '找不到菜餚'}, status=404)
+    return _json(serialize_dishes(rows)[0])
+
+
+@require_GET
+def dish_search(request):
+    return versioned_json(request, lambda: build_dish_search(request.GET))
+
+
+def build_dish_search(params):
+    try:
+        query = params.get('q', '').strip()
+        if not query:
+            raise BadRequest('q 不可為空')
+        limit = _int_param(params, 'limit', DEFAULT_SEARCH_LIMIT)
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise BadRequest(f'limit 必須介於 1 到 {MAX_SEARCH_LIMIT}')
+    except BadRequest as e:
+        return _json({'error': str(e)}, status=400)
+
+    matches, current = search_matches(query, limit)
+    rows = Dish.objects.filter(pk__in=[dish_id for dish_id, _ in matches]).values_list(*DISH_FIELDS)
+    by_id = {row[0]: row for row in rows}
+    # 依相似度的順序輸出；索引建好之後才被刪除的菜餚略過
+    ranked = [(by_id[dish_id], score) for dish_id, score in matches if dish_id in by_id]
+    results = serialize_dishes([row for row, _ in ranked])
+    for result, (_, score) in zip(results, ranked):
+        result['similarity'] = round(score, 4)
+    # 索引正在背景重建時結果可能不含最新的變更，不以目前的版本快取
+    return _json({'results': results}, cacheable=current)
+
+
+@require_GET
+def menu_summary(request):
+    return versioned_json(request, build_menu_summary)
+
+
+def _decimal_str(value):
+    return None if value is None else str(round(value, 2))
+
+
+def serialize_summary(row, name):
+    return {
+        'name': name,
+        'dishes': row.dish_count,
+        'avg_price': _decimal_str(row.avg_price),
+        'min_price': _decimal_str(row.min_price),
+        'max_price': _decimal_str(row.max_price),
+        'avg_calories': None if row.avg_calories is None else round(row.avg_calories, 1),
+        'min_calories': row.min_calories,
+        'max_calories': row.max_calories,
+    }
+
+
+def build_menu_summary():
+    categories, meal_times = summary_rows()
+    return _json({
+        'categories': [serialize_summary(row, row.category.name) for row in categories],
+        'meal_times': [serialize_summary(row, row.meal_time.name) for row in meal_times],
+    })